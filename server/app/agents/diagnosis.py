@@ -1,59 +1,95 @@
-import json
-from typing import List
-from langchain_core.prompts import PromptTemplate
+from typing import Any, AsyncIterator, List, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.services.llm_service import LLMService
+from app.services.json_stream import IncrementalJSONObject, parse_partial_object
+from app.services.metrics import record_fallback
+from app.services.session_store import trim_history
 
 class DrDiagnosis:
+    SYSTEM_PROMPT = """
+    You are 'Dr. Pranaya', an expert Senior Consultant Doctor.
+    
+    YOUR GOAL:
+    Analyze symptoms and provide a HIGHLY DETAILED, 4-5 line explanation for each possible condition.
+    
+    CRITICAL OUTPUT RULES:
+    1. Output MUST be valid JSON only.
+    2. For the "reasoning" field of EACH disease, you MUST cover these 4 points:
+       - **The "Why":** Explain clearly why the symptoms match this disease.
+       - **OTC Meds:** Suggest specific medicines (e.g., "Paracetamol 650mg for fever", "Cetirizine for runny nose").
+       - **Tests:** Mention 1-2 relevant lab tests (e.g., "CBC", "Dengue NS1 Antigen").
+       - **Action:** State clearly: "Manage at home" OR "Visit a doctor".
+    
+    OUTPUT FORMAT (JSON Structure):
+    {
+        "triage_level": "Emergency" | "Consult Doctor" | "Self Care",
+        "potential_conditions": [
+            {
+                "name": "Disease Name (e.g., Viral Influenza)",
+                "likelihood": "High" | "Medium" | "Low",
+                "reasoning": "Write 4-5 full sentences here. Explain the match. Suggest medicines like Paracetamol/Ibuprofen. Recommend tests like CBC if needed. State if a doctor visit is required.",
+                "severity": "High" | "Moderate" | "Mild"
+            },
+            {
+                "name": "Disease Name (e.g., Common Cold)",
+                "likelihood": "Medium",
+                "reasoning": "Write 4-5 full sentences here. Explain why it is likely cold. Suggest steam inhalation and Vitamin C. State that it usually resolves at home.",
+                "severity": "Mild"
+            },
+            { "name": "Disease Name (e.g., Covid-19)",
+                "likelihood": "Low",
+                "reasoning": "Write 4-5 full sentences here. Explain why it is likely cold. Suggest steam inhalation and Vitamin C. State that it usually resolves at home.",
+                "severity": "Mild"}
+        ],
+        "immediate_advice": "A summary paragraph on general home care (hydration, rest, isolation) and when to rush to the ER.",
+        "questions_to_ask": ["Follow up 1", "Follow up 2"]
+    }
+    """
+
+    # Enforced by Gemini's structured output. Key order = generation order,
+    # so triage_level (what matters clinically) is the first thing to arrive.
+    RESPONSE_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "triage_level": {"type": "string", "enum": ["Emergency", "Consult Doctor", "Self Care"]},
+            "potential_conditions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "likelihood": {"type": "string", "enum": ["High", "Medium", "Low"]},
+                        "reasoning": {"type": "string"},
+                        "severity": {"type": "string", "enum": ["High", "Moderate", "Mild"]},
+                    },
+                    "required": ["name", "likelihood", "reasoning", "severity"],
+                },
+            },
+            "immediate_advice": {"type": "string"},
+            "questions_to_ask": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["triage_level", "potential_conditions", "immediate_advice", "questions_to_ask"],
+    }
+    STRUCTURED_OUTPUT = {"response_mime_type": "application/json", "response_json_schema": RESPONSE_SCHEMA}
+
+    FALLBACK = {
+        "triage_level": "Consult Doctor",
+        "immediate_advice": "I am having trouble processing the detailed diagnosis. Please consult a doctor immediately.",
+        "potential_conditions": []
+    }
+
+    # History budget in tokens (not turns): long messages can't blow up the prompt
+    HISTORY_TOKENS = 600
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="diagnosis")
        
         self.llm = self.llm_service.get_primary_model()
+        # Built once; the same prefix on every call is what prompt caching keys on
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
 
-    def analyze_symptoms(self, current_symptom: str, chat_history: List[str]):
-        
-        formatted_history = "\n".join(chat_history[-5:])
-        
-        
-        system_prompt = """
-        You are 'Dr. Pranaya', an expert Senior Consultant Doctor.
-        
-        YOUR GOAL:
-        Analyze symptoms and provide a HIGHLY DETAILED, 4-5 line explanation for each possible condition.
-        
-        CRITICAL OUTPUT RULES:
-        1. Output MUST be valid JSON only.
-        2. For the "reasoning" field of EACH disease, you MUST cover these 4 points:
-           - **The "Why":** Explain clearly why the symptoms match this disease.
-           - **OTC Meds:** Suggest specific medicines (e.g., "Paracetamol 650mg for fever", "Cetirizine for runny nose").
-           - **Tests:** Mention 1-2 relevant lab tests (e.g., "CBC", "Dengue NS1 Antigen").
-           - **Action:** State clearly: "Manage at home" OR "Visit a doctor".
-        
-        OUTPUT FORMAT (JSON Structure):
-        {
-            "triage_level": "Emergency" | "Consult Doctor" | "Self Care",
-            "potential_conditions": [
-                {
-                    "name": "Disease Name (e.g., Viral Influenza)",
-                    "likelihood": "High" | "Medium" | "Low",
-                    "reasoning": "Write 4-5 full sentences here. Explain the match. Suggest medicines like Paracetamol/Ibuprofen. Recommend tests like CBC if needed. State if a doctor visit is required.",
-                    "severity": "High" | "Moderate" | "Mild"
-                },
-                {
-                    "name": "Disease Name (e.g., Common Cold)",
-                    "likelihood": "Medium",
-                    "reasoning": "Write 4-5 full sentences here. Explain why it is likely cold. Suggest steam inhalation and Vitamin C. State that it usually resolves at home.",
-                    "severity": "Mild"
-                },
-                { "name": "Disease Name (e.g., Covid-19)",
-                    "likelihood": "Low",
-                    "reasoning": "Write 4-5 full sentences here. Explain why it is likely cold. Suggest steam inhalation and Vitamin C. State that it usually resolves at home.",
-                    "severity": "Mild"}
-            ],
-            "immediate_advice": "A summary paragraph on general home care (hydration, rest, isolation) and when to rush to the ER.",
-            "questions_to_ask": ["Follow up 1", "Follow up 2"]
-        }
-        """
+    def _build_messages(self, current_symptom: str, chat_history: List[str]):
+        formatted_history = "\n".join(trim_history(chat_history, self.HISTORY_TOKENS))
 
         user_prompt = f"""
         PREVIOUS CHAT CONTEXT:
@@ -64,19 +100,56 @@ class DrDiagnosis:
         """
 
         messages = [
-            SystemMessage(content=system_prompt),
+            self.system_message,
             HumanMessage(content=user_prompt)
         ]
+        return messages
+
+    def _finalize(self, result: dict, complete: bool) -> dict:
+        """
+        Fills whatever a truncated answer is missing, keeping every part that arrived.
+        """
+        if not complete:
+            print(f"Dr. Diagnosis: truncated answer, kept {sorted(result)}")
+            result["truncated"] = True
+            record_fallback("diagnosis", "truncated")
+        result.setdefault("triage_level", self.FALLBACK["triage_level"])
+        result.setdefault("potential_conditions", [])
+        result.setdefault("immediate_advice", self.FALLBACK["immediate_advice"])
+        result.setdefault("questions_to_ask", [])
+        return result
+
+    async def analyze_symptoms(self, current_symptom: str, chat_history: List[str]):
+        try:
+            response = await self.llm.ainvoke(self._build_messages(current_symptom, chat_history), **self.STRUCTURED_OUTPUT)
+            result, complete = parse_partial_object(response.content, ["potential_conditions"])
+            if not result:
+                raise ValueError("LLM did not return JSON")
+            return self._finalize(result, complete)
+        except Exception as e:
+            print(f"Dr. Diagnosis Error: {e}")
+            record_fallback("diagnosis", e)
+            return dict(self.FALLBACK)
 
+    async def stream_diagnosis(self, current_symptom: str, chat_history: List[str]) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Yields (field, value) as each part of the diagnosis is complete:
+        "triage_level" first, then one ("potential_conditions", condition) per
+        condition, then the rest. Ends with ("result", full_dict), which
+        survives a truncated or failed stream.
+        """
+        parser = IncrementalJSONObject(["potential_conditions"])
         try:
-            response = self.llm.invoke(messages)
-            # Cleanup JSON (remove markdown wrappers if present)
-            cleaned_content = response.content.replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_content)
+            async for chunk in self.llm.astream(self._build_messages(current_symptom, chat_history), **self.STRUCTURED_OUTPUT):
+                if not chunk.content:
+                    continue
+                for _, key, value in parser.feed(chunk.content):
+                    yield key, value
         except Exception as e:
             print(f"Dr. Diagnosis Error: {e}")
-            return {
-                "triage_level": "Consult Doctor",
-                "immediate_advice": "I am having trouble processing the detailed diagnosis. Please consult a doctor immediately.",
-                "potential_conditions": []
-            }
\ No newline at end of file
+            record_fallback("diagnosis", e)
+
+        if parser.result:
+            yield "result", self._finalize(parser.result, parser.complete)
+        else:
+            yield "result", dict(self.FALLBACK)
@@ -1,15 +1,73 @@
+import os
+import re
+from typing import Optional
+
+from app.services.phrase_matcher import PhraseMatcher, load_phrases
+from app.services.text import normalize_text
+
+DEFAULT_PHRASES = os.path.join(os.path.dirname(__file__), "..", "data", "emergency_phrases.txt")
+
+_PILLS = r"(?:pills?|tablets?|tabs?|capsules?)"
+_INTAKE_VERB = r"(?:took|taken|take|taking|swallowed|swallow|popped|had|ate|eaten)"
+
+# More pills at once than any normal dose: "took 20 sleeping pills", "swallowed 10 tablets"
+OVERDOSE_MIN_PILLS = 6
+PILL_COUNT = re.compile(rf"\b{_INTAKE_VERB}\b(?:\s+\w+){{0,3}}?\s+(\d+)\s+(?:\w+\s+){{0,2}}?{_PILLS}\b")
+# "a whole bottle of pills", "an entire strip", "all my sleeping tablets"
+WHOLE_SUPPLY = re.compile(
+    rf"\b(?:whole|entire|full)\s+(?:strip|sheet)\b"
+    rf"|\b(?:whole|entire|full)\s+(?:bottle|pack|packet|box)\s+of\s+(?:my\s+)?(?:\w+\s+)?(?:{_PILLS}|meds|medicines?)\b"
+    rf"|\b{_INTAKE_VERB}\s+all\s+(?:of\s+)?(?:my|the)\s+(?:\w+\s+)?(?:{_PILLS}|meds|medicines?)\b"
+)
+# Intake that may be self-harm, though not explicit enough to alarm on
+SEDATIVES = re.compile(
+    rf"\bsleeping\s+(?:{_PILLS}|aids?)\b|\b(?:sedatives?|alprazolam|zolpidem|diazepam|clonazepam|lorazepam)\b"
+)
+DISTRESS_AND_PILLS = re.compile(rf"\b(?:panic|anxiety|depressed|hopeless|overwhelmed)\b.*\b{_PILLS}\b")
+# "took 15 paracetamol": a count with no unit (units are left to PILL_COUNT and the tracker)
+BARE_COUNT = re.compile(r"\b(?:took|taken|swallowed|popped)\s+(?:\w+\s+)?(\d+)\s+([a-z]+)\b")
+MEASURE_WORDS = {
+    "mg", "mcg", "g", "ml", "iu", "unit", "units", "l", "litre", "litres", "liter", "liters",
+    "glass", "glasses", "cup", "cups", "bottle", "bottles", "drop", "drops", "puff", "puffs",
+    "dose", "doses", "spoon", "spoons", "times", "minutes", "hours", "days", "am", "pm",
+}
+
+
 class EmergencySentinel:
-    def __init__(self):
-        
-        self.critical_keywords = [
-            "suicide", "kill myself", "want to die", 
-            "call 108", "call ambulance", "call police",
-            "taking pills", "cut my wrist", "overdose"
-        ]
+    # Automata are shared per phrase file: every request hits the sentinel first,
+    # and the orchestrator and server shouldn't each rebuild it.
+    _matchers = {}
+
+    def __init__(self, phrases_path: str = DEFAULT_PHRASES):
+        matcher = self._matchers.get(phrases_path)
+        if matcher is None:
+            matcher = PhraseMatcher(load_phrases(phrases_path))
+            self._matchers[phrases_path] = matcher
+        self.matcher = matcher
+        self.critical_keywords = matcher.phrases
+
+    def find_critical(self, text: str) -> Optional[str]:
+        """
+        Returns the critical phrase found in `text`, or None.
+        """
+        return self.matcher.search(text)
+
+    def needs_review(self, text: str) -> bool:
+        """
+        True for intake messages that might be an overdose: the local
+        classifier must not route them, the LLM decides. Not alarms by
+        themselves: "I take 7 pills every day for my bp" is a routine.
+        """
+        normalized = normalize_text(text)
+        if SEDATIVES.search(normalized) or DISTRESS_AND_PILLS.search(normalized) or WHOLE_SUPPLY.search(normalized):
+            return True
+        count = PILL_COUNT.search(normalized)
+        if count and int(count.group(1)) >= OVERDOSE_MIN_PILLS:
+            return True
+        return any(
+            int(count) >= OVERDOSE_MIN_PILLS and word not in MEASURE_WORDS
+            for count, word in BARE_COUNT.findall(normalized)
+        )
 
     def check_critical(self, text: str) -> bool:
-        text_lower = text.lower()
-        for keyword in self.critical_keywords:
-            if keyword in text_lower:
-                return True
-        return False
\ No newline at end of file
+        return self.find_critical(text) is not None
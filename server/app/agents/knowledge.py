@@ -1,20 +1,68 @@
-from typing import List
-from langchain.schema import SystemMessage, HumanMessage
+from typing import AsyncIterator, List
+from langchain_core.messages import SystemMessage, HumanMessage
 from app.services.llm_service import LLMService
+from app.services.metrics import RETRIEVALS, record_fallback
+from app.services.response_cache import ResponseCache
+from app.services.retrieval import RetrievalIndex
+from app.services.session_store import trim_history
 
 class ProfessorKnowledge:
+    SYSTEM_PROMPT = """
+    You are 'Pranaya Knowledge'. Answer general health questions concisely.
+    If the user asks a follow-up question (e.g., "What are the symptoms?"), use the Context to know what disease they are talking about.
+    """
+
+    # With vetted notes attached the model only needs to restate them
+    GROUNDED_PROMPT = """
+    You are 'Pranaya Knowledge'. Answer the health question concisely from the Notes; add nothing they contradict.
+    Use the Context only to resolve follow-ups. Name the note's source.
+    If a note is about different people than the question (adults vs children, pregnancy), do not apply it to them.
+    """
+
+    FALLBACK = "I couldn't look that up right now. Please try asking again in a moment."
+
+    HISTORY_TOKENS = 300 # Short history needed here
+    GROUNDED_HISTORY_TOKENS = 150
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="knowledge")
         self.llm = self.llm_service.get_primary_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
+        self.grounded_message = SystemMessage(content=self.GROUNDED_PROMPT)
+        self.cache = ResponseCache.from_env("knowledge")
+        self.retrieval = RetrievalIndex.shared()
 
-    def get_info(self, query: str, chat_history: List[str]):
-        
-        formatted_history = "\n".join(chat_history[-3:]) # Short history needed here
-
-        system_prompt = """
-        You are 'Pranaya Knowledge'. Answer general health questions concisely.
-        If the user asks a follow-up question (e.g., "What are the symptoms?"), use the Context to know what disease they are talking about.
+    def _lookup(self, query: str):
+        """
+        (direct answer, notes): a corpus answer for a question it covers
+        closely enough, otherwise the nearby entries to ground the LLM.
         """
+        if self.retrieval is None:
+            return None, []
+        hits = self.retrieval.search(query, k=2)
+        doc = self.retrieval.answer(query, hits)
+        if doc is not None:
+            RETRIEVALS.inc(agent="knowledge", outcome="answer")
+            return f"{doc['answer']}\n\nSource: {doc['source']}", []
+        notes = self.retrieval.context(hits)
+        RETRIEVALS.inc(agent="knowledge", outcome="context" if notes else "none")
+        return None, notes
+
+    def _cache_key(self, query: str, chat_history: List[str]) -> str:
+        # Follow-ups ("What are the symptoms?") depend on the context, so it's part of the key
+        return self.cache.make_key(query, *trim_history(chat_history, self.HISTORY_TOKENS))
+
+    def _build_messages(self, query: str, chat_history: List[str], notes: List[dict] = ()):
+        if notes:
+            formatted_history = "\n".join(trim_history(chat_history, self.GROUNDED_HISTORY_TOKENS))
+            formatted_notes = "\n".join(f"- {doc['answer']} ({doc['source']})" for doc in notes)
+            return [
+                self.grounded_message,
+                HumanMessage(content=f"Notes:\n{formatted_notes}\nContext: {formatted_history}\nQuestion: {query}"),
+            ]
+
+        formatted_history = "\n".join(trim_history(chat_history, self.HISTORY_TOKENS))
+
         
         user_prompt = f"""
         Context: {formatted_history}
@@ -22,9 +70,55 @@ class ProfessorKnowledge:
         """
         
         messages = [
-            SystemMessage(content=system_prompt),
+            self.system_message,
             HumanMessage(content=user_prompt)
         ]
+        return messages
+
+    async def get_info(self, query: str, chat_history: List[str]):
+        answer, notes = self._lookup(query)
+        if answer is not None:
+            return answer
+
+        cache_key = self._cache_key(query, chat_history)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = await self.llm.ainvoke(self._build_messages(query, chat_history, notes))
+        except Exception as e:
+            record_fallback("knowledge", e)
+            return self.FALLBACK
+        await self.cache.aset(cache_key, response.content)
+        return response.content
+
+    async def stream_info(self, query: str, chat_history: List[str]) -> AsyncIterator[str]:
+        """
+        Same answer as get_info(), yielded token by token for /chat/stream.
+        """
+        answer, notes = self._lookup(query)
+        if answer is not None:
+            yield answer
+            return
+
+        cache_key = self._cache_key(query, chat_history)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
 
-        response = self.llm.invoke(messages)
-        return response.content
\ No newline at end of file
+        parts = []
+        try:
+            async for chunk in self.llm.astream(self._build_messages(query, chat_history, notes)):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            # Half an answer can't be taken back; before the first token the fallback can stand in
+            if parts:
+                raise
+            record_fallback("knowledge", e)
+            yield self.FALLBACK
+            return
+        await self.cache.aset(cache_key, "".join(parts))
\ No newline at end of file
@@ -0,0 +1,42 @@
+from typing import List
+from langchain_core.messages import SystemMessage, HumanMessage
+from app.services.llm_service import LLMService
+
+class AgentMemory:
+    SYSTEM_PROMPT = """
+    You are 'Pranaya Memory'. You keep a short running summary of a health conversation.
+
+    RULES:
+    1. Merge the PREVIOUS SUMMARY with the NEW TURNS into one summary of max 120 words.
+    2. Keep what matters for care: symptoms (with duration/severity), conditions discussed, medicines and doses, logged water/meds/periods, reports analyzed, and the user's emotional state.
+    3. Drop greetings and small talk.
+    4. Plain text only. No lists, no markdown.
+    """
+
+    def __init__(self):
+        self.llm_service = LLMService(agent="memory")
+        # Logic model: short, factual compression work
+        self.llm = self.llm_service.get_logic_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
+
+    async def summarize(self, previous_summary: str, turns: List[str]) -> str:
+        """
+        Folds older conversation turns into the running summary of a session.
+        Called in the background by the SessionStore, never on the request path.
+        """
+
+        user_prompt = f"""
+        PREVIOUS SUMMARY:
+        {previous_summary or "None yet."}
+
+        NEW TURNS:
+        {chr(10).join(turns)}
+        """
+
+        messages = [
+            self.system_message,
+            HumanMessage(content=user_prompt)
+        ]
+
+        response = await self.llm.ainvoke(messages)
+        return response.content.strip()
@@ -1,37 +1,49 @@
-from typing import List
+from typing import AsyncIterator, List
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.services.llm_service import LLMService
+from app.services.metrics import record_fallback
+from app.services.session_store import trim_history
 
 class NurseCompassion:
+    SYSTEM_PROMPT = """
+    You are 'Pranaya Companion', a deeply warm, nurturing, and non-judgmental friend.
+    
+    YOUR PERSONALITY:
+    - Imagine you are a wise, caring older sibling or a gentle caregiver holding a cup of hot tea for the user.
+    - Your tone should be soft, safe, and validating.
+    - NEVER sound clinical, robotic, or distant.
+    
+    INSTRUCTIONS:
+    1. **Validate First:** Before asking anything, validate their pain deeply. (e.g., "It makes so much sense that you feel this way," "I can feel how heavy that weighs on you.")
+    2. **Use "We" and "Here":** Create a sense of presence. (e.g., "I am right here with you," "We can sit with this feeling together.")
+    3. **Gentle Curiosity:** When asking questions, make them soft. Instead of "Why do you feel sad?", ask "I wonder what's been weighing on your heart lately?"
+    4. **Use Emojis:** Use comforting emojis to soften the text (🌿, 💜, 🧸, ☕, ☁️).
+    
+    SAFETY RULE:
+    - If the user mentions self-harm or suicide, answer with extreme warmth but gently urge them to connect with human support (friends/helplines).
+    
+    Example of a Bad Response: "I understand you are sad. Why?"
+    Example of a GOOD Response: "Oh, I hear you, and I want you to know how brave it is to admit that. 🌿 It sounds like you're carrying a heavy burden today. I'm right here. Do you want to tell me a little bit about what's hurting?"
+    """
+
+    FALLBACK = (
+        "I'm right here with you 💜, but I'm having trouble finding my words this moment. "
+        "Could you tell me again in a little while? If things feel too heavy, please reach out "
+        "to someone you trust or a helpline."
+    )
+
+    HISTORY_TOKENS = 600
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="mental_health")
         self.llm = self.llm_service.get_primary_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
 
-    def get_support(self, user_text: str, chat_history: List[str]):
+    def _build_messages(self, user_text: str, chat_history: List[str]):
         
-        formatted_history = "\n".join(chat_history[-5:])
+        formatted_history = "\n".join(trim_history(chat_history, self.HISTORY_TOKENS))
 
         # --- 💜 THE COMPASSION ENGINE ---
-        system_prompt = """
-        You are 'Pranaya Companion', a deeply warm, nurturing, and non-judgmental friend.
-        
-        YOUR PERSONALITY:
-        - Imagine you are a wise, caring older sibling or a gentle caregiver holding a cup of hot tea for the user.
-        - Your tone should be soft, safe, and validating.
-        - NEVER sound clinical, robotic, or distant.
-        
-        INSTRUCTIONS:
-        1. **Validate First:** Before asking anything, validate their pain deeply. (e.g., "It makes so much sense that you feel this way," "I can feel how heavy that weighs on you.")
-        2. **Use "We" and "Here":** Create a sense of presence. (e.g., "I am right here with you," "We can sit with this feeling together.")
-        3. **Gentle Curiosity:** When asking questions, make them soft. Instead of "Why do you feel sad?", ask "I wonder what's been weighing on your heart lately?"
-        4. **Use Emojis:** Use comforting emojis to soften the text (🌿, 💜, 🧸, ☕, ☁️).
-        
-        SAFETY RULE:
-        - If the user mentions self-harm or suicide, answer with extreme warmth but gently urge them to connect with human support (friends/helplines).
-        
-        Example of a Bad Response: "I understand you are sad. Why?"
-        Example of a GOOD Response: "Oh, I hear you, and I want you to know how brave it is to admit that. 🌿 It sounds like you're carrying a heavy burden today. I'm right here. Do you want to tell me a little bit about what's hurting?"
-        """
         
         user_prompt = f"""
         CONTEXT SO FAR:
@@ -42,9 +54,32 @@ class NurseCompassion:
         """
         
         messages = [
-            SystemMessage(content=system_prompt),
+            self.system_message,
             HumanMessage(content=user_prompt)
         ]
+        return messages
+
+    async def get_support(self, user_text: str, chat_history: List[str]):
+        try:
+            response = await self.llm.ainvoke(self._build_messages(user_text, chat_history))
+        except Exception as e:
+            record_fallback("mental_health", e)
+            return self.FALLBACK
+        return response.content
 
-        response = self.llm.invoke(messages)
-        return response.content
\ No newline at end of file
+    async def stream_support(self, user_text: str, chat_history: List[str]) -> AsyncIterator[str]:
+        """
+        Same reply as get_support(), yielded token by token for /chat/stream.
+        """
+        started = False
+        try:
+            async for chunk in self.llm.astream(self._build_messages(user_text, chat_history)):
+                if chunk.content:
+                    started = True
+                    yield chunk.content
+        except Exception as e:
+            # Nothing sent yet: a warm fallback beats an error event
+            if started:
+                raise
+            record_fallback("mental_health", e)
+            yield self.FALLBACK
\ No newline at end of file
@@ -1,37 +1,82 @@
 import json
 from langchain_core.messages import SystemMessage, HumanMessage
 from app.services.llm_service import LLMService
+from app.services.metrics import RETRIEVALS, record_fallback
+from app.services.response_cache import ResponseCache
+from app.services.retrieval import RetrievalIndex
 
 class MythBuster:
+    SYSTEM_PROMPT = """
+    You are the 'Myth Buster' agent.
+    
+    YOUR GOAL:
+    Determine if a medical claim is a MYTH or a FACT.
+    
+    OUTPUT FORMAT (JSON):
+    {
+        "verdict": "MYTH" | "FACT" | ,
+        "explanation": "Scientific explanation in 3-4 sentences.",
+        "source": "Mention a credible entity (e.g., WHO, CDC, Mayo Clinic) if applicable."
+    }
+    """
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="myth_buster")
         self.llm = self.llm_service.get_primary_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
+        # Popular claims ("carrots give night vision") repeat a lot
+        self.cache = ResponseCache.from_env("myth_buster")
+        self.retrieval = RetrievalIndex.shared()
+
+    def _lookup(self, query: str):
+        """
+        A vetted verdict for a claim the corpus already covers, otherwise
+        the closest entries as evidence for the LLM.
+        """
+        if self.retrieval is None:
+            return None, []
+        hits = self.retrieval.search(query, k=2, doc_type="myth")
+        doc = self.retrieval.answer(query, hits)
+        if doc is not None:
+            RETRIEVALS.inc(agent="myth_buster", outcome="answer")
+            return {"verdict": doc["verdict"], "explanation": doc["answer"], "source": doc["source"]}, []
+        evidence = self.retrieval.context(hits)
+        RETRIEVALS.inc(agent="myth_buster", outcome="context" if evidence else "none")
+        return None, evidence
 
-    def check_fact(self, query: str):
-        system_prompt = """
-        You are the 'Myth Buster' agent.
-        
-        YOUR GOAL:
-        Determine if a medical claim is a MYTH or a FACT.
-        
-        OUTPUT FORMAT (JSON):
-        {
-            "verdict": "MYTH" | "FACT" | ,
-            "explanation": "Scientific explanation in 3-4 sentences.",
-            "source": "Mention a credible entity (e.g., WHO, CDC, Mayo Clinic) if applicable."
-        }
+    def vetted(self, query: str):
         """
-        
+        The corpus verdict for `query`, or None if the corpus doesn't cover it.
+        """
+        return self._lookup(query)[0]
+
+    async def check_fact(self, query: str):
+        answer, evidence = self._lookup(query)
+        if answer is not None:
+            return answer
+
+        cache_key = self.cache.make_key(query)
+        cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+        content = query
+        if evidence:
+            lines = "\n".join(f"- {doc['text']}: {doc['verdict']}. {doc['answer']} ({doc['source']})" for doc in evidence)
+            content = f"CLAIM: {query}\n\nVETTED EVIDENCE (use it only if it is about the same claim):\n{lines}"
         messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=query)
+            self.system_message,
+            HumanMessage(content=content)
         ]
 
         try:
-            response = self.llm.invoke(messages)
+            response = await self.llm.ainvoke(messages)
             cleaned_content = response.content.replace("```json", "").replace("```", "").strip()
-            return json.loads(cleaned_content)
-        except:
+            result = json.loads(cleaned_content)
+            await self.cache.aset(cache_key, result)
+            return result
+        except Exception as e:
+            record_fallback("myth_buster", e)
             return {
                 "verdict": "UNCERTAIN",
                 "explanation": "I couldn't verify this claim right now.",
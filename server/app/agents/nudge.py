@@ -1,50 +1,79 @@
 import json
-from typing import List
+import os
+from typing import List, Optional
 from langchain_core.messages import SystemMessage, HumanMessage
+from app.services import deadline
 from app.services.llm_service import LLMService
+from app.services.metrics import record_fallback
+from app.services.suggestion_library import SuggestionLibrary
 
 class NudgeAgent:
+    SYSTEM_PROMPT = """
+    You are 'Pranaya Nudge', a conversation engine.
+    
+    YOUR GOAL:
+    Predict exactly 3 short, relevant follow-up questions the USER might want to ask next.
+    
+    RULES:
+    1. Keep them short (max 6-8 words).
+    2. Make them relevant to the last topic discussed.
+    3. If the topic was medical, suggest deeper questions (e.g., "dietary advice", "side effects").
+    4. If the topic was mental health, suggest coping questions.
+    5. Output strictly as a JSON list of strings. Example: ["What should I eat?", "Is it contagious?", "When to see a doctor?"]
+    """
+
+    FALLBACK = ["Tell me more", "What else?", "Go back"]
+
+    # Nudges are the last stage; below this much of the request budget, skip the LLM
+    MIN_SECONDS = float(os.getenv("NUDGE_MIN_SECONDS", "1.0"))
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="nudge")
         # We use the Logic Model (Gemini) because it's fast and good at structured lists
         self.llm = self.llm_service.get_logic_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
+        # 📚 Precomputed suggestions per intent + topic; the LLM only fills the gaps
+        self.library = SuggestionLibrary()
 
-    def generate_suggestions(self, user_text: str, bot_response: str) -> List[str]:
+    async def generate_suggestions(self, user_text: str, bot_response: str, intent: str = "chat", topics: Optional[List[str]] = None) -> List[str]:
         """
         Generates 3 short follow-up questions based on the last interaction.
+        `topics` are the strongest hints (e.g. diagnosed condition names).
         """
-        
-        system_prompt = """
-        You are 'Pranaya Nudge', a conversation engine.
-        
-        YOUR GOAL:
-        Predict exactly 3 short, relevant follow-up questions the USER might want to ask next.
-        
-        RULES:
-        1. Keep them short (max 6-8 words).
-        2. Make them relevant to the last topic discussed.
-        3. If the topic was medical, suggest deeper questions (e.g., "dietary advice", "side effects").
-        4. If the topic was mental health, suggest coping questions.
-        5. Output strictly as a JSON list of strings. Example: ["What should I eat?", "Is it contagious?", "When to see a doctor?"]
-        """
-        
+        texts = list(topics or []) + [user_text, bot_response]
+        suggestions = await self.library.lookup(intent, texts)
+        if suggestions is not None:
+            return suggestions
+
+        left = deadline.remaining()
+        if left is not None and left < self.MIN_SECONDS:
+            record_fallback("nudge", "deadline")
+            return list(self.FALLBACK)
+
+        # In parallel mode the reply isn't written yet, so we only nudge on the question
+        ai_reply_line = f'AI REPLIED: "{bot_response}"' if bot_response else ""
+
         user_prompt = f"""
         USER ASKED: "{user_text}"
-        AI REPLIED: "{bot_response}"
+        {ai_reply_line}
         
         Generate 3 user follow-up questions (JSON List):
         """
 
         messages = [
-            SystemMessage(content=system_prompt),
+            self.system_message,
             HumanMessage(content=user_prompt)
         ]
 
         try:
-            response = self.llm.invoke(messages)
+            response = await self.llm.ainvoke(messages)
             content = response.content.replace("```json", "").replace("```", "").strip()
-            return json.loads(content)
+            suggestions = json.loads(content)
+            if isinstance(suggestions, list) and suggestions and all(isinstance(item, str) for item in suggestions):
+                await self.library.learn(intent, texts, suggestions[:3])
+            return suggestions
         except Exception as e:
             print(f"Nudge Error: {e}")
+            record_fallback("nudge", e)
             # Safe fallbacks if AI fails
-            return ["Tell me more", "What else?", "Go back"]
\ No newline at end of file
+            return list(self.FALLBACK)
\ No newline at end of file
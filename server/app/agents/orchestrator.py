@@ -1,60 +1,183 @@
+import json
+import os
 from typing import List
-from langchain_core.prompts import PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from app.services.llm_service import LLMService
+from app.services.metrics import record_fallback
+from app.services.intent_classifier import IntentClassifier
+from app.services.session_store import trim_history
 from app.agents.emergency import EmergencySentinel
 
 class MasterOrchestrator:
+    # Static routing instructions go first, so every call shares the same prefix
+    ROUTING_RULES = """
+    You are the Master Orchestrator for 'Pranaya', a health AI.
+    Analyze the user input and map it to exactly ONE of the agents.
+
+    AGENTS:
+    - "diagnosis": User describes symptoms (headache, fever, pain).
+    - "emergency": User is dying, fainting, bleeding, or suicidal
+    - "general_knowledge": User asks "What is X?", "Explain Y", "Do you know about Z?".
+    - "mental_health": User expresses sadness, anxiety,depression, stress, or loneliness.
+    - "myth_buster": User asks if a health fact is true or false.
+    - "general_search": User asks "What is X?" or general knowledge questions.
+    - "tracker": User mentions drinking water, taking meds, or sleep.
+    - "chat": Casual greeting or irrelevant talk.
+
+    CRITICAL DISTINCTION:
+    - "I have chest pain" -> emergency
+    - "Is chest pain dangerous?" -> general_knowledge
+    - "I feel shortness of breath" -> diagnosis (or emergency if severe)
+    - "Can shortness of breath be a symptom?" -> general_knowledge
+
+    CRITICAL RULE:
+    If the user is adding details to a medical topic discussed in the HISTORY (like adding symptom details), route to "diagnosis" or "general_knowledge" accordingly. Don't default to "chat".
+    """
+
+    SYSTEM_PROMPT = ROUTING_RULES + """
+    Return ONLY the agent name (lowercase). Do not add punctuation.
+    """
+
+    # Fused mode: the same call also writes the answer for the lightweight agents.
+    # Literal braces are doubled: this is a ChatPromptTemplate.
+    FUSED_PROMPT = ROUTING_RULES + """
+    FUSED ANSWER MODE:
+    Return JSON ONLY. No markdown. {{"agent": "<agent name, lowercase>", "answer": <object or null>}}
+    Write "answer" only for these agents, exactly in this format; for every other agent it is null:
+    - "chat": {{"message": "A short, warm reply that steers back to health topics."}}
+    - "myth_buster": {{"verdict": "MYTH" | "FACT", "explanation": "Scientific explanation in 3-4 sentences.", "source": "A credible entity (e.g., WHO, CDC, Mayo Clinic) if applicable."}}
+    - "tracker": {{"valid": true, "category": "water" | "medicine" | "vaccine" | "period", "item": "Name" or null, "quantity": "Amount" or null, "response_text": "Confirmation message"}}
+    """
+
+    USER_PROMPT = """
+    CONTEXT FROM PREVIOUS CHAT:
+    {history}
+
+    CURRENT USER INPUT:
+    {input}
+    """
+
+    FUSED_USER_PROMPT = """
+    CONTEXT FROM PREVIOUS CHAT:
+    {history}
+
+    USER GENDER: {gender}
+
+    CURRENT USER INPUT:
+    {input}
+    """
+
+    HISTORY_TOKENS = 300
+
+    # The routes main._dispatch acts on. Anything else the LLM answers
+    # (e.g. "general_search") falls through to plain chat.
+    INTENTS = ("emergency", "tracker", "diagnosis", "general_knowledge", "mental_health", "myth_buster", "chat")
+
+    # Intents a fused answer may cover, with the fields it must have to be used
+    ANSWER_FIELDS = {
+        "chat": ("message",),
+        "myth_buster": ("verdict", "explanation"),
+        "tracker": ("valid", "response_text"),
+    }
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="orchestrator")
         self.llm = self.llm_service.get_logic_model() # Uses Gemini/Qwen for logic
+        # Built once here instead of on every classify_intent() call
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", self.SYSTEM_PROMPT),
+            ("human", self.USER_PROMPT),
+        ])
+        self.fused_prompt = ChatPromptTemplate.from_messages([
+            ("system", self.FUSED_PROMPT),
+            ("human", self.FUSED_USER_PROMPT),
+        ])
         self.emergency_sentinel = EmergencySentinel()
+        # Local first stage: answers the obvious cases without an LLM call
+        self.local_classifier = IntentClassifier.from_corpus()
+        self.confidence_threshold = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.8"))
+        # Any real chance of an emergency goes to the LLM, however sure the local model is
+        self.emergency_escalation = float(os.getenv("ROUTER_EMERGENCY_ESCALATION", "0.1"))
+
+    def _classify_locally(self, user_input: str, chat_history: List[str]):
+        """
+        Returns the local decision, or None when the LLM should decide.
+        """
+        # Possible overdoses look like medicine logs to a bag of words
+        if self.emergency_sentinel.needs_review(user_input):
+            return None
+        probs = self.local_classifier.predict_proba(user_input)
+        agent_name = max(probs, key=probs.get)
+        confidence = probs[agent_name]
+
+        if confidence < self.confidence_threshold:
+            return None
+        if probs.get("emergency", 0.0) >= self.emergency_escalation:
+            return None
+        # Mid-conversation, short replies are often follow-ups to a medical topic,
+        # which only the LLM can see in the history. Don't default to "chat".
+        if agent_name == "chat" and chat_history:
+            return None
+        return {"agent": agent_name, "confidence": round(confidence, 3), "source": "local"}
 
-    def classify_intent(self, user_input: str, chat_history: List[str]):
+    def _fast_decision(self, user_input: str, chat_history: List[str]):
         # 1. FAST CHECK: Only trigger for EXPLICIT life threats
         # We assume you cleaned up emergency.py to remove "chest pain" from the keyword list
         if self.emergency_sentinel.check_critical(user_input):
-            return {"agent": "emergency", "confidence": 1.0}
-
-        formatted_history = "\n".join(chat_history[-3:]) if chat_history else "No previous context."
-
-        # 2. INTELLIGENT CHECK (The "Hesitation" Logic)
-        template = """
-        You are the Master Orchestrator for 'Pranaya', a health AI.
-        Analyze the user input and map it to exactly ONE of the agents.
-        CONTEXT FROM PREVIOUS CHAT:
-        {history}
-        CURRENT USER INPUT:
-        {input}
-        AGENTS:
-        - "diagnosis": User describes symptoms (headache, fever, pain).
-        - "emergency": User is dying, fainting, bleeding, or suicidal
-        - "general_knowledge": User asks "What is X?", "Explain Y", "Do you know about Z?".
-        - "mental_health": User expresses sadness, anxiety,depression, stress, or loneliness.
-        - "myth_buster": User asks if a health fact is true or false.
-        - "general_search": User asks "What is X?" or general knowledge questions.
-        - "tracker": User mentions drinking water, taking meds, or sleep.
-        - "chat": Casual greeting or irrelevant talk.
-
-        CRITICAL DISTINCTION:
-        - "I have chest pain" -> emergency
-        - "Is chest pain dangerous?" -> general_knowledge
-        - "I feel shortness of breath" -> diagnosis (or emergency if severe)
-        - "Can shortness of breath be a symptom?" -> general_knowledge
-
-        User Input: {input}
-        CRITICAL RULE:
-        If the user is adding details to a medical topic discussed in the HISTORY (like adding symptom details), route to "diagnosis" or "general_knowledge" accordingly. Don't default to "chat".
-        
-        Return ONLY the agent name (lowercase). Do not add punctuation.
-        """
-        
-        prompt = PromptTemplate(template=template, input_variables=["input", "history"])
-        chain = prompt | self.llm
-        
+            return {"agent": "emergency", "confidence": 1.0, "source": "sentinel"}
+
+        # 2. LOCAL CLASSIFIER: microseconds, no LLM call for the obvious cases
+        return self._classify_locally(user_input, chat_history)
+
+    def _format_history(self, chat_history: List[str]) -> str:
+        return "\n".join(trim_history(chat_history, self.HISTORY_TOKENS)) if chat_history else "No previous context."
+
+    async def classify_intent(self, user_input: str, chat_history: List[str]):
+        fast_decision = self._fast_decision(user_input, chat_history)
+        if fast_decision:
+            return fast_decision
+
+        formatted_history = self._format_history(chat_history)
+
+        # 3. INTELLIGENT CHECK (The "Hesitation" Logic) - only for low-confidence inputs
         try:
-            response = chain.invoke({"input": user_input, "history": formatted_history})
+            response = await self.llm.ainvoke(self.prompt.format_messages(input=user_input, history=formatted_history))
             agent_name = response.content.strip().lower()
-            return {"agent": agent_name, "confidence": 0.9}
+            return {"agent": agent_name, "confidence": 0.9, "source": "llm"}
         except Exception as e:
             print(f"Orchestrator Error: {e}")
-            return {"agent": "chat", "confidence": 0.5}
\ No newline at end of file
+            record_fallback("orchestrator", e)
+            return {"agent": "chat", "confidence": 0.5, "source": "fallback"}
+
+    async def route_and_answer(self, user_input: str, chat_history: List[str], user_gender: str = "Unknown"):
+        """
+        classify_intent() for fused mode (ROUTER_FUSED=1). When the LLM has to
+        route anyway, the same call also answers the ANSWER_FIELDS intents in
+        their specialist's format, returned under "answer" (source "fused").
+        Other intents, and sentinel/local decisions, dispatch as usual.
+        """
+        fast_decision = self._fast_decision(user_input, chat_history)
+        if fast_decision:
+            return fast_decision
+
+        messages = self.fused_prompt.format_messages(
+            input=user_input, history=self._format_history(chat_history), gender=user_gender
+        )
+        try:
+            response = await self.llm.ainvoke(messages)
+            content = response.content
+            start, end = content.find("{"), content.rfind("}")
+            if start == -1 or end < start:
+                raise ValueError("Orchestrator did not return JSON")
+            result = json.loads(content[start:end + 1])
+        except Exception as e:
+            print(f"Orchestrator Error: {e}")
+            record_fallback("orchestrator", e)
+            return {"agent": "chat", "confidence": 0.5, "source": "fallback"}
+
+        agent_name = str(result.get("agent", "")).strip().lower()
+        answer = result.get("answer")
+        fields = self.ANSWER_FIELDS.get(agent_name)
+        if fields and isinstance(answer, dict) and all(field in answer for field in fields):
+            return {"agent": agent_name, "confidence": 0.9, "source": "fused", "answer": answer}
+        return {"agent": agent_name, "confidence": 0.9, "source": "llm"}
@@ -0,0 +1,111 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class AgentUnavailable(RuntimeError):
+    """
+    The agent could not be imported or built (e.g. GOOGLE_API_KEY missing).
+    """
+
+
+class AgentRegistry:
+    """
+    Name -> agent, imported and constructed on first use.
+
+    Agent modules pull in LangChain and the Gemini SDK, and every agent sets
+    up its LLM handle, so building all of them at import time made the
+    server's cold start pay for agents the first request never touches. Here
+    each agent is a "module:Class" string until it is first asked for;
+    warm_up() builds a chosen set ahead of traffic (AGENT_WARMUP, see main.py).
+
+    Async code uses aget(): a missing agent is built in a worker thread and
+    the event loop never waits on the build lock. get() is for threads and
+    scripts (and for agents already loaded, where it is a dict lookup).
+    """
+
+    def __init__(self, specs: Dict[str, str]):
+        self.specs = dict(specs)
+        self._agents: Dict[str, object] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # name -> the build in progress, shared by every coroutine waiting for it
+        self._loading: Dict[str, asyncio.Future] = {}
+
+    def get(self, name: str):
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        with self._lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                agent = self._build(name)
+                self._agents[name] = agent
+        return agent
+
+    async def aget(self, name: str):
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        loading = self._loading.get(name)
+        if loading is None:
+            loading = asyncio.ensure_future(asyncio.to_thread(self.get, name))
+            self._loading[name] = loading
+            # A failed build is retried by the next caller
+            loading.add_done_callback(lambda _: self._loading.pop(name, None))
+        # shield: one caller giving up (deadline, disconnect) doesn't cancel the build for the rest
+        return await asyncio.shield(loading)
+
+    def _build(self, name: str):
+        module_name, _, class_name = self.specs[name].partition(":")
+        started = time.perf_counter()
+        try:
+            agent = getattr(importlib.import_module(module_name), class_name)()
+        except Exception as e:
+            print(f"❌ Agent '{name}' failed to load: {e}")
+            raise AgentUnavailable(f"Agent '{name}' is unavailable: {e}") from e
+        self._load_seconds[name] = time.perf_counter() - started
+        print(f"✅ Agent '{name}' loaded in {self._load_seconds[name] * 1000:.0f} ms")
+        return agent
+
+    def loaded(self, name: str) -> bool:
+        return name in self._agents
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Builds `names` (default: all) in a worker thread so the event loop
+        keeps serving while the imports run. Failures are logged, not raised:
+        the agent is simply retried on its first request.
+        """
+        warmed = []
+        for name in names if names is not None else self.specs:
+            if name not in self.specs:
+                print(f"⚠️ Unknown agent in warm-up list: {name}")
+                continue
+            try:
+                await self.aget(name)
+                warmed.append(name)
+            except AgentUnavailable:
+                pass
+        return warmed
+
+    def stats(self) -> dict:
+        return {
+            name: {"loaded": name in self._agents, "load_ms": round(self._load_seconds.get(name, 0.0) * 1000, 1)}
+            for name in self.specs
+        }
+
+
+def warmup_names(specs: Dict[str, str]) -> List[str]:
+    """
+    AGENT_WARMUP: "" (none, the default), "all", or a comma list like "orchestrator,nudge".
+    """
+    raw = os.getenv("AGENT_WARMUP", "").strip()
+    if not raw:
+        return []
+    if raw == "all":
+        return list(specs)
+    return [name.strip() for name in raw.split(",") if name.strip()]
@@ -1,47 +1,53 @@
+import asyncio
+from typing import AsyncIterator
 from langchain_core.messages import HumanMessage, SystemMessage
 from app.services.llm_service import LLMService
+from app.services.metrics import record_fallback
+from app.services.response_cache import ResponseCache
+from app.services.image_preprocess import ImageSource, PreparedImage, content_hash, data_url_mime, decode_data_url, preprocess_image
 
 class AgentVision:
+    SYSTEM_PROMPT = """
+    You are 'Pranaya Lab Tech', a senior pathologist. 
+    
+    YOUR GOAL:
+    Analyze the medical image and provide a highly detailed, formatted report.
+    
+    FORMATTING RULES (CRITICAL):
+    1. Use **HTML tags** for formatting. Do NOT use Markdown.
+    2. If a value is **HIGH** or **LOW** (Abnormal), wrap it in: <span class="text-red-600 font-bold"> ... </span>
+    3. If a value is **NORMAL**, wrap it in: <span class="text-green-600 font-bold"> ... </span>
+    4. Use <b>...</b> for headers and important keywords.
+    5. Use <br> for line breaks.
+    
+    STRUCTURE:
+    <h3>🧪 Test Summary</h3>
+    [Identify the test, e.g., CBC, Lipid Profile]
+    
+    <h3>📊 Detailed Analysis</h3>
+    <ul>
+       <li><b>Parameter Name:</b> [Value] [Unit] - <span class="...">[Status]</span> <br> <i>(Explanation of what this means in 1 sentence)</i></li>
+       ... (Repeat for all key values)
+    </ul>
+    
+    <h3>🩺 Clinical Interpretation</h3>
+    [Detailed paragraph explaining the overall health picture. Mention potential causes for the abnormal values (e.g., "High WBC suggests an active infection").]
+    
+    <h3>💡 Next Steps</h3>
+    [Actionable advice, e.g., "Drink water", "Consult a General Physician"].
+    """
+
+    FALLBACK_MESSAGE = "I had trouble reading that image. Please make sure the text is clear and well-lit."
+
     def __init__(self):
-        self.llm_service = LLMService()
+        self.llm_service = LLMService(agent="vision")
         # Neysa Qwen-3-VL is a Vision Model, so this works natively!
         self.llm = self.llm_service.get_primary_model()
+        self.system_message = SystemMessage(content=self.SYSTEM_PROMPT)
+        # Keyed by the SHA-256 of the uploaded file: re-uploading a report is free
+        self.cache = ResponseCache.from_env("vision")
 
-    def analyze_report(self, base64_image: str):
-        """
-        Takes a Base64 string of an image and returns a medical analysis.
-        """
-        
-        system_prompt = """
-        You are 'Pranaya Lab Tech', a senior pathologist. 
-        
-        YOUR GOAL:
-        Analyze the medical image and provide a highly detailed, formatted report.
-        
-        FORMATTING RULES (CRITICAL):
-        1. Use **HTML tags** for formatting. Do NOT use Markdown.
-        2. If a value is **HIGH** or **LOW** (Abnormal), wrap it in: <span class="text-red-600 font-bold"> ... </span>
-        3. If a value is **NORMAL**, wrap it in: <span class="text-green-600 font-bold"> ... </span>
-        4. Use <b>...</b> for headers and important keywords.
-        5. Use <br> for line breaks.
-        
-        STRUCTURE:
-        <h3>🧪 Test Summary</h3>
-        [Identify the test, e.g., CBC, Lipid Profile]
-        
-        <h3>📊 Detailed Analysis</h3>
-        <ul>
-           <li><b>Parameter Name:</b> [Value] [Unit] - <span class="...">[Status]</span> <br> <i>(Explanation of what this means in 1 sentence)</i></li>
-           ... (Repeat for all key values)
-        </ul>
-        
-        <h3>🩺 Clinical Interpretation</h3>
-        [Detailed paragraph explaining the overall health picture. Mention potential causes for the abnormal values (e.g., "High WBC suggests an active infection").]
-        
-        <h3>💡 Next Steps</h3>
-        [Actionable advice, e.g., "Drink water", "Consult a General Physician"].
-        """
-
+    def _build_messages(self, image_url: str):
         # Construct the Multimodal Message (Text + Image)
         # This is the standard format for OpenAI-compatible Vision Models
         message = HumanMessage(
@@ -50,16 +56,96 @@ class AgentVision:
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"{base64_image}" # Frontend sends "data:image/jpeg;base64,..."
+                        "url": image_url # "data:image/jpeg;base64,..." after preprocessing
                     },
                 },
             ]
         )
 
+        # System Prompt + Image Message
+        return [self.system_message, message]
+
+    async def _prepare(self, source: ImageSource, digest: str, mime_type: str) -> str:
+        """
+        Shrinks the upload before it goes to the model. Formats Pillow can't
+        read are passed through untouched and left to the model.
+        """
+        try:
+            prepared = await asyncio.to_thread(preprocess_image, source, digest)
+            return prepared.to_data_url()
+        except Exception as e:
+            print(f"Vision Preprocess Error: {e}")
+            record_fallback("vision", "preprocess")
+            if not isinstance(source, bytes):
+                source.seek(0)
+                source = source.read()
+            return PreparedImage(source, mime_type, digest, len(source)).to_data_url()
+
+    async def analyze_image(self, source: ImageSource, mime_type: str = "image/jpeg") -> str:
+        """
+        Analyzes raw image bytes (or a binary file object).
+        """
+        digest = content_hash(source)
+        cached = await self.cache.aget(digest)
+        if cached is not None:
+            return cached
+
         try:
-            # Send System Prompt + Image Message
-            response = self.llm.invoke([SystemMessage(content=system_prompt), message])
+            image_url = await self._prepare(source, digest, mime_type)
+            response = await self.llm.ainvoke(self._build_messages(image_url))
+            await self.cache.aset(digest, response.content)
             return response.content
         except Exception as e:
             print(f"Vision Error: {e}")
-            return "I had trouble reading that image. Please make sure the text is clear and well-lit."
\ No newline at end of file
+            record_fallback("vision", e)
+            return self.FALLBACK_MESSAGE
+
+    async def analyze_report(self, base64_image: str):
+        """
+        Takes a Base64 string of an image and returns a medical analysis.
+        """
+        try:
+            raw = decode_data_url(base64_image)
+        except ValueError as e:
+            print(f"Vision Error: {e}")
+            record_fallback("vision", e)
+            return self.FALLBACK_MESSAGE
+        return await self.analyze_image(raw, data_url_mime(base64_image))
+
+    async def stream_image(self, source: ImageSource, mime_type: str = "image/jpeg") -> AsyncIterator[str]:
+        """
+        Same analysis as analyze_image(), yielded token by token for /chat/stream.
+        """
+        digest = content_hash(source)
+        cached = await self.cache.aget(digest)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        try:
+            image_url = await self._prepare(source, digest, mime_type)
+            async for chunk in self.llm.astream(self._build_messages(image_url)):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+            await self.cache.aset(digest, "".join(parts))
+        except Exception as e:
+            print(f"Vision Error: {e}")
+            record_fallback("vision", e)
+            if not parts:
+                yield self.FALLBACK_MESSAGE
+
+    async def stream_report(self, base64_image: str) -> AsyncIterator[str]:
+        """
+        Same analysis as analyze_report(), yielded token by token for /chat/stream.
+        """
+        try:
+            raw = decode_data_url(base64_image)
+        except ValueError as e:
+            print(f"Vision Error: {e}")
+            record_fallback("vision", e)
+            yield self.FALLBACK_MESSAGE
+            return
+        async for token in self.stream_image(raw, data_url_mime(base64_image)):
+            yield token
@@ -1,18 +1,32 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import time
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-
-# --- IMPORT AGENTS ---
-from app.agents.orchestrator import MasterOrchestrator
-from app.agents.emergency import EmergencySentinel
-from app.agents.diagnosis import DrDiagnosis
-from app.agents.mental_health import NurseCompassion
-from app.agents.myth_buster import MythBuster
-from app.agents.knowledge import ProfessorKnowledge
-from app.agents.scribe import AgentScribe
-from app.agents.vision import AgentVision
-from app.agents.nudge import NudgeAgent # <--- NEW
+from starlette.formparsers import MultiPartException, MultiPartParser
+from typing import AsyncIterator, List, Optional
+from dotenv import load_dotenv
+
+# Before anything reads the environment (agents are no longer imported here)
+load_dotenv()
+
+# --- AGENTS (imported lazily, see app/agents/registry.py) ---
+from app.agents.registry import AgentRegistry, AgentUnavailable, warmup_names
+from app.services.suggestion_store import SuggestionStore
+from app.services.response_cache import ResponseCache
+from app.services.uploads import UploadTooLarge, capped, max_upload_bytes, spool_stream
+from app.services.job_queue import JobQueue, QueueFull
+from app.services.tracker_store import TrackerStore
+from app.services.session_store import SessionStore
+from app.services import metrics
+from app.services.batch import gather_bounded
+from app.services.deadline import DEFAULT_CHAT_DEADLINE, start_deadline
+from app.services.reminders import ReminderScheduler
+from app.services.metrics import span
+from app.services.usage import start_request_usage
 
 app = FastAPI(title="Pranaya Health Agent API")
 
@@ -25,137 +39,691 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- INITIALIZE AGENTS ---
-orchestrator = MasterOrchestrator()
-doctor = DrDiagnosis()
-nurse = NurseCompassion()
-myth_buster = MythBuster()
-professor = ProfessorKnowledge()
-scribe = AgentScribe()
-vision_agent = AgentVision()
-nudge_agent = NudgeAgent() # <--- NEW
+# Server-Timing on every response with METRICS_TIMING_HEADER=1, or on demand
+# with an "X-Debug-Timing: 1" request header
+TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0") == "1"
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    trace = metrics.start_trace()
+    started = time.perf_counter()
+    response = await call_next(request)
+    # The route template ("/tracker/{user_id}/daily"), so user ids don't become labels.
+    # For streams this is the time to the first byte.
+    route = request.scope.get("route")
+    path = getattr(route, "path", "unmatched")
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, path=path, status=response.status_code)
+    if TIMING_HEADER or request.headers.get("x-debug-timing") == "1":
+        trace.append(("total", time.perf_counter() - started))
+        response.headers["Server-Timing"] = metrics.server_timing(trace)
+    return response
+
+# --- AGENT REGISTRY ---
+# Nothing is imported or built until an agent's first request, so startup
+# doesn't pay for LangChain / the Gemini SDK and doesn't need GOOGLE_API_KEY.
+# AGENT_WARMUP=all (or "orchestrator,nudge") builds them right after startup.
+AGENTS = {
+    "orchestrator": "app.agents.orchestrator:MasterOrchestrator",
+    "diagnosis": "app.agents.diagnosis:DrDiagnosis",
+    "mental_health": "app.agents.mental_health:NurseCompassion",
+    "myth_buster": "app.agents.myth_buster:MythBuster",
+    "knowledge": "app.agents.knowledge:ProfessorKnowledge",
+    "scribe": "app.agents.scribe:AgentScribe",
+    "vision": "app.agents.vision:AgentVision",
+    "nudge": "app.agents.nudge:NudgeAgent",
+    "memory": "app.agents.memory:AgentMemory",
+}
+agents = AgentRegistry(AGENTS)
+_warmup_task = None
+
+@app.on_event("startup")
+async def start_warmup():
+    global _warmup_task
+    names = warmup_names(AGENTS)
+    if names:
+        # In the background: the port opens now, agents load while it does
+        _warmup_task = asyncio.ensure_future(agents.warm_up(names))
+
+@app.exception_handler(AgentUnavailable)
+async def agent_unavailable(request: Request, exc: AgentUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+# Background nudges for suggestions_mode="deferred"
+suggestion_store = SuggestionStore()
+
+# Scribe results are persisted here (batched, off the request path)
+tracker_store = TrackerStore()
+
+# Medication / hydration reminders derived from the tracker log (REMINDERS=0 to disable)
+reminders = ReminderScheduler()
+
+@app.on_event("startup")
+async def start_reminders():
+    if os.getenv("REMINDERS", "1") != "0":
+        reminders.start()
+
+@app.on_event("shutdown")
+async def stop_reminders():
+    await reminders.stop()
+
+# Per-user conversation memory; older turns are summarized in the background
+async def _summarize_turns(summary: str, turns: List[str]) -> str:
+    return await (await agents.aget("memory")).summarize(summary, turns)
+
+session_store = SessionStore(summarizer=_summarize_turns)
 
 # --- DATA MODEL ---
 class ChatRequest(BaseModel):
     message: str
     user_id: str = "guest"
+    # Optional: the server keeps the conversation per user_id. Older clients
+    # that still send their history get it used as-is.
     history: List[str] = []   
     gender: str = "Unknown"   
     image: Optional[str] = None 
+    # How the follow-up suggestions are produced:
+    #   "inline"   -> after the answer, in the same response (original behaviour)
+    #   "parallel" -> from the user text, concurrently with the specialist agent
+    #   "deferred" -> in the background; fetch them from /suggestions/{request_id}
+    suggestions_mode: str = "inline"
+    # Total time budget for the answer (default CHAT_DEADLINE_SECONDS). Stages
+    # still running when it's spent answer with their fallback instead.
+    deadline_ms: Optional[int] = None
+
+SUGGESTION_MODES = ("inline", "parallel", "deferred")
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest]
+    # Items processed at once (capped by BATCH_MAX_CONCURRENCY)
+    concurrency: int = 8
+    # Only run the orchestrator: one cheap call per item, for routing evals
+    route_only: bool = False
+    # Keep tracker logs, reminders and session memory from the batch. Off by
+    # default: batches are evals and replays, not real conversations.
+    persist: bool = False
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+
+def _session_history(request: ChatRequest) -> List[str]:
+    if request.history:
+        return request.history
+    # "guest" is shared by every anonymous user, so it gets no memory
+    if request.user_id == "guest":
+        return []
+    return session_store.history(request.user_id)
+
+def _start_deadline(request: ChatRequest):
+    start_deadline(request.deadline_ms / 1000 if request.deadline_ms else DEFAULT_CHAT_DEADLINE)
+
+def _remember(request: ChatRequest, user_text: str, bot_text: str):
+    if request.user_id == "guest":
+        return
+    session_store.append(request.user_id, "User", user_text)
+    session_store.append(request.user_id, "Pranaya", bot_text)
 
 # --- ROUTES ---
+# Every agent call below is awaited (LangChain `ainvoke`), so a single worker
+# keeps serving other chats while Gemini is working on this one.
 
 @app.get("/")
 def read_root():
     return {"status": "online", "message": "Pranaya Brain is Active 🧠"}
 
-@app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
-    user_text = request.message
-    chat_history = request.history
-    user_gender = request.gender
-    user_image = request.image
-    
-    # --- 0. PRIORITY CHECK: VISION ANALYSIS ---
-    if user_image:
-        print("👀 Vision Agent Activated...")
-        analysis = vision_agent.analyze_report(user_image)
-        
-        # For vision, we generate nudges based on the analysis
-        suggestions = nudge_agent.generate_suggestions(user_text or "Uploaded Image", analysis)
+def _bot_text_context(intent: str, response_data: dict) -> str:
+    """
+    Extracts the "Text" part of the bot's reply to give context to the Nudge Agent.
+    """
+    if "message" in response_data:
+        return response_data["message"]
+    if "data" in response_data and intent == "diagnosis":
+        return response_data["data"].get("immediate_advice", "Medical diagnosis provided.")
+    if "data" in response_data and intent == "myth_buster":
+        return response_data["data"].get("explanation", "Fact check provided.")
+    return ""
+
+def _nudge_topics(intent: str, response_data: dict) -> List[str]:
+    """
+    The strongest topic hints for the suggestion library: diagnosed
+    conditions, or the category that was just logged.
+    """
+    data = response_data.get("data") or {}
+    if intent == "diagnosis":
+        return [condition.get("name", "") for condition in data.get("potential_conditions", [])]
+    if intent == "tracker" and data.get("category"):
+        return [data["category"]]
+    return []
 
+def _start_parallel_nudge(mode: str, user_text: str, intent: str):
+    # In "parallel" mode the Nudge Agent only sees the user text, so it can run
+    # while the specialist is still answering instead of after it.
+    if mode != "parallel":
+        return None
+    return asyncio.ensure_future(_timed_nudge(user_text, "", intent))
+
+def _route_label(intent: str) -> str:
+    """
+    `intent` as a metric label. Whatever else the LLM answers becomes
+    "unknown", so free text can't create new label values.
+    """
+    # Any intent to label came from the orchestrator, so it is loaded
+    if intent == "vision" or (agents.loaded("orchestrator") and intent in agents.get("orchestrator").INTENTS):
+        return intent
+    return "unknown"
+
+async def _timed_nudge(user_text: str, bot_text: str, intent: str, topics: Optional[List[str]] = None) -> List[str]:
+    with span("nudge", route=_route_label(intent)):
+        return await (await agents.aget("nudge")).generate_suggestions(user_text, bot_text, intent, topics)
+
+# ROUTER_FUSED=1: when the orchestrator needs the LLM, that one call also
+# answers chat / myth_buster / tracker messages (see _dispatch)
+ROUTER_FUSED = os.getenv("ROUTER_FUSED", "0") == "1"
+
+async def _classify(user_text: str, chat_history: List[str], user_gender: str = "Unknown") -> dict:
+    with span("route") as stage:
+        orchestrator = await agents.aget("orchestrator")
+        if ROUTER_FUSED:
+            decision = await orchestrator.route_and_answer(user_text, chat_history, user_gender)
+        else:
+            decision = await orchestrator.classify_intent(user_text, chat_history)
+        route = _route_label(decision["agent"])
+        stage.labels["route"] = route
+    metrics.ROUTES.inc(route=route, source=decision.get("source", "llm"))
+    return decision
+
+async def _finish_nudge(mode: str, parallel_task, user_text: str, bot_text: str, payload: dict) -> dict:
+    """
+    Attaches the suggestions to the response according to `mode`.
+    """
+    intent = payload["routed_to"]
+    topics = _nudge_topics(intent, payload["response"])
+    if mode == "parallel":
+        payload["suggestions"] = await parallel_task
+    elif mode == "deferred":
+        payload["suggestions"] = []
+        payload["request_id"] = suggestion_store.submit(
+            _timed_nudge(user_text, bot_text, intent, topics)
+        )
+        payload["suggestions_pending"] = True
+    else:
+        payload["suggestions"] = await _timed_nudge(user_text, bot_text, intent, topics)
+    return payload
+
+def _tracker_reply(result: dict, user_id: str, persist: bool = True) -> dict:
+    if not result["valid"]:
         return {
-            "status": "success",
-            "routed_to": "vision",
-            "response": {
-                "type": "chat",
-                "message": analysis
-            },
-            "suggestions": suggestions
+            "type": "chat",
+            "message": result["response_text"]
         }
+    # "guest" is shared by every anonymous user, so it gets no tracker history either
+    if persist and user_id != "guest":
+        tracker_store.record(user_id, result)
+        reminders.observe(user_id, result)
+    return {
+        "type": "tracker_log", 
+        "message": result["response_text"],
+        "data": result 
+    }
 
-    # --- 1. ORCHESTRATOR (Text Only) ---
-    decision = orchestrator.classify_intent(user_text, chat_history)
-    intent = decision["agent"]
-    
-    response_data = {}
+async def _fused_reply(intent: str, answer: dict, user_text: str, user_gender: str, user_id: str, persist: bool = True) -> dict:
+    """
+    The "response" payload from the answer the fused router already wrote.
+    """
+    if intent == "tracker":
+        # The Scribe's parser still goes first, and it redoes a draft it can't file
+        result = await (await agents.aget("scribe")).extract_tracker_data(user_text, user_gender, draft=answer)
+        return _tracker_reply(result, user_id, persist)
+    if intent == "myth_buster":
+        # A vetted corpus verdict still wins over the router's own
+        return {"type": "myth", "data": (await agents.aget("myth_buster")).vetted(user_text) or answer}
+    return {"type": "chat", "message": answer["message"]}
+
+async def _dispatch(intent: str, user_text: str, chat_history: List[str], user_gender: str, user_id: str, answer: Optional[dict] = None, persist: bool = True) -> dict:
+    """
+    Runs the specialist agent for `intent` and returns the "response" payload.
+    `answer` is the fused router's answer (decision["answer"]), if it wrote one.
+    With persist=False tracker entries are answered but not stored.
+    """
+    if answer is not None:
+        return await _fused_reply(intent, answer, user_text, user_gender, user_id, persist)
 
-    # --- 2. ROUTING LOGIC ---
-    
     # A. MEDICAL EMERGENCY (Physical)
     if intent == "emergency":
-        response_data = {
+        return {
             "type": "emergency",
             "message": "CRITICAL ALERT: Please call emergency services immediately. I have detected a crisis."
         }
         
     # B. TRACKER (Water, Meds, Periods)
-    elif intent == "tracker":
-        result = scribe.extract_tracker_data(user_text, user_gender)
-        
-        if result["valid"]:
-            response_data = {
-                "type": "tracker_log", 
-                "message": result["response_text"],
-                "data": result 
-            }
-        else:
-            response_data = {
-                "type": "chat",
-                "message": result["response_text"]
-            }
+    if intent == "tracker":
+        result = await (await agents.aget("scribe")).extract_tracker_data(user_text, user_gender)
+        return _tracker_reply(result, user_id, persist)
 
     # C. DIAGNOSIS (Symptom Checker)
-    elif intent == "diagnosis":
-        result = doctor.analyze_symptoms(user_text, chat_history)
-        response_data = {"type": "diagnosis", "data": result}
+    if intent == "diagnosis":
+        result = await (await agents.aget("diagnosis")).analyze_symptoms(user_text, chat_history)
+        return {"type": "diagnosis", "data": result}
         
     # D. GENERAL KNOWLEDGE
-    elif intent == "general_knowledge":
-        reply = professor.get_info(user_text, chat_history)
-        response_data = {"type": "chat", "message": reply}
+    if intent == "general_knowledge":
+        reply = await (await agents.aget("knowledge")).get_info(user_text, chat_history)
+        return {"type": "chat", "message": reply}
         
     # E. MENTAL HEALTH
-    elif intent == "mental_health":
-        reply = nurse.get_support(user_text, chat_history)
-        response_data = {"type": "chat", "message": reply}
+    if intent == "mental_health":
+        reply = await (await agents.aget("mental_health")).get_support(user_text, chat_history)
+        return {"type": "chat", "message": reply}
         
     # F. MYTH BUSTER
-    elif intent == "myth_buster":
-        result = myth_buster.check_fact(user_text)
-        response_data = {"type": "myth", "data": result}
+    if intent == "myth_buster":
+        result = await (await agents.aget("myth_buster")).check_fact(user_text)
+        return {"type": "myth", "data": result}
         
     # G. DEFAULT CHAT
-    else:
-        response_data = {
-            "type": "chat", 
-            "message": "I'm listening. You can describe symptoms, ask health questions, log water, or upload a medical report."
-        }
+    return {
+        "type": "chat", 
+        "message": "I'm listening. You can describe symptoms, ask health questions, log water, or upload a medical report."
+    }
 
-    # --- 3. GENERATE NUDGES (The Suggestion Engine) ---
-    # We need to extract the "Text" part of the bot's reply to give context to the Nudge Agent
-    bot_text_context = ""
+async def _vision_reply(mode: str, user_text: str, analysis_coro) -> dict:
+    print("👀 Vision Agent Activated...")
+    user_text = user_text or "Uploaded Image"
+    nudge_task = _start_parallel_nudge(mode, user_text, "vision")
+    with span("agent", route="vision"):
+        analysis = await analysis_coro
     
-    # Extract text based on response type
-    if "message" in response_data:
-        bot_text_context = response_data["message"]
-    elif "data" in response_data and intent == "diagnosis":
-        bot_text_context = response_data["data"].get("immediate_advice", "Medical diagnosis provided.")
-    elif "data" in response_data and intent == "myth_buster":
-        bot_text_context = response_data["data"].get("explanation", "Fact check provided.")
+    # For vision, we generate nudges based on the analysis
+    return await _finish_nudge(mode, nudge_task, user_text, analysis, {
+        "status": "success",
+        "routed_to": "vision",
+        "response": {
+            "type": "chat",
+            "message": analysis
+        },
+    })
 
-    # Generate 3 clickable suggestions
-    suggestions = []
-    if intent != "emergency": # Don't nudge during an emergency
-        suggestions = nudge_agent.generate_suggestions(user_text, bot_text_context)
+@app.post("/chat")
+async def chat_endpoint(request: ChatRequest):
+    return await _chat(request)
 
-    return {
+async def _chat(request: ChatRequest, persist: bool = True) -> dict:
+    """
+    The /chat pipeline. persist=False (batches) leaves the tracker,
+    reminders and session memory untouched.
+    """
+    user_text = request.message
+    chat_history = _session_history(request)
+    user_gender = request.gender
+    user_image = request.image
+    mode = request.suggestions_mode if request.suggestions_mode in SUGGESTION_MODES else "inline"
+    
+    # --- 0. PRIORITY CHECK: VISION ANALYSIS ---
+    if user_image:
+        payload = await _vision_reply(mode, user_text, (await agents.aget("vision")).analyze_report(user_image))
+        if persist:
+            _remember(request, user_text or "Uploaded a medical report", payload["response"]["message"])
+        return payload
+
+    # --- 1. ORCHESTRATOR (Text Only) ---
+    # One budget for orchestrator -> specialist -> nudge (report analysis above has none)
+    _start_deadline(request)
+    decision = await _classify(user_text, chat_history, user_gender)
+    intent = decision["agent"]
+    
+    # Don't nudge during an emergency
+    nudge_task = _start_parallel_nudge(mode, user_text, intent) if intent != "emergency" else None
+
+    # --- 2. ROUTING LOGIC ---
+    with span("agent", route=_route_label(intent)):
+        response_data = await _dispatch(intent, user_text, chat_history, user_gender, request.user_id, decision.get("answer"), persist)
+
+    payload = {
         "status": "success",
         "routed_to": intent,
         "response": response_data,
-        "suggestions": suggestions # <--- Sent to Frontend
     }
 
+    bot_text_context = _bot_text_context(intent, response_data)
+    if persist:
+        _remember(request, user_text, bot_text_context)
+
+    if intent == "emergency":
+        payload["suggestions"] = []
+        return payload
+
+    # --- 3. GENERATE NUDGES (The Suggestion Engine) ---
+    # Generate 3 clickable suggestions (sent to Frontend)
+    return await _finish_nudge(mode, nudge_task, user_text, bot_text_context, payload)
+
+# --- BATCH ---
+async def _batch_item(request: ChatRequest, route_only: bool, persist: bool) -> dict:
+    """
+    One /chat/batch item. Errors stay in their own slot instead of failing the batch.
+    """
+    usage = start_request_usage()
+    started = time.perf_counter()
+    try:
+        if route_only:
+            decision = await _classify(request.message, _session_history(request), request.gender)
+            result = {"status": "success", "routed_to": decision["agent"], "decision": decision}
+        else:
+            result = await _chat(request, persist)
+    except Exception as e:
+        print(f"Batch Item Error: {e}")
+        result = {"status": "error", "message": str(e)}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    result["usage"] = usage
+    return result
+
+async def run_batch(requests: List[ChatRequest], concurrency: int, route_only: bool = False, persist: bool = False) -> List[dict]:
+    return await gather_bounded(requests, lambda request: _batch_item(request, route_only, persist), concurrency)
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(batch: BatchChatRequest):
+    """
+    Runs many /chat requests with bounded concurrency. Results come back in
+    the order of `requests`, each with its latency and token usage.
+    """
+    if len(batch.requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} requests per batch")
+    concurrency = max(1, min(batch.concurrency, BATCH_MAX_CONCURRENCY))
+    results = await run_batch(batch.requests, concurrency, batch.route_only, batch.persist)
+    return {"status": "success", "results": results}
+
+# --- STREAMING ---
+# Free-text specialists whose answer can be forwarded token by token.
+# intent -> (agent, streaming method)
+STREAMING_AGENTS = {
+    "general_knowledge": ("knowledge", "stream_info"),
+    "mental_health": ("mental_health", "stream_support"),
+}
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _chat_events(request: ChatRequest) -> AsyncIterator[str]:
+    """
+    Event order: "route" -> "token"* (or one "response") -> "suggestions" -> "done".
+    Diagnoses send "diagnosis" events ({"field", "value"}: triage_level, then
+    each potential_conditions entry, ...) before their "response".
+    """
+    user_text = request.message
+    chat_history = _session_history(request)
+    parallel = request.suggestions_mode == "parallel"
+    topics: List[str] = []
+
+    try:
+        if request.image:
+            intent = "vision"
+            nudge_task = _start_parallel_nudge("parallel" if parallel else "inline", user_text or "Uploaded Image", intent)
+            yield _sse("route", {"routed_to": intent})
+
+            parts = []
+            async for token in (await agents.aget("vision")).stream_report(request.image):
+                parts.append(token)
+                yield _sse("token", {"text": token})
+            bot_text_context = "".join(parts)
+            _remember(request, user_text or "Uploaded a medical report", bot_text_context)
+            user_text = user_text or "Uploaded Image"
+        else:
+            _start_deadline(request)
+            decision = await _classify(user_text, chat_history, request.gender)
+            intent = decision["agent"]
+            nudge_task = _start_parallel_nudge("parallel" if parallel else "inline", user_text, intent) if intent != "emergency" else None
+            yield _sse("route", {"routed_to": intent, "confidence": decision.get("confidence")})
+
+            if intent in STREAMING_AGENTS:
+                parts = []
+                name, method = STREAMING_AGENTS[intent]
+                async for token in getattr(await agents.aget(name), method)(user_text, chat_history):
+                    parts.append(token)
+                    yield _sse("token", {"text": token})
+                bot_text_context = "".join(parts)
+            elif intent == "diagnosis":
+                # Triage first, then each condition as soon as it is complete
+                async for field, value in (await agents.aget("diagnosis")).stream_diagnosis(user_text, chat_history):
+                    if field == "result":
+                        response_data = {"type": "diagnosis", "data": value}
+                    else:
+                        yield _sse("diagnosis", {"field": field, "value": value})
+                yield _sse("response", response_data)
+                bot_text_context = _bot_text_context(intent, response_data)
+                topics = _nudge_topics(intent, response_data)
+            else:
+                response_data = await _dispatch(intent, user_text, chat_history, request.gender, request.user_id, decision.get("answer"))
+                yield _sse("response", response_data)
+                bot_text_context = _bot_text_context(intent, response_data)
+                topics = _nudge_topics(intent, response_data)
+            _remember(request, user_text, bot_text_context)
+
+        if intent != "emergency":
+            if nudge_task is not None:
+                suggestions = await nudge_task
+            else:
+                suggestions = await _timed_nudge(user_text, bot_text_context, intent, topics)
+            yield _sse("suggestions", {"suggestions": suggestions})
+    except Exception as e:
+        print(f"Stream Error: {e}")
+        yield _sse("error", {"message": "I'm having trouble answering right now. Please try again."})
+
+    yield _sse("done", {})
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-sent-events version of /chat. Long free-text answers (knowledge,
+    mental health, vision) arrive as "token" events while they are generated.
+    """
+    return StreamingResponse(
+        _chat_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- REPORT UPLOADS ---
+# Headroom for multipart boundaries and the small text fields next to the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+async def _read_upload(request: Request, message: str, suggestions_mode: str):
+    """
+    Spools a report upload, multipart/form-data ("file" part, optional
+    "message" / "suggestions_mode" fields) or a raw image body, into a
+    size-capped temp file. Returns (file, mime_type, message, mode); the
+    caller owns the file and must close it.
+    """
+    max_bytes = max_upload_bytes()
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            # Parsed from the capped stream: request.form() would spool the whole part before any size check
+            parser = MultiPartParser(
+                request.headers, capped(request.stream(), max_bytes + MULTIPART_OVERHEAD_BYTES), max_files=1, max_fields=8
+            )
+            try:
+                form = await parser.parse()
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str) or upload.size > max_bytes:
+                # The parser's temp files are ours: nothing else closes them
+                for value in form.values():
+                    if not isinstance(value, str):
+                        value.file.close()
+                if upload is None or isinstance(upload, str):
+                    raise HTTPException(status_code=400, detail='Missing "file" part')
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+            image_file = upload.file
+            image_file.seek(0)
+            mime_type = upload.content_type or "image/jpeg"
+            message = form.get("message") or message
+            suggestions_mode = form.get("suggestions_mode") or suggestions_mode
+        else:
+            image_file = await spool_stream(request.stream(), max_bytes)
+            mime_type = content_type or "image/jpeg"
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    mode = suggestions_mode if suggestions_mode in SUGGESTION_MODES else "inline"
+    return image_file, mime_type, message, mode
+
+@app.post("/reports/upload")
+async def upload_report(request: Request, message: str = "", suggestions_mode: str = "inline"):
+    """
+    Vision analysis for an uploaded report file (see _read_upload).
+
+    Unlike the base64 `image` field of /chat, the upload is never held as a
+    string: it is spooled to a size-capped temp file (UPLOAD_MAX_BYTES) and
+    the vision pipeline reads the file object directly.
+    """
+    image_file, mime_type, message, mode = await _read_upload(request, message, suggestions_mode)
+    try:
+        return await _vision_reply(mode, message, (await agents.aget("vision")).analyze_image(image_file, mime_type))
+    finally:
+        image_file.close()
+
+# --- VISION JOB QUEUE ---
+# Report analysis off the request path: submit returns a job id immediately and
+# a bounded pool of workers runs vision + nudges, so bursts of uploads can't
+# starve text chat. Sized with VISION_WORKERS / VISION_QUEUE_DEPTH.
+async def _run_vision_job(payload: dict) -> dict:
+    return await _vision_reply(
+        "inline",
+        payload["message"],
+        (await agents.aget("vision")).analyze_image(payload["file"], payload["mime_type"]),
+    )
+
+vision_jobs = JobQueue(
+    _run_vision_job,
+    workers=int(os.getenv("VISION_WORKERS", "4")),
+    max_depth=int(os.getenv("VISION_QUEUE_DEPTH", "100")),
+    cleanup=lambda payload: payload["file"].close(),
+)
+
+@app.post("/reports/jobs", status_code=202)
+async def submit_report_job(request: Request, message: str = ""):
+    """
+    Queues a report upload (same formats as /reports/upload) for analysis.
+    Poll GET /reports/jobs/{job_id} for the result.
+    """
+    image_file, mime_type, message, _ = await _read_upload(request, message, "inline")
+    try:
+        job = vision_jobs.submit({"file": image_file, "mime_type": mime_type, "message": message})
+    except QueueFull as e:
+        image_file.close()
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    return {"job_id": job.id, "status": job.status, "position": vision_jobs.position(job)}
+
+@app.get("/reports/jobs/{job_id}")
+def get_report_job(job_id: str):
+    job = vision_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id")
+    data = job.to_dict()
+    if job.status == "queued":
+        data["position"] = vision_jobs.position(job)
+    return data
+
+@app.get("/stats/jobs")
+def job_stats():
+    """
+    Vision queue depth, wait time and run time.
+    """
+    return vision_jobs.stats()
+
+# --- TRACKER DASHBOARD ---
+# Plain `def` routes: FastAPI runs them in its threadpool, off the event loop.
+
+@app.get("/tracker/{user_id}/entries")
+def tracker_entries(user_id: str, category: Optional[str] = None, days: int = Query(7, ge=1, le=3660), limit: int = Query(200, ge=1)):
+    return {"user_id": user_id, "entries": tracker_store.entries(user_id, category, days, min(limit, 1000))}
+
+@app.get("/tracker/{user_id}/daily")
+def tracker_daily(user_id: str, category: str = "water", days: int = Query(7, ge=1, le=3660)):
+    """
+    Per-day totals, e.g. water in ml for the last `days` days.
+    """
+    return {"user_id": user_id, "category": category, "days": tracker_store.daily_totals(user_id, category, days)}
+
+@app.get("/tracker/{user_id}/adherence")
+def tracker_adherence(user_id: str, days: int = Query(30, ge=1, le=3660), item: Optional[str] = None):
+    """
+    Medication adherence: share of days with at least one dose logged.
+    """
+    return {"user_id": user_id, **tracker_store.adherence(user_id, days, item)}
+
+@app.get("/reminders/{user_id}")
+def get_reminders(user_id: str):
+    """
+    Reminders that fired for this user since the last call (REMINDER_SINK=inbox).
+    """
+    if not hasattr(reminders.sink, "pop"):
+        raise HTTPException(status_code=404, detail="Reminders are not delivered to an inbox (REMINDER_SINK)")
+    return {"user_id": user_id, "reminders": reminders.sink.pop(user_id)}
+
+@app.get("/stats/reminders")
+def reminder_stats():
+    return reminders.stats()
+
+@app.get("/stats/cache")
+def cache_stats():
+    """
+    Hit/miss counters for the agent response caches and the suggestion library.
+    """
+    stats = {namespace: cache.stats() for namespace, cache in ResponseCache.registry.items()}
+    if agents.loaded("nudge"):
+        stats["suggestion_library"] = agents.get("nudge").library.stats()
+    return stats
+
+@app.get("/stats/llm")
+def llm_stats():
+    """
+    Per-model request coalescing counters.
+    """
+    # Imported here so startup doesn't load LangChain for a stats route
+    from app.services.llm_service import LLMService
+    return LLMService.stats()
+
+
+@app.get("/stats/agents")
+def agent_stats():
+    """
+    Which agents are loaded, and how long each took to import and build.
+    """
+    return agents.stats()
+
+@app.get("/stats/usage")
+def usage_stats():
+    """
+    Input/output/cached tokens per agent since startup, plus prompt cache counters.
+    """
+    from app.services.llm_service import LLMService
+    return LLMService.usage_stats()
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus text format: request, stage and LLM latency histograms, tokens,
+    routing decisions, cache lookups and fallbacks.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/suggestions/{request_id}")
+async def get_suggestions(request_id: str, wait: float = 10.0):
+    """
+    Follow-up for suggestions_mode="deferred". Long-polls up to `wait` seconds.
+    """
+    if request_id not in suggestion_store:
+        raise HTTPException(status_code=404, detail="Unknown or expired request_id")
+
+    suggestions = await suggestion_store.get(request_id, wait_seconds=max(0.0, min(wait, 30.0)))
+    if suggestions is None:
+        return {"status": "pending", "request_id": request_id, "suggestions": []}
+    return {"status": "success", "request_id": request_id, "suggestions": suggestions}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,19 @@
+import asyncio
+from typing import Awaitable, Callable, Iterable, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+async def gather_bounded(items: Iterable[T], worker: Callable[[T], Awaitable[R]], concurrency: int) -> List[R]:
+    """
+    worker(item) for every item, at most `concurrency` at a time. Results
+    are in the order of `items`, whatever order they finish in.
+    """
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item: T) -> R:
+        async with slots:
+            return await worker(item)
+
+    return await asyncio.gather(*(run(item) for item in items))
@@ -0,0 +1,43 @@
+import contextvars
+import os
+import time
+from typing import Optional
+
+# Absolute time.monotonic() by which the current request must answer
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("pranaya_deadline", default=None)
+
+DEFAULT_CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE_SECONDS", "30"))
+
+
+class DeadlineExceeded(Exception):
+    """
+    The request's time budget ran out before this LLM call could finish.
+    Not retryable: agents answer with their fallback instead.
+    """
+
+
+def start_deadline(seconds: Optional[float]) -> Optional[float]:
+    """
+    Gives the current request `seconds` in total. Everything it awaits
+    (orchestrator, specialist, nudge, tasks it spawns) shares the budget,
+    since context variables follow the request into its tasks.
+    """
+    deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+    _deadline.set(deadline)
+    return deadline
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left, or None when the request has no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
@@ -0,0 +1,98 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+from typing import BinaryIO, Optional, Tuple, Union
+
+from PIL import Image, ImageOps
+
+ImageSource = Union[bytes, BinaryIO]
+
+
+class PreparedImage:
+    """
+    A report image ready for the vision model: downscaled, metadata-free and
+    re-encoded, plus the hash of the ORIGINAL upload for de-duplication.
+    """
+
+    def __init__(self, data: bytes, mime_type: str, content_hash: str, original_size: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.content_hash = content_hash
+        self.original_size = original_size
+
+    def to_data_url(self) -> str:
+        return f"data:{self.mime_type};base64,{base64.b64encode(self.data).decode('ascii')}"
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """
+    Accepts "data:image/jpeg;base64,..." (what the frontend sends) or bare base64.
+    """
+    _, _, payload = data_url.rpartition(",")
+    try:
+        return base64.b64decode(payload, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 image: {e}")
+
+
+def data_url_mime(data_url: str, default: str = "image/jpeg") -> str:
+    if data_url.startswith("data:") and ";" in data_url:
+        return data_url[5:data_url.index(";")] or default
+    return default
+
+
+def content_hash(source: ImageSource) -> str:
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    else:
+        source.seek(0)
+        for block in iter(lambda: source.read(1 << 16), b""):
+            digest.update(block)
+        source.seek(0)
+    return digest.hexdigest()
+
+
+def _target_format() -> Tuple[str, str]:
+    fmt = os.getenv("VISION_IMAGE_FORMAT", "JPEG").upper()
+    if fmt == "WEBP":
+        return "WEBP", "image/webp"
+    return "JPEG", "image/jpeg"
+
+
+def preprocess_image(source: ImageSource, digest: Optional[str] = None) -> PreparedImage:
+    """
+    Decodes, applies EXIF orientation, downscales to VISION_MAX_DIMENSION
+    (default 1600 px on the long side), drops all metadata and re-encodes as
+    JPEG (or WebP with VISION_IMAGE_FORMAT=webp) at VISION_IMAGE_QUALITY.
+    CPU-bound: call it through asyncio.to_thread() from request handlers.
+    """
+    max_dimension = int(os.getenv("VISION_MAX_DIMENSION", "1600"))
+    quality = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+    fmt, mime_type = _target_format()
+
+    digest = digest or content_hash(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        original_size = len(source)
+        stream = io.BytesIO(source)
+    else:
+        source.seek(0, io.SEEK_END)
+        original_size = source.tell()
+        source.seek(0)
+        stream = source
+
+    with Image.open(stream) as image:
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale: far less work for phone photos
+        image.draft("RGB", (max_dimension, max_dimension))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        out = io.BytesIO()
+        # A fresh save without exif=/icc_profile= carries no metadata over
+        image.save(out, format=fmt, quality=quality, optimize=True)
+
+    return PreparedImage(out.getvalue(), mime_type, digest, original_size)
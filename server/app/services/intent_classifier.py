@@ -0,0 +1,123 @@
+import json
+import math
+import os
+import random
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from app.services.text import normalize_text
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "..", "data", "intent_corpus.jsonl")
+
+
+class IntentClassifier:
+    """
+    Zero-LLM first stage for the Master Orchestrator.
+
+    TF-IDF over word unigrams + bigrams feeding a small multinomial logistic
+    regression, trained at startup from the labelled corpus in app/data.
+    predict() costs a few dictionary lookups, and its confidence is a real
+    softmax probability, so the orchestrator can decide when to ask the LLM.
+    """
+
+    def __init__(self, epochs: int = 30, learning_rate: float = 0.5, l2: float = 1e-4, seed: int = 7):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.seed = seed
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        # feature -> one weight per label
+        self.weights: Dict[str, List[float]] = {}
+        self.bias: List[float] = []
+
+    @classmethod
+    def from_corpus(cls, path: str = DEFAULT_CORPUS, **kwargs) -> "IntentClassifier":
+        examples = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    examples.append((row["text"], row["intent"]))
+        model = cls(**kwargs)
+        model.fit(examples)
+        return model
+
+    # --- FEATURES ---
+
+    @staticmethod
+    def _terms(text: str) -> List[str]:
+        tokens = ["<num>" if tok.isdigit() else tok for tok in normalize_text(text).split()]
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens + bigrams
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        counts = Counter(term for term in self._terms(text) if term in self.idf)
+        vector = {term: (1.0 + math.log(n)) * self.idf[term] for term, n in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        if norm:
+            vector = {term: v / norm for term, v in vector.items()}
+        return vector
+
+    # --- TRAINING ---
+
+    def fit(self, examples: List[Tuple[str, str]]):
+        self.labels = sorted({label for _, label in examples})
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        n_labels = len(self.labels)
+
+        doc_freq = Counter()
+        for text, _ in examples:
+            doc_freq.update(set(self._terms(text)))
+        n_docs = len(examples)
+        self.idf = {term: math.log((1 + n_docs) / (1 + df)) + 1.0 for term, df in doc_freq.items()}
+
+        data = [(self._vectorize(text), label_index[label]) for text, label in examples]
+        self.weights = {term: [0.0] * n_labels for term in self.idf}
+        self.bias = [0.0] * n_labels
+
+        rng = random.Random(self.seed)
+        for epoch in range(self.epochs):
+            rng.shuffle(data)
+            lr = self.learning_rate / (1.0 + epoch * 0.1)
+            for vector, target in data:
+                probs = self._softmax(self._scores(vector))
+                for k in range(n_labels):
+                    grad = probs[k] - (1.0 if k == target else 0.0)
+                    self.bias[k] -= lr * grad
+                    for term, value in vector.items():
+                        w = self.weights[term]
+                        w[k] -= lr * (grad * value + self.l2 * w[k])
+
+    # --- INFERENCE ---
+
+    def _scores(self, vector: Dict[str, float]) -> List[float]:
+        scores = list(self.bias)
+        for term, value in vector.items():
+            for k, w in enumerate(self.weights[term]):
+                scores[k] += w * value
+        return scores
+
+    @staticmethod
+    def _softmax(scores: List[float]) -> List[float]:
+        top = max(scores)
+        exps = [math.exp(s - top) for s in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        vector = self._vectorize(text)
+        if not vector:
+            # Nothing we have seen before: a flat distribution means "ask the LLM"
+            return {label: 1.0 / len(self.labels) for label in self.labels}
+        probs = self._softmax(self._scores(vector))
+        return dict(zip(self.labels, probs))
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        Returns (label, confidence) for the most likely intent.
+        """
+        probs = self.predict_proba(text)
+        label = max(probs, key=probs.get)
+        return label, probs[label]
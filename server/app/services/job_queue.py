@@ -0,0 +1,165 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, payload: Any):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = "queued"  # queued -> running -> done | failed
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+def _summary(samples: Deque[float]) -> dict:
+    if not samples:
+        return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "avg": round(sum(ordered) / len(ordered), 4),
+        "p50": round(pick(0.50), 4),
+        "p95": round(pick(0.95), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class JobQueue:
+    """
+    Submit/poll queue with a fixed pool of asyncio workers.
+
+    submit() returns immediately; at most `workers` jobs run at once and at
+    most `max_depth` wait, so a burst of slow jobs can't take over the server
+    and capacity can be sized on its own. Finished jobs are kept in memory
+    for `result_ttl` seconds for the status endpoint.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[Any]],
+        workers: int = 4,
+        max_depth: int = 100,
+        result_ttl: float = 3600,
+        max_jobs: int = 10000,
+        cleanup: Optional[Callable[[Any], None]] = None,
+    ):
+        self.handler = handler
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self.cleanup = cleanup
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+        self._run_times: Deque[float] = deque(maxlen=1000)
+
+    def _ensure_workers(self):
+        # Started lazily from inside the event loop on the first submit
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.ensure_future(self._worker()))
+
+    def submit(self, payload: Any) -> Job:
+        self._ensure_workers()
+        self._prune()
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull(f"{self.max_depth} jobs already waiting")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        """
+        How many queued jobs are ahead of `job` (0 = next to run).
+        """
+        ahead = 0
+        for other in self._jobs.values():
+            if other is job:
+                return ahead
+            if other.status == "queued":
+                ahead += 1
+        return ahead
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._wait_times.append(job.started_at - job.submitted_at)
+            self.running += 1
+            try:
+                job.result = await self.handler(job.payload)
+                job.status = "done"
+                self.completed += 1
+            except Exception as e:
+                print(f"Job Queue Error: {e}")
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                self.running -= 1
+                job.finished_at = time.time()
+                self._run_times.append(job.finished_at - job.started_at)
+                if self.cleanup is not None:
+                    self.cleanup(job.payload)
+                job.payload = None
+                self._queue.task_done()
+
+    def _prune(self):
+        now = time.time()
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            finished = job.finished_at is not None
+            if finished and (now - job.finished_at > self.result_ttl or len(self._jobs) > self.max_jobs):
+                del self._jobs[job_id]
+            elif not finished and len(self._jobs) <= self.max_jobs:
+                break
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_depth": self.max_depth,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds": _summary(self._wait_times),
+            "run_seconds": _summary(self._run_times),
+        }
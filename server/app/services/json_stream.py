@@ -0,0 +1,148 @@
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+
+WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONObject:
+    """
+    Parses one top-level JSON object while it is still being generated.
+
+    feed() returns ("field", key, value) as soon as a top-level value is
+    complete, and ("item", key, element) for each finished element of the
+    arrays named in `stream_arrays`, before the array itself closes.
+    `result` always holds everything completed so far, so a truncated stream
+    still leaves a usable partial object. Text before the first "{" (a
+    ```json fence, a sentence) is skipped.
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ()):
+        self.stream_arrays = set(stream_arrays)
+        self.result: dict = {}
+        self.complete = False
+        self._buf = ""
+        self._pos = 0
+        self._started = False
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        # Top-level bookkeeping: are we reading a key or a value, and where it began
+        self._expect = "key"
+        self._key: Optional[str] = None
+        self._token_start = -1
+        self._item_start = -1
+
+    def feed(self, text: str) -> List[Tuple]:
+        events: List[Tuple] = []
+        if self.complete:
+            return events
+        self._buf += text
+        if not self._started:
+            start = self._buf.find("{")
+            if start == -1:
+                return events
+            self._buf = self._buf[start:]
+            self._pos = 0
+            self._started = True
+
+        buf = self._buf
+        while self._pos < len(buf):
+            i = self._pos
+            ch = buf[i]
+            self._pos += 1
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if depth == 1:
+                        self._end_token(i + 1, events)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if depth == 1:
+                    self._token_start = i
+                continue
+
+            if ch in "{[":
+                if depth == 1 and self._expect == "value":
+                    self._token_start = i
+                elif depth == 2 and self._stack[-1] == "[" and self._key in self.stream_arrays:
+                    self._item_start = i
+                self._stack.append(ch)
+                continue
+
+            if ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if depth == 0:
+                    # Closing the top-level object; a bare scalar may end here
+                    if self._token_start != -1 and self._expect == "value":
+                        self._end_token(i, events)
+                    self.complete = True
+                    return events
+                if depth == 1:
+                    self._end_token(i + 1, events)
+                elif depth == 2 and self._item_start != -1 and self._key in self.stream_arrays:
+                    self._emit_item(buf[self._item_start:i + 1], events)
+                    self._item_start = -1
+                continue
+
+            if depth != 1:
+                continue
+            if ch == ":":
+                self._expect = "value"
+                self._token_start = -1
+            elif ch == ",":
+                if self._token_start != -1 and self._expect == "value":
+                    self._end_token(i, events)
+                self._expect = "key"
+                self._token_start = -1
+            elif ch not in WHITESPACE and self._token_start == -1 and self._expect == "value":
+                # Start of a number / true / false / null
+                self._token_start = i
+        return events
+
+    def _end_token(self, end: int, events: List[Tuple]):
+        raw = self._buf[self._token_start:end].strip()
+        self._token_start = -1
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        if self._expect == "key":
+            self._key = value
+            return
+        if self._key is None:
+            return
+        if self._key in self.stream_arrays and isinstance(value, list):
+            # Items were already emitted one by one; keep the canonical list
+            self.result[self._key] = value
+        else:
+            self.result[self._key] = value
+            events.append(("field", self._key, value))
+        self._expect = "done"
+
+    def _emit_item(self, raw: str, events: List[Tuple]):
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        self.result.setdefault(self._key, []).append(item)
+        events.append(("item", self._key, item))
+
+
+def parse_partial_object(text: str, stream_arrays: Iterable[str] = ()) -> Tuple[dict, bool]:
+    """
+    Everything complete in a (possibly truncated) JSON object: (result, complete).
+    """
+    parser = IncrementalJSONObject(stream_arrays)
+    parser.feed(text)
+    return parser.result, parser.complete
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app.services.session_store import estimate_tokens
+
+# Offline stand-ins for the Gemini client, selected with LLM_BACKEND:
+#
+#   google  the real API (default)
+#   fake    deterministic canned answers with simulated latency
+#   record  the real API, every answer also appended to LLM_CASSETTE
+#   replay  answers (and their latency) from LLM_CASSETTE; misses fall back to fake
+#
+# They only implement what ManagedModel calls: ainvoke() and astream().
+
+KeyFn = Callable[[str, object, dict], str]
+
+
+def _to_messages(messages) -> list:
+    if hasattr(messages, "to_messages"):
+        return messages.to_messages()
+    if isinstance(messages, str):
+        return [("human", messages)]
+    return list(messages)
+
+
+def _text(message) -> str:
+    content = message[1] if isinstance(message, tuple) else message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+
+def _usage(messages, content: str) -> dict:
+    input_tokens = sum(estimate_tokens(_text(message)) for message in _to_messages(messages))
+    output_tokens = estimate_tokens(content)
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "input_token_details": {"cache_read": 0},
+    }
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    "fixed:0.2" | "uniform:0.1,0.5" | "normal:0.4,0.1" | "lognormal:0.4,0.35"
+    (lognormal takes the median and sigma). Seconds, never negative.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+
+# --- CANNED ANSWERS (keyed on a marker in the agent's system prompt) ---
+
+def _user_input(messages) -> str:
+    text = _text(_to_messages(messages)[-1])
+    marker = "CURRENT USER INPUT:"
+    return text.split(marker, 1)[1].strip() if marker in text else text
+
+
+ROUTING_KEYWORDS = (
+    ("mental_health", ("sad", "anxious", "lonely", "stress", "depressed", "cry")),
+    ("myth_buster", ("true", "myth", "really")),
+    ("tracker", ("drank", "water", "took", "period", "log")),
+    ("diagnosis", ("pain", "fever", "ache", "cough", "vomit", "since", "hurts")),
+    ("general_knowledge", ("what", "how", "why", "explain")),
+)
+
+
+def _fake_route(messages, kwargs) -> str:
+    text = _user_input(messages).lower()
+    for agent, words in ROUTING_KEYWORDS:
+        if any(word in text for word in words):
+            return agent
+    return "chat"
+
+
+def _fake_diagnosis(messages, kwargs) -> str:
+    reasoning = (
+        "The symptoms described match this condition closely. Paracetamol 650mg can help with fever and pain. "
+        "A CBC and relevant antigen tests would confirm it. Manage at home unless symptoms worsen, then visit a doctor."
+    )
+    conditions = [
+        {"name": name, "likelihood": likelihood, "reasoning": reasoning, "severity": severity}
+        for name, likelihood, severity in (
+            ("Viral Influenza", "High", "Moderate"), ("Common Cold", "Medium", "Mild"), ("Dengue Fever", "Low", "High"),
+        )
+    ]
+    return json.dumps({
+        "triage_level": "Consult Doctor",
+        "potential_conditions": conditions,
+        "immediate_advice": "Rest, drink plenty of fluids and monitor your temperature. Go to the ER if you have trouble breathing.",
+        "questions_to_ask": ["How high is the fever?", "Any rash or bleeding?"],
+    })
+
+
+def _fake_fused(messages, kwargs) -> str:
+    agent = _fake_route(messages, kwargs)
+    return json.dumps({"agent": agent, "answer": FAKE_FUSED_ANSWERS.get(agent)})
+
+
+FAKE_FUSED_ANSWERS = {
+    "chat": {"message": "Hi! I'm here for anything health related: symptoms, questions, or logging water and medicines."},
+    "myth_buster": {
+        "verdict": "MYTH",
+        "explanation": "This is a common belief, but studies do not support it. The effect is much smaller than claimed.",
+        "source": "WHO",
+    },
+    "tracker": {
+        "valid": True, "category": "water", "item": "Water", "quantity": "2 glasses",
+        "response_text": "Logged 2 glasses of water 💧",
+    },
+}
+
+
+# Checked in order: the fused router's prompt also contains "Master Orchestrator"
+FAKE_ANSWERS = (
+    ("FUSED ANSWER MODE", _fake_fused),
+    ("Master Orchestrator", _fake_route),
+    ("Dr. Pranaya", _fake_diagnosis),
+    ("Myth Buster", lambda m, k: json.dumps({
+        "verdict": "MYTH",
+        "explanation": "This is a common belief, but studies do not support it. The effect is much smaller than claimed.",
+        "source": "WHO",
+    })),
+    ("Agent Scribe", lambda m, k: json.dumps({
+        "valid": True, "category": "water", "item": "Water", "quantity": "2 glasses",
+        "response_text": "Logged 2 glasses of water 💧",
+    })),
+    ("Pranaya Nudge", lambda m, k: json.dumps(["What should I eat?", "Is it contagious?", "When to see a doctor?"])),
+    ("Pranaya Memory", lambda m, k: "The user discussed symptoms and logged water intake. They were calm."),
+    ("Pranaya Lab Tech", lambda m, k: (
+        "<h3>🧪 Test Summary</h3>Complete Blood Count<br><h3>📊 Detailed Analysis</h3><ul><li><b>Hemoglobin:</b> 11.2 g/dL - "
+        "<span class=\"text-red-600 font-bold\">LOW</span></li></ul><h3>💡 Next Steps</h3>Consult a General Physician."
+    )),
+    ("Pranaya Companion", lambda m, k: (
+        "Oh, I hear you, and it takes courage to say that. 🌿 It sounds like you're carrying a lot today. "
+        "I'm right here with you. Do you want to tell me a little about what's been weighing on your heart?"
+    )),
+    ("Pranaya Knowledge", lambda m, k: (
+        "It is a common condition with several causes. Most cases are mild and improve with rest, fluids and simple care. "
+        "See a doctor if symptoms are severe, last more than a few days, or you are in a high-risk group."
+    )),
+)
+
+
+class FakeChatModel:
+    """
+    Deterministic offline model. The answer depends only on the prompt; the
+    latency is time-to-first-token from LLM_FAKE_LATENCY plus output tokens
+    at LLM_FAKE_TOKENS_PER_SECOND, seeded by LLM_FAKE_SEED, the prompt and
+    the call number, so runs are reproducible.
+    """
+
+    def __init__(self, model: str, key_fn: KeyFn):
+        self.model = model
+        self.key_fn = key_fn
+        self.latency = parse_latency(os.getenv("LLM_FAKE_LATENCY", "lognormal:0.4,0.35"))
+        self.tokens_per_second = float(os.getenv("LLM_FAKE_TOKENS_PER_SECOND", "250"))
+        self.seed = os.getenv("LLM_FAKE_SEED", "0")
+        self.calls = 0
+
+    def answer(self, messages, kwargs: dict) -> str:
+        system = " ".join(_text(message) for message in _to_messages(messages)[:-1])
+        for marker, build in FAKE_ANSWERS:
+            if marker in system:
+                return build(messages, kwargs)
+        return "OK"
+
+    def _timings(self, messages, kwargs: dict, content: str):
+        self.calls += 1
+        rng = random.Random(f"{self.seed}:{self.key_fn(self.model, messages, kwargs)}:{self.calls}")
+        first_token = self.latency(rng)
+        generation = estimate_tokens(content) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return first_token, generation
+
+    async def ainvoke(self, messages, **kwargs):
+        content = self.answer(messages, kwargs)
+        first_token, generation = self._timings(messages, kwargs, content)
+        await asyncio.sleep(first_token + generation)
+        return AIMessage(content=content, usage_metadata=_usage(messages, content))
+
+    async def astream(self, messages, **kwargs):
+        content = self.answer(messages, kwargs)
+        first_token, generation = self._timings(messages, kwargs, content)
+        await asyncio.sleep(first_token)
+        pieces = [content[i:i + 40] for i in range(0, len(content), 40)] or [""]
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(generation / len(pieces))
+            chunk = AIMessageChunk(content=piece)
+            if index == len(pieces) - 1:
+                chunk.usage_metadata = _usage(messages, content)
+            yield chunk
+
+
+class Cassette:
+    """
+    JSONL file of recorded answers: {"key", "model", "content", "usage", "latency"}.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, List[dict]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry["key"], []).append(entry)
+
+    def append(self, entry: dict):
+        with self._lock:
+            self.entries.setdefault(entry["key"], []).append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def next(self, key: str) -> Optional[dict]:
+        """
+        Recorded answers for the same prompt are replayed in turn.
+        """
+        entries = self.entries.get(key)
+        if not entries:
+            return None
+        index = self._next.get(key, 0)
+        self._next[key] = index + 1
+        return entries[index % len(entries)]
+
+
+class RecordingChatModel:
+    def __init__(self, model: str, client, cassette: Cassette, key_fn: KeyFn):
+        self.model = model
+        self.client = client
+        self.cassette = cassette
+        self.key_fn = key_fn
+
+    def _save(self, messages, kwargs: dict, content: str, usage: Optional[dict], latency: float):
+        self.cassette.append({
+            "key": self.key_fn(self.model, messages, kwargs),
+            "model": self.model,
+            "content": content,
+            "usage": usage,
+            "latency": round(latency, 4),
+        })
+
+    async def ainvoke(self, messages, **kwargs):
+        started = time.monotonic()
+        response = await self.client.ainvoke(messages, **kwargs)
+        self._save(messages, kwargs, response.content, response.usage_metadata, time.monotonic() - started)
+        return response
+
+    async def astream(self, messages, **kwargs):
+        started = time.monotonic()
+        parts = []
+        usage = None
+        async for chunk in self.client.astream(messages, **kwargs):
+            parts.append(chunk.content if isinstance(chunk.content, str) else "")
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+            yield chunk
+        self._save(messages, kwargs, "".join(parts), usage, time.monotonic() - started)
+
+
+class ReplayChatModel:
+    """
+    Serves recorded answers with their recorded latency. Prompts that were
+    never recorded (e.g. a different history) fall back to FakeChatModel.
+    """
+
+    def __init__(self, model: str, cassette: Cassette, key_fn: KeyFn):
+        self.model = model
+        self.cassette = cassette
+        self.key_fn = key_fn
+        self.fallback = FakeChatModel(model, key_fn)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, messages, kwargs: dict) -> Optional[dict]:
+        entry = self.cassette.next(self.key_fn(self.model, messages, kwargs))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    async def ainvoke(self, messages, **kwargs):
+        entry = self._lookup(messages, kwargs)
+        if entry is None:
+            return await self.fallback.ainvoke(messages, **kwargs)
+        await asyncio.sleep(entry["latency"])
+        return AIMessage(content=entry["content"], usage_metadata=entry["usage"] or _usage(messages, entry["content"]))
+
+    async def astream(self, messages, **kwargs):
+        entry = self._lookup(messages, kwargs)
+        if entry is None:
+            async for chunk in self.fallback.astream(messages, **kwargs):
+                yield chunk
+            return
+        await asyncio.sleep(entry["latency"])
+        yield AIMessageChunk(content=entry["content"], usage_metadata=entry["usage"] or _usage(messages, entry["content"]))
@@ -1,31 +1,505 @@
+import asyncio
+import hashlib
+import json
 import os
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import SystemMessage
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.llm_backends import Cassette, FakeChatModel, RecordingChatModel, ReplayChatModel
+from app.services.metrics import HEDGES, record_llm_call
+from app.services.prompt_cache import PromptCache
+from app.services.singleflight import SingleFlight
+from app.services.text import normalize_text
+from app.services.usage import merge_usage, usage_tracker
 
 load_dotenv()
 
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# HTTP statuses worth another attempt: quota, overload and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def _env_map(name: str, key: str, default: str, unset: str = "") -> str:
+    """
+    Reads a setting that is either one value ("32") or per key
+    ("gemini-2.5-flash=32,gemini-2.5-flash-lite=64,*=16"). `unset` is used
+    when the variable isn't set at all.
+    """
+    raw = os.getenv(name, unset).strip()
+    if not raw:
+        return default
+    if "=" not in raw:
+        return raw
+    values = dict(part.strip().split("=", 1) for part in raw.split(",") if "=" in part)
+    return values.get(key, values.get("*", default))
+
+
+def _env_per_model(name: str, model: str, default: float) -> float:
+    return float(_env_map(name, model, str(default)))
+
+
+def _causes(exc: BaseException):
+    """
+    `exc` and the errors behind it: LangChain wraps the SDK's error (which
+    has the HTTP status) with `raise ... from`.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _class_names(exc: BaseException) -> str:
+    return " ".join(cls.__name__ for cls in type(exc).__mro__)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    for error in _causes(exc):
+        for attr in ("code", "status_code"):
+            value = getattr(error, attr, None)
+            if isinstance(value, int):
+                return value
+        # langchain_core's ModelRateLimitError (GoogleRateLimitError, ...) only carries a message
+        if "RateLimitError" in _class_names(error):
+            return 429
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    if _status_code(exc) in RETRYABLE_STATUS:
+        return True
+    for error in _causes(exc):
+        if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+            return True
+        # Transport errors (httpx.ConnectError, ReadTimeout, ...) without importing httpx
+        names = _class_names(error)
+        if "Timeout" in names or "ConnectError" in names or "ResourceExhausted" in names:
+            return True
+    return False
+
+
+def prompt_key(model: str, messages, kwargs: dict) -> str:
+    """
+    Identity of an LLM call for coalescing: model + call options + every
+    message. The user's words are normalized ("Hi!!" == "hi"); system prompts
+    and multimodal parts are hashed as-is.
+    """
+    if hasattr(messages, "to_messages"):
+        messages = messages.to_messages()
+    elif isinstance(messages, str):
+        messages = [("human", messages)]
+
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8"))
+    for message in messages:
+        role, content = message if isinstance(message, tuple) else (message.type, message.content)
+        if isinstance(content, str):
+            content = normalize_text(content) if role == "human" else content
+        else:
+            content = json.dumps(content, sort_keys=True, default=str)
+        digest.update(b"\x1e" + role.encode("utf-8") + b"\x1f" + content.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TokenBucket:
+    """
+    Request-rate limiter matched to the Gemini quota (requests per minute).
+    A 429 pauses the whole bucket, so every caller backs off together instead
+    of each one burning its own retries against the quota.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: Optional[float] = None):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    async def acquire(self):
+        # Single event loop: nothing runs between the check and the decrement
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self.tokens) / self.rate)
+
+
+class ManagedModel:
+    """
+    Wraps one shared chat model with the process-wide limits: a global and a
+    per-model concurrency cap, the per-model token bucket, and retries with
+    exponential backoff + full jitter on retryable errors. Identical
+    concurrent ainvoke() calls share one request (LLM_SINGLE_FLIGHT=0 to disable).
+
+    Agents use it exactly like the LangChain model (ainvoke / astream);
+    anything else is forwarded to the underlying client.
+    """
+
+    def __init__(self, name: str, client, global_slots: asyncio.Semaphore):
+        self.name = name
+        self.client = client
+        self.global_slots = global_slots
+        self.model_slots = asyncio.Semaphore(int(_env_per_model("LLM_MODEL_CONCURRENCY", name, 32)))
+        self.bucket = TokenBucket(_env_per_model("LLM_RPM", name, 1000))
+        self.max_retries = int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+        self.single_flight = SingleFlight() if os.getenv("LLM_SINGLE_FLIGHT", "1") != "0" else None
+
+    def __getattr__(self, item):
+        if item == "client":
+            raise AttributeError(item)
+        return getattr(self.client, item)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _handle_failure(self, exc: Exception, attempt: int) -> bool:
+        """
+        Sleeps before the next attempt; returns False when we should give up.
+        """
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return False
+        delay = self._backoff(attempt)
+        left = deadline.remaining()
+        if left is not None and delay >= left:
+            return False
+        if _status_code(exc) == 429:
+            self.bucket.pause(delay)
+        print(f"LLM retry {attempt + 1}/{self.max_retries} on {self.name} in {delay:.2f}s: {exc}")
+        await asyncio.sleep(delay)
+        return True
+
+    async def ainvoke(self, messages, agent: str = "unknown", **kwargs):
+        if self.single_flight is None:
+            return await self._ainvoke(messages, agent, **kwargs)
+        # Coalesced callers share the leader's response, and its token bill
+        key = prompt_key(self.name, messages, kwargs)
+        shared = self.single_flight.do(key, lambda: self._shared_ainvoke(messages, agent, **kwargs))
+        left = deadline.remaining()
+        if left is None:
+            return await shared
+        # Each caller waits only as long as its own budget; the shared call keeps going for the others
+        deadline.check()
+        try:
+            return await asyncio.wait_for(shared, left)
+        except asyncio.TimeoutError:
+            if deadline.remaining() > 0:
+                raise
+            raise DeadlineExceeded(f"{self.name}: no answer within the request deadline")
+
+    async def _shared_ainvoke(self, messages, agent: str, **kwargs):
+        # The shared task starts with a copy of the leader's context; its
+        # deadline must not cut the call short for followers with more time
+        deadline.start_deadline(None)
+        return await self._ainvoke(messages, agent, **kwargs)
+
+    async def _attempt(self, messages, kwargs: dict):
+        await self.bucket.acquire()
+        async with self.global_slots, self.model_slots:
+            return await self.client.ainvoke(messages, **kwargs)
+
+    async def _attempt_within_deadline(self, messages, kwargs: dict):
+        """
+        One attempt, cut off when the request's budget (app.services.deadline) runs out.
+        """
+        left = deadline.remaining()
+        if left is None:
+            return await self._attempt(messages, kwargs)
+        deadline.check()
+        try:
+            return await asyncio.wait_for(self._attempt(messages, kwargs), left)
+        except asyncio.TimeoutError:
+            if deadline.remaining() > 0:
+                raise
+            raise DeadlineExceeded(f"{self.name}: no answer within the request deadline")
+
+    async def _ainvoke(self, messages, agent: str, **kwargs):
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = await self._attempt_within_deadline(messages, kwargs)
+                usage = getattr(response, "usage_metadata", None)
+                usage_tracker.record(agent, usage)
+                record_llm_call(agent, self.name, "invoke", time.perf_counter() - started, usage)
+                return response
+            except Exception as e:
+                if not await self._handle_failure(e, attempt):
+                    record_llm_call(agent, self.name, "invoke", time.perf_counter() - started, None, failed=True)
+                    raise
+                attempt += 1
+
+    async def astream(self, messages, agent: str = "unknown", **kwargs):
+        # Retrying is only safe before the first chunk has gone out
+        started_at = time.perf_counter()
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            started = False
+            usage = None
+            try:
+                async with self.global_slots, self.model_slots:
+                    async for chunk in self.client.astream(messages, **kwargs):
+                        started = True
+                        usage = merge_usage(usage, getattr(chunk, "usage_metadata", None))
+                        yield chunk
+                return
+            except Exception as e:
+                if started or not await self._handle_failure(e, attempt):
+                    if not started:
+                        record_llm_call(agent, self.name, "stream", time.perf_counter() - started_at, None, failed=True)
+                    raise
+                attempt += 1
+            finally:
+                # Also counts streams the client walked away from: those tokens were billed
+                if started:
+                    usage_tracker.record(agent, usage)
+                    record_llm_call(agent, self.name, "stream", time.perf_counter() - started_at, usage)
+
+
+class LatencyWindow:
+    """
+    The last `size` call durations, for "slower than the usual p95" checks.
+    """
+
+    def __init__(self, size: int):
+        self.samples = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AgentLLM:
+    """
+    One agent's handle on a shared ManagedModel. Tags every call with the
+    agent name for token accounting and, when the PromptCache is on, swaps a
+    leading SystemMessage for a reference to its cached copy.
+
+    With a `hedge_model`, an ainvoke() still running past this agent's
+    recent p95 (LLM_HEDGE_PERCENTILE) gets a second request, to the hedge
+    model (a faster one, see LLM_HEDGE_MODELS) or a duplicate to the same
+    model, and the first answer wins. That cuts the tail for ~5% more calls.
+    """
+
+    def __init__(self, model: ManagedModel, agent: str, prompt_cache: PromptCache, hedge_model: Optional[ManagedModel] = None):
+        self.model = model
+        self.agent = agent
+        self.prompt_cache = prompt_cache
+        self.hedge_model = hedge_model
+        self.latency = LatencyWindow(int(os.getenv("LLM_HEDGE_WINDOW", "200")))
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+        self.hedge_min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.25"))
+
+    def __getattr__(self, item):
+        if item == "model":
+            raise AttributeError(item)
+        return getattr(self.model, item)
+
+    async def _cached_prefix(self, model: ManagedModel, messages, kwargs: dict):
+        if (
+            not self.prompt_cache.enabled
+            or "cached_content" in kwargs
+            or not isinstance(messages, list)
+            or len(messages) < 2
+            or not isinstance(messages[0], SystemMessage)
+            or not isinstance(messages[0].content, str)
+        ):
+            return messages, kwargs
+        # Only the real Gemini client has one (not the fake/replay backends)
+        genai_client = getattr(model.client, "client", None)
+        if not hasattr(genai_client, "aio"):
+            return messages, kwargs
+        name = await self.prompt_cache.name_for(model.name, genai_client, messages[0].content)
+        if name is None:
+            return messages, kwargs
+        return messages[1:], dict(kwargs, cached_content=name)
+
+    async def _call(self, model: ManagedModel, messages, kwargs: dict, coalesce: bool = True):
+        messages, kwargs = await self._cached_prefix(model, messages, kwargs)
+        if coalesce:
+            return await model.ainvoke(messages, agent=self.agent, **kwargs)
+        # A duplicate of the call in flight must not be coalesced into it
+        return await model._ainvoke(messages, self.agent, **kwargs)
+
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_model is None or len(self.latency) < self.hedge_min_samples:
+            return None
+        delay = max(self.hedge_min_delay, self.latency.percentile(self.hedge_percentile))
+        left = deadline.remaining()
+        if left is not None and left <= delay:
+            # The deadline cuts the call off before a hedge would start
+            return None
+        return delay
+
+    async def _hedged(self, messages, kwargs: dict, delay: float):
+        primary = asyncio.ensure_future(self._call(self.model, messages, kwargs))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                return primary.result()
+
+            HEDGES.inc(agent=self.agent, model=self.hedge_model.name, outcome="sent")
+            hedge = asyncio.ensure_future(
+                self._call(self.hedge_model, messages, kwargs, coalesce=self.hedge_model is not self.model)
+            )
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            HEDGES.inc(agent=self.agent, model=self.hedge_model.name, outcome="won")
+                        return task.result()
+            # Both failed: report the original call's error
+            raise primary.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def ainvoke(self, messages, **kwargs):
+        started = time.perf_counter()
+        delay = self._hedge_delay()
+        if delay is None:
+            response = await self._call(self.model, messages, kwargs)
+        else:
+            response = await self._hedged(messages, kwargs, delay)
+        self.latency.add(time.perf_counter() - started)
+        return response
+
+    async def astream(self, messages, **kwargs):
+        # Not hedged: the first chunks may already be on their way to the user
+        messages, kwargs = await self._cached_prefix(self.model, messages, kwargs)
+        async for chunk in self.model.astream(messages, agent=self.agent, **kwargs):
+            yield chunk
+
+
 class LLMService:
-    def __init__(self):
+    """
+    Process-wide access to the LLMs. Every agent still calls
+    LLMService(agent=...), but clients, semaphores and rate limiters are
+    created once per model and shared, so eight agents mean one pooled client
+    instead of eight. The agent name labels the token accounting and picks
+    the agent's model (LLM_AGENT_MODELS, e.g. "orchestrator=gemini-2.5-flash-lite")
+    and hedge model (LLM_HEDGE_MODELS; "off" disables hedging, unset means a
+    duplicate request to the same model; LLM_HEDGE=0 turns it off everywhere).
+    LLM_BACKEND swaps the Gemini client for an offline one (see llm_backends).
+    """
+
+    _models: Dict[str, ManagedModel] = {}
+    _global_slots: Optional[asyncio.Semaphore] = None
+    _cassette: Optional[Cassette] = None
+    prompt_cache = PromptCache()
+
+    def __init__(self, agent: str = "unknown"):
+        self.agent = agent
+        # LLM_BACKEND=fake|replay run offline (tests, benchmarks); google|record need the key
+        self.backend = os.getenv("LLM_BACKEND", "google").lower()
         self.google_key = os.getenv("GOOGLE_API_KEY")
-        if not self.google_key:
+        if not self.google_key and self.backend in ("google", "record"):
             raise ValueError("GOOGLE_API_KEY is missing in .env file")
+        self.model_name = _env_map("LLM_AGENT_MODELS", agent, DEFAULT_MODEL)
+        # Report images are big; a duplicate vision call costs too much to hedge by default
+        self.hedge_model_name = _env_map("LLM_HEDGE_MODELS", agent, "", unset="vision=off")
+
+    @classmethod
+    def cassette(cls) -> Cassette:
+        if cls._cassette is None:
+            cls._cassette = Cassette(os.getenv("LLM_CASSETTE", "llm_cassette.jsonl"))
+        return cls._cassette
 
-        # 🔴 FIX: Updated model name to one you definitely have access to
-        # You can also try "gemini-1.5-flash-latest" or "gemini-2.0-flash" if this fails
-        self.gemini = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
+    def _make_client(self, name: str):
+        if self.backend == "fake":
+            return FakeChatModel(name, prompt_key)
+        if self.backend == "replay":
+            return ReplayChatModel(name, LLMService.cassette(), prompt_key)
+        # ~0.5 s of imports (google.genai types), paid by the first agent that needs it
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        client = ChatGoogleGenerativeAI(
+            model=name,
             google_api_key=self.google_key,
-            temperature=0.3
+            temperature=0.3,
+            # Retries happen in ManagedModel; 1 = a single attempt in the Google SDK
+            max_retries=1,
         )
+        if self.backend == "record":
+            return RecordingChatModel(name, client, LLMService.cassette(), prompt_key)
+        return client
+
+    def _shared_model(self, name: str) -> ManagedModel:
+        model = LLMService._models.get(name)
+        if model is None:
+            if LLMService._global_slots is None:
+                LLMService._global_slots = asyncio.Semaphore(int(os.getenv("LLM_MAX_CONCURRENCY", "64")))
+            model = ManagedModel(name, self._make_client(name), LLMService._global_slots)
+            LLMService._models[name] = model
+        return model
+
+    def get_model(self, name: Optional[str] = None) -> AgentLLM:
+        model = self._shared_model(name or self.model_name)
+        hedge_model = None
+        if os.getenv("LLM_HEDGE", "1") != "0" and self.hedge_model_name != "off":
+            hedge_model = self._shared_model(self.hedge_model_name) if self.hedge_model_name else model
+        return AgentLLM(model, self.agent, LLMService.prompt_cache, hedge_model)
+
+    @classmethod
+    def stats(cls) -> dict:
+        stats = {}
+        for name, model in cls._models.items():
+            flights = model.single_flight
+            stats[name] = {
+                "single_flight": flights is not None,
+                "in_flight_keys": len(flights) if flights is not None else 0,
+                "calls": flights.calls if flights is not None else 0,
+                "coalesced": flights.coalesced if flights is not None else 0,
+            }
+        return stats
+
+    @classmethod
+    def usage_stats(cls) -> dict:
+        return {"agents": usage_tracker.stats(), "prompt_cache": cls.prompt_cache.stats()}
 
     def get_primary_model(self):
         """
-        Used by Doctor, Nurse, Vision, Myth Buster.
+        Used by Doctor, Nurse, Vision, Myth Buster. The model comes from LLM_AGENT_MODELS.
         """
-        return self.gemini
+        return self.get_model()
 
     def get_logic_model(self):
         """
-        Used by Orchestrator, Scribe, Nudge.
+        Used by Orchestrator, Scribe, Nudge. The model comes from LLM_AGENT_MODELS.
         """
-        return self.gemini
\ No newline at end of file
+        return self.get_model()
@@ -0,0 +1,182 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from app.services.deadline import DeadlineExceeded
+
+# Seconds; LLM calls sit in the upper half, local stages in the lower one
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    # Exact: "%g" would print 12345678 as 1.23457e+07 and freeze rate()
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+                cumulative += counts[-1]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(total[0])}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+# --- THE METRICS (exported on /metrics) ---
+
+REQUEST_SECONDS = Histogram("pranaya_request_seconds", "HTTP request duration.", ("path", "status"))
+STAGE_SECONDS = Histogram("pranaya_stage_seconds", "Duration of each /chat pipeline stage.", ("stage", "route"))
+LLM_SECONDS = Histogram("pranaya_llm_seconds", "Duration of one LLM call (all retries included).", ("agent", "model", "mode"))
+LLM_TOKENS = Counter("pranaya_llm_tokens_total", "LLM tokens by agent and kind (input, output, cached).", ("agent", "model", "kind"))
+LLM_ERRORS = Counter("pranaya_llm_errors_total", "LLM calls that failed after retries.", ("agent", "model"))
+ROUTES = Counter("pranaya_routes_total", "Routing decisions by route and deciding stage.", ("route", "source"))
+CACHE_LOOKUPS = Counter("pranaya_cache_lookups_total", "Response cache lookups.", ("namespace", "result"))
+FALLBACKS = Counter("pranaya_fallbacks_total", "Agent answers replaced by a fallback, by reason.", ("agent", "reason"))
+HEDGES = Counter("pranaya_llm_hedges_total", "Hedged LLM calls: sent, and won by the hedge.", ("agent", "model", "outcome"))
+RETRIEVALS = Counter("pranaya_retrievals_total", "Local retrieval lookups: answered from the corpus, used as context, or no match.", ("agent", "outcome"))
+
+ALL_METRICS = (REQUEST_SECONDS, STAGE_SECONDS, LLM_SECONDS, LLM_TOKENS, LLM_ERRORS, ROUTES, CACHE_LOOKUPS, FALLBACKS, HEDGES, RETRIEVALS)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- PER-REQUEST TRACE (for the Server-Timing header) ---
+
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("pranaya_trace", default=None)
+
+
+def start_trace() -> List[Tuple[str, float]]:
+    trace: List[Tuple[str, float]] = []
+    _trace.set(trace)
+    return trace
+
+
+def _add_to_trace(name: str, seconds: float):
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+
+def server_timing(trace: List[Tuple[str, float]]) -> str:
+    """
+    Server-Timing header value: "route;dur=0.4, agent;dur=812.5, llm-diagnosis;dur=810.2".
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in trace)
+
+
+class Span:
+    def __init__(self, stage: str, labels: dict):
+        self.stage = stage
+        self.labels = labels
+
+
+@contextmanager
+def span(stage: str, route: str = "") -> Iterator[Span]:
+    """
+    Times one pipeline stage. The route can be filled in once it is known:
+
+        with span("route") as s:
+            decision = await orchestrator.classify_intent(...)
+            s.labels["route"] = decision["agent"]
+    """
+    current = Span(stage, {"route": route})
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, **current.labels)
+        _add_to_trace(stage, elapsed)
+
+
+def record_llm_call(agent: str, model: str, mode: str, seconds: float, usage: Optional[dict], failed: bool = False):
+    LLM_SECONDS.observe(seconds, agent=agent, model=model, mode=mode)
+    _add_to_trace(f"llm-{agent}", seconds)
+    if failed:
+        LLM_ERRORS.inc(agent=agent, model=model)
+        return
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens") or 0, agent=agent, model=model, kind="input")
+        LLM_TOKENS.inc(usage.get("output_tokens") or 0, agent=agent, model=model, kind="output")
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        LLM_TOKENS.inc(cached, agent=agent, model=model, kind="cached")
+
+
+def record_fallback(agent: str, reason: Union[str, BaseException]):
+    """
+    `reason` is a label, or the exception that caused the fallback: bad JSON
+    (a ValueError) counts as "parse", a spent request budget as "deadline",
+    anything else as "error".
+    """
+    if isinstance(reason, BaseException):
+        if isinstance(reason, DeadlineExceeded):
+            reason = "deadline"
+        else:
+            reason = "parse" if isinstance(reason, ValueError) else "error"
+    FALLBACKS.inc(agent=agent, reason=reason)
@@ -0,0 +1,113 @@
+from typing import Iterable, Iterator, List, Optional
+
+from app.services.text import normalize_text
+
+
+def load_phrases(path: str) -> List[str]:
+    """
+    Reads a phrase list: one phrase per line, "#" comments and blank lines ignored.
+    """
+    phrases = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                phrases.append(line)
+    return phrases
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over normalized phrases.
+
+    One pass over the message finds any phrase, so the per-message cost
+    depends on the message length, not on how many phrases are loaded.
+    Matches must sit on word boundaries of the normalized text, and every
+    multi-word phrase is also indexed without its spaces ("killmyself").
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases: List[str] = []
+        # Trie: one dict of char -> node per node, plus failure links and outputs
+        self._goto = [{}]
+        self._fail = [0]
+        # node -> [(length, phrase_index)] of every phrase ending at this node
+        self._out = [[]]
+
+        for phrase in phrases:
+            normalized = normalize_text(phrase)
+            if not normalized:
+                continue
+            index = len(self.phrases)
+            self.phrases.append(phrase)
+            self._insert(normalized, index)
+            if " " in normalized:
+                self._insert(normalized.replace(" ", ""), index)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _insert(self, key: str, index: int):
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(key), index))
+
+    def _build_failure_links(self):
+        # Breadth-first, so a node's failure target is always finished before it
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                inherited = self._out[self._fail[child]]
+                if inherited:
+                    self._out[child] = self._out[child] + inherited
+
+    def _matches(self, text: str) -> Iterator[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(text) - 1
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node] and (i == last or text[i + 1] == " "):
+                for length, index in out[node]:
+                    start = i + 1 - length
+                    if start == 0 or text[start - 1] == " ":
+                        yield self.phrases[index]
+
+    def search_normalized(self, text: str) -> Optional[str]:
+        """
+        Like search(), for text that already went through normalize_text().
+        """
+        return next(self._matches(text), None)
+
+    def search(self, text: str) -> Optional[str]:
+        """
+        Returns the first phrase found in `text`, or None.
+        """
+        return self.search_normalized(normalize_text(text))
+
+    def search_all(self, text: str) -> List[str]:
+        """
+        Every phrase found in `text`, in order of where they end.
+        """
+        return list(self._matches(normalize_text(text)))
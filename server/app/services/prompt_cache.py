@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from app.services.session_store import estimate_tokens
+
+
+class PromptCache:
+    """
+    Registers static system prompts as Gemini cached content
+    (LLM_PROMPT_CACHE=1), so repeat calls send only the dynamic messages and
+    the prefix is billed at the cached-token rate.
+
+    One cache per (model, prompt), created on first use and re-created shortly
+    before its TTL runs out. Prompts under the backend's minimum size
+    (LLM_PROMPT_CACHE_MIN_TOKENS) or a failed create fall back to sending the
+    prompt as usual; Gemini's implicit prefix caching still applies there.
+    """
+
+    # Re-create this long before expiry so no call races the TTL
+    REFRESH_MARGIN = 60
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_PROMPT_CACHE", "0") == "1"
+        self.ttl = int(os.getenv("LLM_PROMPT_CACHE_TTL", "3600"))
+        self.min_tokens = int(os.getenv("LLM_PROMPT_CACHE_MIN_TOKENS", "1024"))
+        # key -> (cache name or None after a failure, valid until)
+        self._entries: Dict[str, Tuple[Optional[str], float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.created = 0
+        self.failures = 0
+        self.skipped = 0
+
+    async def name_for(self, model: str, genai_client, prefix: str) -> Optional[str]:
+        """
+        Cached-content name to use instead of `prefix`, or None to send it inline.
+        """
+        if not self.enabled:
+            return None
+        if estimate_tokens(prefix) < self.min_tokens:
+            self.skipped += 1
+            return None
+
+        key = hashlib.sha256(f"{model}\x1f{prefix}".encode("utf-8")).hexdigest()
+        entry = self._entries.get(key)
+        if entry is not None and time.time() < entry[1]:
+            if entry[0] is not None:
+                self.hits += 1
+            return entry[0]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() < entry[1]:
+                return entry[0]
+            name = await self._create(model, genai_client, prefix, key)
+            # After a failure, don't try again until a full TTL has passed
+            self._entries[key] = (name, time.time() + self.ttl - (self.REFRESH_MARGIN if name else 0))
+            return name
+
+    async def _create(self, model: str, genai_client, prefix: str, key: str) -> Optional[str]:
+        try:
+            from google.genai import types
+
+            cache = await genai_client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"pranaya-{key[:12]}",
+                    system_instruction=prefix,
+                    ttl=f"{self.ttl}s",
+                ),
+            )
+            self.created += 1
+            return cache.name
+        except Exception as e:
+            print(f"Prompt Cache Error ({model}): {e}")
+            self.failures += 1
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": sum(1 for name, _ in self._entries.values() if name),
+            "hits": self.hits,
+            "created": self.created,
+            "failures": self.failures,
+            "skipped_small": self.skipped,
+        }
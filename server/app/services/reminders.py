@@ -0,0 +1,414 @@
+import asyncio
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.services.tracker_store import _local_timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reminders (
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    item TEXT NOT NULL,
+    next_fire REAL NOT NULL,
+    last_log REAL NOT NULL,
+    PRIMARY KEY (user_id, kind, item)
+) WITHOUT ROWID;
+-- What makes restarts cheap: the scheduler only ever reads a next_fire range
+CREATE INDEX IF NOT EXISTS idx_reminders_next_fire ON reminders (next_fire);
+-- Medicines logged once so far: no reminder until one turns out to be a daily dose
+CREATE TABLE IF NOT EXISTS medicine_logs (
+    user_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    last_log REAL NOT NULL,
+    PRIMARY KEY (user_id, item)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_medicine_logs_last_log ON medicine_logs (last_log);
+"""
+
+# (user_id, kind, item)
+Key = Tuple[str, str, str]
+
+DAY = 86400.0
+
+
+class ReminderRules:
+    """
+    Turns tracker entries into reminders:
+
+    - medicine: same time tomorrow, e.g. "Metformin" logged at 08:10 is due
+      again at 08:10 the next day. Every new log of it moves the reminder,
+      so someone who keeps logging is never reminded. Only for a medicine
+      that is recurring(): one paracetamol for a headache must not turn
+      into a week of "time for your paracetamol?".
+    - water: REMINDER_WATER_GAP_HOURS after the last glass, only within
+      REMINDER_ACTIVE_HOURS (local time, "8-22"), repeating until they drink.
+
+    A medicine with no log for REMINDER_TTL_DAYS is dropped (the course
+    ended); water reminders stop after a day without any water logged.
+    """
+
+    def __init__(self):
+        self.tz = _local_timezone()
+        self.water_gap = float(os.getenv("REMINDER_WATER_GAP_HOURS", "3")) * 3600
+        start, _, end = os.getenv("REMINDER_ACTIVE_HOURS", "8-22").partition("-")
+        self.active_start = int(start)
+        self.active_end = int(end)
+        self.ttl = float(os.getenv("REMINDER_TTL_DAYS", "7")) * DAY
+        self.same_time = float(os.getenv("REMINDER_SAME_TIME_HOURS", "2")) * 3600
+
+    def _awake(self, timestamp: float) -> float:
+        """
+        `timestamp`, moved forward to the start of the active hours if it falls outside them.
+        """
+        local = datetime.fromtimestamp(timestamp, self.tz)
+        if self.active_start <= local.hour < self.active_end:
+            return timestamp
+        morning = local.replace(hour=self.active_start, minute=0, second=0, microsecond=0)
+        if local.hour >= self.active_end:
+            morning += timedelta(days=1)
+        return morning.timestamp()
+
+    def recurring(self, previous: float, timestamp: float) -> bool:
+        """
+        True when a medicine logged at `previous` and again at `timestamp`
+        looks like a daily one: another day, within the TTL, at about the
+        same time of day (REMINDER_SAME_TIME_HOURS).
+        """
+        before = datetime.fromtimestamp(previous, self.tz)
+        now = datetime.fromtimestamp(timestamp, self.tz)
+        if before.date() == now.date() or timestamp - previous > self.ttl:
+            return False
+        gap = abs((now.hour - before.hour) * 3600 + (now.minute - before.minute) * 60)
+        return min(gap, DAY - gap) <= self.same_time
+
+    def from_entry(self, category: str, item: Optional[str], timestamp: float) -> Optional[Tuple[str, str, float]]:
+        """
+        (kind, item, next_fire) for a new tracker entry, or None.
+        """
+        if category == "medicine":
+            return "medicine", (item or "your medicine").strip().lower(), timestamp + DAY
+        if category == "water":
+            return "water", "water", self._awake(timestamp + self.water_gap)
+        return None
+
+    def after_fire(self, kind: str, fired: float, last_log: float, now: float) -> Optional[float]:
+        """
+        When a rule that just fired is next due (always after `now`), or None to drop it.
+        """
+        if now - last_log > (self.ttl if kind == "medicine" else DAY):
+            return None
+        interval = DAY if kind == "medicine" else self.water_gap
+        next_fire = fired + interval
+        if next_fire <= now:
+            # Missed several (e.g. the server was down): skip ahead instead of firing each one
+            next_fire += ((now - next_fire) // interval + 1) * interval
+        return self._awake(next_fire) if kind == "water" else next_fire
+
+    def message(self, kind: str, item: str, last_log: float) -> str:
+        if kind == "medicine":
+            usual = datetime.fromtimestamp(last_log, self.tz).strftime("%H:%M")
+            return f"💊 Time for your {item}? You usually take it around {usual}."
+        return "💧 It's been a while since your last glass of water. Time for a sip?"
+
+
+class LogSink:
+    """
+    Prints reminders. Stand-in for a real push / SMS / WhatsApp sender.
+    """
+
+    async def deliver(self, reminders: List[dict]):
+        for reminder in reminders:
+            print(f"⏰ Reminder for {reminder['user_id']}: {reminder['message']}")
+
+
+class InboxSink:
+    """
+    Keeps the latest reminders per user for the app to fetch
+    (GET /reminders/{user_id}). Bounded in users and per user.
+    """
+
+    def __init__(self, max_users: int = 100_000, per_user: int = 20):
+        self.max_users = max_users
+        self.per_user = per_user
+        self._inbox: "OrderedDict[str, Deque[dict]]" = OrderedDict()
+
+    async def deliver(self, reminders: List[dict]):
+        for reminder in reminders:
+            user_id = reminder["user_id"]
+            inbox = self._inbox.get(user_id)
+            if inbox is None:
+                inbox = self._inbox[user_id] = deque(maxlen=self.per_user)
+            self._inbox.move_to_end(user_id)
+            inbox.append(reminder)
+        while len(self._inbox) > self.max_users:
+            self._inbox.popitem(last=False)
+
+    def pop(self, user_id: str) -> List[dict]:
+        inbox = self._inbox.pop(user_id, None)
+        return list(inbox) if inbox else []
+
+
+def sink_from_env():
+    """
+    REMINDER_SINK: "inbox" (default) or "log".
+    """
+    kind = os.getenv("REMINDER_SINK", "inbox").lower()
+    if kind == "log":
+        return LogSink()
+    return InboxSink()
+
+
+class ReminderScheduler:
+    """
+    Fires medication and hydration reminders from a min-heap keyed by
+    next-fire time.
+
+    The rules live in SQLite, indexed on next_fire. Only the ones due within
+    REMINDER_HORIZON_SECONDS are in memory: the heap is refilled with one
+    range query per horizon, so memory and per-tick work follow the number of
+    reminders due soon, not the number of users. After a restart the first
+    refill picks up everything overdue through the same index (no scan of
+    users); reminders more than REMINDER_MAX_LATE_SECONDS late are skipped
+    and rescheduled instead of arriving hours late.
+
+    Due reminders go to the sink in batches (REMINDER_BATCH_SIZE). observe()
+    is called on the request path and only touches memory; the database is
+    written by the scheduler loop, off the event loop. That is also where a
+    medicine log without a reminder is checked against the medicine's
+    previous log (ReminderRules.recurring()) to decide whether to start one. Meant for one server
+    process: several workers would each fire the same reminders.
+    """
+
+    def __init__(self, path: Optional[str] = None, sink=None, rules: Optional[ReminderRules] = None):
+        self.path = path or os.getenv("REMINDER_DB_PATH") or os.getenv("TRACKER_DB_PATH", "pranaya_tracker.db")
+        self.sink = sink if sink is not None else sink_from_env()
+        self.rules = rules or ReminderRules()
+        self.tick_seconds = float(os.getenv("REMINDER_TICK_SECONDS", "1"))
+        self.horizon = float(os.getenv("REMINDER_HORIZON_SECONDS", "900"))
+        self.max_late = float(os.getenv("REMINDER_MAX_LATE_SECONDS", "21600"))
+        self.batch_size = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+
+        self._heap: List[Tuple[float, Key]] = []
+        # Authoritative next_fire / last_log of the rules in the heap; heap
+        # entries that disagree with it are stale and skipped when popped
+        self._next: Dict[Key, float] = {}
+        self._last_log: Dict[Key, float] = {}
+        self._window_end = 0.0
+        self._upserts: Dict[Key, Tuple[float, float]] = {}
+        self._deletes: set = set()
+        # Medicine logs with no reminder in memory: (next_fire, logged at)
+        self._medicine_logs: Dict[Key, Tuple[float, float]] = {}
+        # Batches the sink failed on, retried first on the next tick
+        self._undelivered: Deque[List[dict]] = deque()
+        self._local = threading.local()
+        self._task: Optional[asyncio.Task] = None
+        self.fired = 0
+        self.skipped_late = 0
+        self.batches = 0
+
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _schedule(self, key: Key, next_fire: float, last_log: float):
+        if next_fire < self._window_end:
+            self._next[key] = next_fire
+            self._last_log[key] = last_log
+            heapq.heappush(self._heap, (next_fire, key))
+        else:
+            # Beyond the window: the refill that reaches it loads it from the database
+            self._next.pop(key, None)
+            self._last_log.pop(key, None)
+
+    # --- REQUEST PATH ---
+
+    def observe(self, user_id: str, entry: dict, timestamp: Optional[float] = None):
+        """
+        Creates or moves the reminder for one Scribe result.
+        """
+        timestamp = timestamp or time.time()
+        rule = self.rules.from_entry((entry.get("category") or "").lower(), entry.get("item"), timestamp)
+        if rule is None:
+            return
+        kind, item, next_fire = rule
+        key = (user_id, kind, item)
+        if kind == "medicine" and key not in self._next and key not in self._upserts:
+            # Not known to be a daily medicine yet: the scheduler loop looks it up
+            self._medicine_logs[key] = (next_fire, timestamp)
+            return
+        self._upserts[key] = (next_fire, timestamp)
+        self._deletes.discard(key)
+        self._schedule(key, next_fire, timestamp)
+
+    # --- SCHEDULER LOOP ---
+
+    def _confirm_medicines(self, conn: sqlite3.Connection, logs: Dict[Key, Tuple[float, float]],
+                           now: float) -> Dict[Key, Tuple[float, float]]:
+        """
+        The medicine logs that start or move a reminder: the medicine has
+        one already, or this log and the previous one are recurring().
+        Others are kept as the medicine's previous log.
+        """
+        confirmed = {}
+        for key, (next_fire, logged) in logs.items():
+            user_id, _, item = key
+            if conn.execute("SELECT 1 FROM reminders WHERE user_id = ? AND kind = ? AND item = ?", key).fetchone():
+                confirmed[key] = (next_fire, logged)
+                continue
+            row = conn.execute("SELECT last_log FROM medicine_logs WHERE user_id = ? AND item = ?", (user_id, item)).fetchone()
+            if row and self.rules.recurring(row[0], logged):
+                confirmed[key] = (next_fire, logged)
+                conn.execute("DELETE FROM medicine_logs WHERE user_id = ? AND item = ?", (user_id, item))
+            else:
+                conn.execute(
+                    "INSERT INTO medicine_logs (user_id, item, last_log) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id, item) DO UPDATE SET last_log = excluded.last_log",
+                    (user_id, item, logged),
+                )
+        conn.execute("DELETE FROM medicine_logs WHERE last_log < ?", (now - self.rules.ttl,))
+        return confirmed
+
+    def _write(self, upserts: Dict[Key, Tuple[float, float]], deletes: set,
+               medicine_logs: Dict[Key, Tuple[float, float]], now: float) -> Dict[Key, Tuple[float, float]]:
+        conn = self._connect()
+        with conn:
+            confirmed = self._confirm_medicines(conn, medicine_logs, now) if medicine_logs else {}
+            upserts = {**confirmed, **upserts}
+            conn.executemany(
+                "INSERT INTO reminders (user_id, kind, item, next_fire, last_log) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, kind, item) DO UPDATE SET "
+                "next_fire = excluded.next_fire, last_log = excluded.last_log",
+                [key + value for key, value in upserts.items()],
+            )
+            conn.executemany("DELETE FROM reminders WHERE user_id = ? AND kind = ? AND item = ?", list(deletes))
+        return confirmed
+
+    def _load(self, until: float) -> List[tuple]:
+        return self._connect().execute(
+            "SELECT user_id, kind, item, next_fire, last_log FROM reminders WHERE next_fire < ?", (until,)
+        ).fetchall()
+
+    async def _flush(self, now: Optional[float] = None):
+        if not self._upserts and not self._deletes and not self._medicine_logs:
+            return
+        upserts, deletes, medicine_logs = self._upserts, self._deletes, self._medicine_logs
+        self._upserts, self._deletes, self._medicine_logs = {}, set(), {}
+        confirmed = await asyncio.to_thread(self._write, upserts, deletes, medicine_logs, now or time.time())
+        for key, (next_fire, logged) in confirmed.items():
+            # Unless a newer log moved it while the write ran
+            if key not in self._upserts:
+                self._schedule(key, next_fire, logged)
+
+    async def _refill(self, now: float):
+        self._window_end = now + self.horizon
+        for user_id, kind, item, next_fire, last_log in await asyncio.to_thread(self._load, self._window_end):
+            key = (user_id, kind, item)
+            # A rule observed while the query ran is newer than its row
+            if key in self._upserts or self._next.get(key) == next_fire:
+                continue
+            self._schedule(key, next_fire, last_log)
+
+    def _pop_due(self, now: float) -> List[Tuple[float, Key]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire, key = heapq.heappop(self._heap)
+            if self._next.get(key) == fire:
+                del self._next[key]
+                due.append((fire, key))
+        return due
+
+    def _reschedule(self, key: Key, fired: float, now: float):
+        last_log = self._last_log.pop(key, fired)
+        next_fire = self.rules.after_fire(key[1], fired, last_log, now)
+        if next_fire is None:
+            self._last_log.pop(key, None)
+            self._upserts.pop(key, None)
+            self._deletes.add(key)
+            return
+        self._upserts[key] = (next_fire, last_log)
+        self._schedule(key, next_fire, last_log)
+
+    async def tick(self, now: Optional[float] = None) -> int:
+        """
+        One scheduler step: persist, refill, fire what's due. Returns the number delivered.
+        """
+        now = now if now is not None else time.time()
+        await self._flush(now)
+        if now >= self._window_end - self.tick_seconds:
+            await self._refill(now)
+
+        reminders = []
+        for fired, key in self._pop_due(now):
+            if now - fired > self.max_late:
+                self.skipped_late += 1
+            else:
+                user_id, kind, item = key
+                reminders.append({
+                    "user_id": user_id,
+                    "kind": kind,
+                    "item": item,
+                    "message": self.rules.message(kind, item, self._last_log.get(key, fired)),
+                    "due_at": fired,
+                })
+            self._reschedule(key, fired, now)
+
+        batches = list(self._undelivered)
+        self._undelivered.clear()
+        batches += [reminders[start:start + self.batch_size] for start in range(0, len(reminders), self.batch_size)]
+        delivered = 0
+        for batch in batches:
+            try:
+                await self.sink.deliver(batch)
+                delivered += len(batch)
+                self.batches += 1
+            except Exception as e:
+                print(f"Reminder Sink Error: {e}")
+                # Keep it for the next tick, unless it is too late to be useful
+                batch = [reminder for reminder in batch if now - reminder["due_at"] <= self.max_late]
+                if batch:
+                    self._undelivered.append(batch)
+        self.fired += delivered
+        await self._flush(now)
+        return delivered
+
+    async def run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"Reminder Scheduler Error: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._flush()
+
+    def stats(self) -> dict:
+        return {
+            "in_memory": len(self._next),
+            "heap_entries": len(self._heap),
+            "window_end": self._window_end,
+            "fired": self.fired,
+            "batches": self.batches,
+            "skipped_late": self.skipped_late,
+            "pending_writes": len(self._upserts) + len(self._deletes) + len(self._medicine_logs),
+        }
@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.services.metrics import CACHE_LOOKUPS
+from app.services.text import normalize_text
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU with per-entry expiry. Not shared between workers.
+    """
+
+    # Dict operations: fine to run on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        with self._lock:
+            self._data[key] = (time.time() + ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """
+    LRU + TTL cache in a local SQLite file, shared by every worker on the host
+    and kept across restarts. Values are stored as JSON.
+
+    Eviction works from a running row count: when it passes max_entries,
+    the least recently used rows are deleted down to 90% of the limit and
+    the count is re-read (other workers write to the same table).
+    """
+
+    # Disk I/O: ResponseCache.aget/aset run it off the event loop
+    blocking = True
+
+    def __init__(self, path: str, namespace: str, max_entries: int = 50000):
+        self.path = path
+        self.table = f"cache_{namespace}"
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_lru ON {self.table}(last_used)")
+        self._count = len(self)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._count -= 1
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute(f"SELECT 1 FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl_seconds, now),
+            )
+            if exists is None:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)",
+                    (self._count - int(self.max_entries * 0.9),),
+                )
+                self._count = len(self)
+
+    def __len__(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Caches agent answers keyed on the normalized query (plus any context the
+    agent passes in). Configured from the environment:
+
+        CACHE_BACKEND       memory (default) | sqlite | off
+        CACHE_PATH          SQLite file, default "pranaya_cache.db"
+        CACHE_TTL_SECONDS   default 86400
+        CACHE_MAX_ENTRIES   default 5000
+    """
+
+    # namespace -> cache, for the stats endpoint
+    registry: Dict[str, "ResponseCache"] = {}
+
+    def __init__(self, namespace: str, backend=None, ttl_seconds: float = 86400, enabled: bool = True):
+        self.namespace = namespace
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        ResponseCache.registry[namespace] = self
+
+    @classmethod
+    def from_env(cls, namespace: str) -> "ResponseCache":
+        kind = os.getenv("CACHE_BACKEND", "memory").lower()
+        ttl = float(os.getenv("CACHE_TTL_SECONDS", "86400"))
+        max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+        if kind == "sqlite":
+            backend = SQLiteCacheBackend(os.getenv("CACHE_PATH", "pranaya_cache.db"), namespace, max_entries)
+        else:
+            backend = MemoryCacheBackend(max_entries)
+        return cls(namespace, backend=backend, ttl_seconds=ttl, enabled=kind != "off")
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        normalized = "\x1f".join(normalize_text(part) for part in parts)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        return self._counted(self.backend.get(key))
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """
+        get() for agents: a disk-backed lookup runs in a worker thread.
+        """
+        if not self.enabled:
+            return None
+        if self.backend.blocking:
+            return self._counted(await asyncio.to_thread(self.backend.get, key))
+        return self._counted(self.backend.get(key))
+
+    def _counted(self, value: Optional[Any]) -> Optional[Any]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss" if value is None else "hit")
+        return value
+
+    def set(self, key: str, value: Any):
+        if self.enabled:
+            self.backend.set(key, value, self.ttl_seconds)
+
+    async def aset(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        if self.backend.blocking:
+            await asyncio.to_thread(self.backend.set, key, value, self.ttl_seconds)
+        else:
+            self.backend.set(key, value, self.ttl_seconds)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self.backend),
+        }
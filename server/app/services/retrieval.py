@@ -0,0 +1,311 @@
+"""
+Local retrieval over the vetted health facts in app/data/health_facts.jsonl.
+
+Offline build, part of every deploy (it also runs on first use when the
+index is missing or older than the corpus, under a lock so only one worker
+builds):
+
+    cd server && python -m app.services.retrieval --build
+    cd server && python -m app.services.retrieval "is it true carrots improve eyesight"
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no build lock, the atomic swap still protects readers
+    fcntl = None
+
+from app.services.text import normalize_text
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+DEFAULT_CORPUS = os.path.join(DATA_DIR, "health_facts.jsonl")
+DEFAULT_INDEX_DIR = os.path.join(DATA_DIR, "retrieval_index")
+
+INDEX_VERSION = 1
+
+# Question scaffolding ("is it true that ...") says nothing about the topic
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "it", "its", "that", "this", "true", "really",
+    "do", "does", "did", "can", "could", "should", "would", "will", "i", "me", "my", "you", "your",
+    "what", "how", "why", "when", "which", "who", "of", "to", "in", "on", "for", "and", "or", "with",
+    "about", "tell", "explain", "know", "there", "any", "if", "so", "as", "at", "by", "from", "myth", "fact",
+}
+
+# Who an entry is about: the dose for adults does not answer "for children"
+POPULATIONS = {
+    "child": {"child", "children", "kid", "kids", "toddler", "toddlers", "pediatric", "paediatric"},
+    "infant": {"baby", "babies", "infant", "infants", "newborn", "newborns"},
+    "teen": {"teen", "teens", "teenager", "teenagers", "adolescent", "adolescents"},
+    "adult": {"adult", "adults"},
+    "elderly": {"elderly", "senior", "seniors"},
+    "pregnant": {"pregnant", "pregnancy", "breastfeeding"},
+}
+
+
+def populations(text: str) -> set:
+    words = set(normalize_text(text).split())
+    return {group for group, names in POPULATIONS.items() if words & names}
+
+
+def _terms(text: str) -> List[str]:
+    tokens = []
+    for token in normalize_text(text).split():
+        if token in STOPWORDS:
+            continue
+        # Crude plural folding: "carrots" ~ "carrot", "improves" ~ "improve"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _bucket(term: str, dims: int) -> Tuple[int, float]:
+    # Stable across processes, unlike hash()
+    digest = int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dims, 1.0 if (digest >> 63) else -1.0
+
+
+class HashingEmbedder:
+    """
+    TF-IDF over word unigrams + bigrams, hashed into a fixed number of
+    dimensions (signed, so collisions cancel out on average) and
+    L2-normalized: cosine similarity is a dot product. No model to download
+    and no API call per query.
+    """
+
+    def __init__(self, dims: int, idf: Optional[np.ndarray] = None):
+        self.dims = dims
+        self.idf = idf
+
+    def fit(self, texts: List[str]) -> "HashingEmbedder":
+        df = np.zeros(self.dims, dtype=np.float32)
+        for text in texts:
+            for bucket in {_bucket(term, self.dims)[0] for term in _terms(text)}:
+                df[bucket] += 1
+        self.idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1.0
+        return self
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for term, count in Counter(_terms(text)).items():
+            bucket, sign = _bucket(term, self.dims)
+            vector[bucket] += sign * (1.0 + math.log(count))
+        vector *= self.idf
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+
+def corpus_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_index(corpus_path: str = DEFAULT_CORPUS, index_dir: str = DEFAULT_INDEX_DIR, dims: int = 4096) -> dict:
+    """
+    Embeds every document (its text plus each "also" paraphrase, one row
+    each) into index_dir: vectors.npy (rows x dims, float32), idf.npy,
+    row_doc.npy, docs.jsonl and manifest.json.
+
+    The files are written to a fresh directory next to index_dir and
+    swapped in with renames: a worker that has the old vectors
+    memory-mapped keeps reading the old (now unlinked) files, never a
+    half-written one.
+    """
+    with open(corpus_path, encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+
+    texts, row_doc = [], []
+    for index, doc in enumerate(docs):
+        for text in [doc["text"]] + doc.get("also", []):
+            texts.append(text)
+            row_doc.append(index)
+
+    embedder = HashingEmbedder(dims).fit(texts)
+    vectors = np.stack([embedder.embed(text) for text in texts]) if texts else np.zeros((0, dims), dtype=np.float32)
+
+    target = os.path.abspath(index_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    index_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(target)}.build-", dir=os.path.dirname(target))
+    try:
+        np.save(os.path.join(index_dir, "vectors.npy"), vectors.astype(np.float32))
+        np.save(os.path.join(index_dir, "idf.npy"), embedder.idf)
+        np.save(os.path.join(index_dir, "row_doc.npy"), np.asarray(row_doc, dtype=np.int32))
+        with open(os.path.join(index_dir, "docs.jsonl"), "w", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json.dumps({key: value for key, value in doc.items() if key != "also"}, ensure_ascii=False) + "\n")
+        manifest = {
+            "version": INDEX_VERSION,
+            "dims": dims,
+            "docs": len(docs),
+            "rows": len(texts),
+            "corpus_sha256": corpus_digest(corpus_path),
+        }
+        # Written last: an index without a manifest is treated as missing
+        with open(os.path.join(index_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        _swap_in(index_dir, target)
+    except BaseException:
+        shutil.rmtree(index_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _swap_in(build_dir: str, index_dir: str):
+    # A directory can't be renamed over a non-empty one: move the old one aside first
+    old_dir = None
+    if os.path.exists(index_dir):
+        old_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(index_dir)}.old-", dir=os.path.dirname(index_dir))
+        os.replace(index_dir, os.path.join(old_dir, "index"))
+    os.replace(build_dir, index_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def ensure_index(corpus_path: str, index_dir: str):
+    """
+    Builds the index unless it is current. With several workers starting
+    at once, one builds and the others wait on the lock, then find it
+    current.
+    """
+    if is_current(corpus_path, index_dir):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(index_dir)), exist_ok=True)
+    with open(os.path.abspath(index_dir) + ".lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if not is_current(corpus_path, index_dir):
+            print("📚 Retrieval index missing or stale, building it...")
+            build_index(corpus_path, index_dir)
+
+
+class RetrievalIndex:
+    """
+    The built index, memory-mapped: the vectors stay in the page cache and
+    are shared by every worker process instead of being copied into each.
+    search() is one matrix-vector product plus a per-document max over the
+    paraphrase rows.
+
+    Scores are cosine similarities (0-1). Agents answer straight from the
+    corpus at or above `answer_score` (RETRIEVAL_ANSWER_SCORE), see answer(),
+    and use hits at or above `context_score` (RETRIEVAL_CONTEXT_SCORE) to
+    ground the LLM.
+    """
+
+    _shared: Optional["RetrievalIndex"] = None
+    _shared_loaded = False
+    _shared_lock = threading.Lock()
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.row_doc = np.load(os.path.join(index_dir, "row_doc.npy"))
+        self.embedder = HashingEmbedder(self.manifest["dims"], np.load(os.path.join(index_dir, "idf.npy")))
+        with open(os.path.join(index_dir, "docs.jsonl"), encoding="utf-8") as f:
+            self.docs = [json.loads(line) for line in f if line.strip()]
+        self.doc_types = np.array([doc.get("type", "") for doc in self.docs])
+        self.answer_score = float(os.getenv("RETRIEVAL_ANSWER_SCORE", "0.7"))
+        self.context_score = float(os.getenv("RETRIEVAL_CONTEXT_SCORE", "0.2"))
+
+    @classmethod
+    def shared(cls) -> Optional["RetrievalIndex"]:
+        """
+        The process-wide index (RETRIEVAL=0 disables it), rebuilt first if
+        it is missing or the corpus changed since it was built.
+        """
+        # Agents are constructed on warm-up threads in parallel; build once
+        with cls._shared_lock:
+            if cls._shared_loaded:
+                return cls._shared
+            cls._shared_loaded = True
+            if os.getenv("RETRIEVAL", "1") == "0":
+                return None
+            corpus = os.getenv("RETRIEVAL_CORPUS", DEFAULT_CORPUS)
+            index_dir = os.getenv("RETRIEVAL_INDEX_DIR", DEFAULT_INDEX_DIR)
+            try:
+                ensure_index(corpus, index_dir)
+                cls._shared = cls(index_dir)
+            except Exception as e:
+                print(f"Retrieval Index Error: {e}")
+            return cls._shared
+
+    def search(self, query: str, k: int = 3, doc_type: Optional[str] = None) -> List[Tuple[float, dict]]:
+        """
+        Up to `k` (score, doc) pairs, best first, optionally only of one "type".
+        """
+        if not self.docs:
+            return []
+        query_vector = self.embedder.embed(query)
+        row_scores = np.asarray(self.vectors @ query_vector)
+        scores = np.full(len(self.docs), -1.0, dtype=np.float32)
+        np.maximum.at(scores, self.row_doc, row_scores)
+        if doc_type is not None:
+            scores[self.doc_types != doc_type] = -1.0
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.docs[i]) for i in top if scores[i] > 0]
+
+    def answer(self, query: str, hits: List[Tuple[float, dict]]) -> Optional[dict]:
+        """
+        The best hit if it can answer `query` outright: it scores at least
+        `answer_score` and, when both name who they are about ("for
+        children", "while pregnant"), it is the same people. Word overlap
+        alone puts "safe dose of paracetamol for children" above the
+        threshold for the adult dose; that entry only grounds the LLM.
+        """
+        if not hits or hits[0][0] < self.answer_score:
+            return None
+        doc = hits[0][1]
+        asked, covered = populations(query), populations(doc["text"])
+        if asked and covered and asked != covered:
+            return None
+        return doc
+
+    def context(self, hits: List[Tuple[float, dict]]) -> List[dict]:
+        """
+        The hits good enough to ground an answer.
+        """
+        return [doc for score, doc in hits if score >= self.context_score]
+
+
+def is_current(corpus_path: str, index_dir: str) -> bool:
+    try:
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get("version") == INDEX_VERSION and manifest.get("corpus_sha256") == corpus_digest(corpus_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", nargs="?", help="search the index instead of building it")
+    parser.add_argument("--build", action="store_true")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--index-dir", default=DEFAULT_INDEX_DIR)
+    parser.add_argument("--dims", type=int, default=4096)
+    args = parser.parse_args()
+
+    if args.build or not is_current(args.corpus, args.index_dir):
+        print(json.dumps(build_index(args.corpus, args.index_dir, args.dims), indent=2))
+    if args.query:
+        index = RetrievalIndex(args.index_dir)
+        for score, doc in index.search(args.query, k=5):
+            print(f"{score:.3f}  {doc['id']}  {doc['text']}")
+
+
+if __name__ == "__main__":
+    main()
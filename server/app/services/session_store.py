@@ -0,0 +1,145 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, List, Optional, Tuple
+
+SUMMARY_PREFIX = "Summary of earlier conversation:"
+
+Summarizer = Callable[[str, List[str]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 UTF-8 bytes per token). Good enough for budgets,
+    and it charges Devanagari more per character than English, like the tokenizer.
+    """
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    The start of `text`, cut to about `max_tokens` (see estimate_tokens).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # Byte budget minus room for the ellipsis; a split multi-byte character is dropped
+    cut = text.encode("utf-8")[:max(0, max_tokens * 4 - 3)].decode("utf-8", errors="ignore")
+    return cut.rstrip() + "…"
+
+
+def trim_history(lines: List[str], max_tokens: int) -> List[str]:
+    """
+    Newest lines that fit in `max_tokens`, in chronological order. The
+    first line that doesn't fit is cut to the remaining budget rather than
+    dropped, so one long turn (a report, a long answer) can't empty it.
+    """
+    kept = []
+    budget = max_tokens
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if cost > budget:
+            if budget > 0:
+                kept.append(truncate_to_tokens(line, budget))
+            break
+        kept.append(line)
+        budget -= cost
+    kept.reverse()
+    return kept
+
+
+class Session:
+    def __init__(self):
+        self.turns: Deque[Tuple[str, int]] = deque()
+        self.turn_tokens = 0
+        self.summary = ""
+        # Turns pushed out of the window, waiting to be folded into the summary
+        self.evicted: List[str] = []
+        self.evicted_tokens = 0
+        self.summarizing = False
+        self.last_seen = time.time()
+
+
+class SessionStore:
+    """
+    Per-user conversation memory kept on the server, so clients don't have to
+    resend the whole history on every /chat call.
+
+    Each session is a ring buffer bounded by tokens (SESSION_MAX_TOKENS), not
+    by entries. Turns that fall out of it are collected and, once they add up
+    to SESSION_SUMMARY_TRIGGER_TOKENS, folded into a running summary by one
+    background LLM call, never on the request path.
+    """
+
+    def __init__(self, summarizer: Optional[Summarizer] = None):
+        self.summarizer = summarizer
+        self.max_tokens = int(os.getenv("SESSION_MAX_TOKENS", "1500"))
+        self.summary_trigger_tokens = int(os.getenv("SESSION_SUMMARY_TRIGGER_TOKENS", "400"))
+        self.max_sessions = int(os.getenv("SESSION_MAX_USERS", "10000"))
+        self.idle_ttl = float(os.getenv("SESSION_IDLE_SECONDS", "86400"))
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # The loop only keeps weak references to tasks
+        self._summary_tasks = set()
+
+    def _get(self, user_id: str) -> Session:
+        session = self._sessions.get(user_id)
+        if session is None or time.time() - session.last_seen > self.idle_ttl:
+            session = Session()
+            self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        session.last_seen = time.time()
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def history(self, user_id: str) -> List[str]:
+        """
+        The summary (if any) followed by the recent turns, oldest first.
+        """
+        session = self._sessions.get(user_id)
+        if session is None:
+            return []
+        lines = [f"{SUMMARY_PREFIX} {session.summary}"] if session.summary else []
+        return lines + [text for text, _ in session.turns]
+
+    def append(self, user_id: str, role: str, text: str):
+        if not text:
+            return
+        session = self._get(user_id)
+        # A turn longer than the whole window would push itself out too
+        line = truncate_to_tokens(f"{role}: {text}", self.max_tokens)
+        tokens = estimate_tokens(line)
+        session.turns.append((line, tokens))
+        session.turn_tokens += tokens
+
+        while session.turn_tokens > self.max_tokens and session.turns:
+            old_line, old_tokens = session.turns.popleft()
+            session.turn_tokens -= old_tokens
+            session.evicted.append(old_line)
+            session.evicted_tokens += old_tokens
+
+        if (
+            self.summarizer is not None
+            and not session.summarizing
+            and session.evicted_tokens >= self.summary_trigger_tokens
+        ):
+            session.summarizing = True
+            # A fresh context: the summary is not part of this request's
+            # deadline or token usage
+            task = contextvars.Context().run(asyncio.ensure_future, self._summarize(session))
+            self._summary_tasks.add(task)
+            task.add_done_callback(self._summary_tasks.discard)
+
+    async def _summarize(self, session: Session):
+        batch, session.evicted = session.evicted, []
+        session.evicted_tokens = 0
+        try:
+            session.summary = await self.summarizer(session.summary, batch)
+        except Exception as e:
+            print(f"Session Summary Error: {e}")
+            # Keep the turns for the next attempt, within the same token budget
+            session.evicted = trim_history(batch + session.evicted, self.max_tokens)
+            session.evicted_tokens = sum(estimate_tokens(line) for line in session.evicted)
+        finally:
+            session.summarizing = False
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one in-flight call.
+
+    The first caller for a key starts the work; everyone arriving while it
+    runs awaits the same future and gets the same result (or exception).
+    Once it finishes the key is forgotten, so this never serves stale data;
+    it only absorbs the thundering herd before a cache can help.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield(): one waiter disconnecting must not cancel the call for the others
+        return await asyncio.shield(task)
@@ -0,0 +1,92 @@
+import json
+import os
+from typing import Iterable, List, Optional
+
+from app.services.phrase_matcher import PhraseMatcher
+from app.services.response_cache import ResponseCache
+from app.services.text import normalize_text
+
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(__file__), "..", "data", "suggestion_library.json")
+
+
+class SuggestionLibrary:
+    """
+    Follow-up suggestions indexed by routed intent + topic.
+
+    Topics ("dengue", "water", ...) are found with one Aho-Corasick pass over
+    the condition names, the user text and the reply, in that order. The seed
+    library is a JSON file; suggestions the LLM writes on a miss are stored
+    back in a ResponseCache ("suggestions", so CACHE_BACKEND=sqlite keeps them
+    across restarts) under the same intent + topic.
+    """
+
+    def __init__(self, path: str = DEFAULT_LIBRARY, learned: Optional[ResponseCache] = None):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.suggestions = data["suggestions"]
+        self.fallbacks = data.get("fallbacks", {})
+        self.alias_topic = {}
+        for topic, aliases in data["topics"].items():
+            for alias in aliases:
+                self.alias_topic[alias] = topic
+        self.matcher = PhraseMatcher(self.alias_topic)
+        self.learned = learned if learned is not None else ResponseCache.from_env("suggestions")
+        self.hits = 0
+        self.misses = 0
+
+    def topics(self, texts: Iterable[str]) -> List[str]:
+        """
+        Known topics mentioned in `texts`, most relevant first, no duplicates.
+        """
+        found = []
+        for text in texts:
+            for alias in self.matcher.search_all(text or ""):
+                topic = self.alias_topic[alias]
+                if topic not in found:
+                    found.append(topic)
+        return found
+
+    def key(self, intent: str, texts: List[str]) -> str:
+        """
+        Where a generated answer is written back: the first topic mentioned,
+        else the first non-empty text (e.g. an unknown condition name).
+        """
+        topics = self.topics(texts)
+        if topics:
+            return ResponseCache.make_key(intent, topics[0])
+        first = next((text for text in texts if normalize_text(text or "")), "")
+        return ResponseCache.make_key(intent, first)
+
+    async def lookup(self, intent: str, texts: List[str]) -> Optional[List[str]]:
+        topics = self.topics(texts)
+        for name in [intent] + self.fallbacks.get(intent, []):
+            library = self.suggestions.get(name, {})
+            for topic in topics:
+                if topic in library:
+                    self.hits += 1
+                    return library[topic]
+
+        learned = await self.learned.aget(self.key(intent, texts))
+        if learned is not None:
+            self.hits += 1
+            return learned
+
+        default = self.suggestions.get(intent, {}).get("_default")
+        if default is not None:
+            self.hits += 1
+            return default
+
+        self.misses += 1
+        return None
+
+    async def learn(self, intent: str, texts: List[str], suggestions: List[str]):
+        await self.learned.aset(self.key(intent, texts), suggestions)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "learned": len(self.learned.backend),
+        }
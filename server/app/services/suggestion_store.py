@@ -0,0 +1,60 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, List, Optional
+
+
+class SuggestionStore:
+    """
+    Holds nudge generations that run in the background after /chat has replied.
+    The client picks them up later through /suggestions/{request_id}.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # request_id -> (created_at, task), oldest first
+        self._tasks: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def submit(self, coro: Awaitable[List[str]]) -> str:
+        self._prune()
+        request_id = uuid.uuid4().hex
+        self._tasks[request_id] = (time.monotonic(), asyncio.ensure_future(coro))
+        return request_id
+
+    def __contains__(self, request_id: str) -> bool:
+        return request_id in self._tasks
+
+    async def get(self, request_id: str, wait_seconds: float = 10.0) -> Optional[List[str]]:
+        """
+        Returns the suggestions, waiting up to `wait_seconds` for them to finish.
+        Returns None while they are still being generated.
+        """
+        entry = self._tasks.get(request_id)
+        if entry is None:
+            raise KeyError(request_id)
+
+        task = entry[1]
+        if not task.done():
+            # asyncio.wait() never cancels, so a client giving up leaves the task running
+            done, _ = await asyncio.wait({task}, timeout=wait_seconds)
+            if not done:
+                return None
+
+        try:
+            return task.result()
+        except Exception as e:
+            print(f"Suggestion Store Error: {e}")
+            return []
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._tasks:
+            request_id, (created_at, task) = next(iter(self._tasks.items()))
+            expired = now - created_at > self.ttl_seconds
+            if not expired and len(self._tasks) < self.max_entries:
+                break
+            self._tasks.popitem(last=False)
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form of a user message for matching and cache keys:
+    NFKC, casefolded, punctuation/symbols turned into spaces, single-spaced.
+    Letters, combining marks and digits of any script are kept, so
+    Devanagari input survives intact.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    chars = [
+        ch if unicodedata.category(ch)[0] in "LMN" else " "
+        for ch in text
+    ]
+    return _SPACES.sub(" ", "".join(chars)).strip()
@@ -0,0 +1,228 @@
+import re
+from typing import Optional
+
+from app.services.tracker_store import WATER_UNITS_ML
+
+# Handles the high-volume, unambiguous tracker phrases without an LLM call.
+# Anything it isn't sure about returns None and goes to the Scribe's LLM.
+
+WORD_NUMBERS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "couple": 2, "half": 0.5,
+}
+
+KNOWN_MEDICINES = (
+    "paracetamol", "crocin", "dolo", "calpol", "ibuprofen", "combiflam", "aspirin",
+    "cetirizine", "levocetirizine", "montelukast", "metformin", "insulin",
+    "amlodipine", "telmisartan", "atorvastatin", "rosuvastatin", "thyroxine",
+    "levothyroxine", "thyronorm", "eltroxin", "omeprazole", "pantoprazole", "pan d",
+    "ranitidine", "amoxicillin", "azithromycin", "augmentin", "ors",
+    "iron", "folic acid", "calcium", "vitamin d3", "vitamin d", "vitamin c", "vitamin b12",
+    "b12", "multivitamin", "antacid", "digene", "sinarest", "allegra",
+)
+# Also nutrients: "had iron rich food" is not a supplement
+NUTRIENTS = ("iron", "folic acid", "calcium", "vitamin d3", "vitamin d", "vitamin c", "vitamin b12", "b12")
+
+KNOWN_VACCINES = (
+    "covishield", "covaxin", "covid", "flu", "influenza", "hepatitis b", "hep b",
+    "hpv", "tetanus", "tt", "typhoid", "rabies", "polio", "mmr", "pneumococcal",
+    "chickenpox", "varicella", "dengue", "cholera", "bcg",
+)
+
+PILL_UNITS = ("tablet", "tab", "pill", "capsule", "dose", "drop", "puff")
+ABBREVIATIONS = ("ml", "l", "ltr", "mg", "mcg", "g", "iu")
+ACRONYMS = ("ors", "b12", "hpv", "tt", "mmr", "bcg", "hep b")
+
+_NUMBER = r"(?:\d+(?:\.\d+)?|" + "|".join(sorted(WORD_NUMBERS, key=len, reverse=True)) + r")"
+# Counts other than "a" / "an" (one) and "half"
+_COUNT_WORDS = "|".join(word for word in WORD_NUMBERS if word not in ("a", "an", "half"))
+_WATER_UNIT = r"(?:" + "|".join(sorted(WATER_UNITS_ML, key=len, reverse=True)) + r")(?:e?s)?"
+
+# "3 glasses of water", "two bottles water", "half a litre of water"
+WATER_AMOUNT_BEFORE = re.compile(rf"\b({_NUMBER})\s*(?:a\s+)?({_WATER_UNIT})\b(?:\s+of)?\s+(?:\w+\s+)?water\b")
+# "water 500 ml", "water - 2 glasses"
+WATER_AMOUNT_AFTER = re.compile(rf"\bwater\b\W*(?:\w+\s+)?({_NUMBER})\s*({_WATER_UNIT})\b")
+WATER_VERB = re.compile(r"\b(?:drank|drunk|drink|drinking|had|have|finished|logged?)\b")
+
+DOSE = re.compile(r"\b(\d+(?:\.\d+)?)\s*(mg|mcg|g|ml|iu|units?)\b")
+# "2 tablets", "2 paracetamol tablets"
+PILL_COUNT = re.compile(rf"\b({_NUMBER})\s+(?:([a-z][a-z0-9\-]*)\s+)?(tablets?|tabs?|pills?|capsules?|doses?|drops?|puffs?)\b")
+# More than this at once is not a routine dose: the LLM (and the emergency checks) decide
+MAX_COUNT = {"drop": 10}
+DEFAULT_MAX_COUNT = 4
+MEDICINE_VERB = re.compile(r"\b(?:took|taken|take|had|popped|swallowed|used|applied)\b")
+# Verbs nobody uses for food ("had" and "take" both are)
+PILL_VERB = re.compile(r"\b(?:took|taken|popped|swallowed)\b")
+FOOD_WORDS = re.compile(
+    r"\b(?:food|foods|rich|diet|meal|breakfast|lunch|dinner|snack|milk|curd|yogurt|cheese|eggs?|"
+    r"fruits?|juice|spinach|vegetables?|veggies|salad|sunlight|sun|ate|eat|eaten|eating)\b"
+)
+# Unnamed "pills" / "tablets" say nothing about what was taken
+GENERIC_MEDICINE = re.compile(r"\b(?:meds|medicines?|medication)\b")
+
+VACCINE_WORD = re.compile(r"\b(?:vaccines?|vaccinated|vaccination|shot|jab|booster)\b")
+VACCINE_VERB = re.compile(r"\b(?:got|get|took|taken|had|received)\b")
+VACCINE_DOSE = re.compile(r"\b(first|second|third|1st|2nd|3rd|booster)\b")
+
+PERIOD_START = re.compile(r"\bperiods?\b.*\b(?:started|start|starts|began|begun|came|arrived|got)\b|\b(?:got|started|began)\b.*\bperiods?\b")
+PERIOD_END = re.compile(r"\bperiods?\b.*\b(?:ended|end|ends|stopped|over|finished)\b")
+
+# Questions, negations, plans, advice and habits are not things that happened: leave them to the LLM
+NOT_A_LOG = re.compile(
+    r"\?|\b(?:not|no|didn'?t|did not|don'?t|haven'?t|forgot|skip(?:ped)?|missed|should|can|could|"
+    r"how|what|when|why|is it|will|remind|going to|gonna|want to|need to|needs to|plan|"
+    r"have to|has to|must|supposed to|told me|advised|recommended|try to|trying to|"
+    r"daily|every|everyday|usually|always|normally|generally|regularly|per day|a day|each day)\b"
+)
+
+
+def _number(token: str) -> float:
+    return WORD_NUMBERS[token] if token in WORD_NUMBERS else float(token)
+
+
+def _quantity(amount: float, unit: str) -> str:
+    """
+    "3 glasses", "0.5 litre", "500 ml": a string parse_quantity() reads back.
+    """
+    for candidate in (unit, unit[:-1], unit[:-2]):  # glass / bottles / glasses
+        if candidate in WATER_UNITS_ML or candidate in PILL_UNITS:
+            unit = candidate
+            break
+    if amount > 1 and unit not in ABBREVIATIONS:
+        unit += "es" if unit == "glass" else "s"
+    return f"{amount:g} {unit}"
+
+
+def _find(text: str, names) -> Optional[str]:
+    for name in names:
+        if re.search(rf"\b{re.escape(name)}\b", text):
+            return name
+    return None
+
+
+def _title(name: str) -> str:
+    return name.upper() if name in ACRONYMS else name.title()
+
+
+def _water(text: str) -> Optional[dict]:
+    if not re.search(r"\bwater\b", text):
+        return None
+    match = WATER_AMOUNT_BEFORE.search(text) or WATER_AMOUNT_AFTER.search(text)
+    if match:
+        quantity = _quantity(_number(match.group(1)), match.group(2))
+    elif WATER_VERB.search(text):
+        quantity = None
+    else:
+        return None
+    return {
+        "valid": True,
+        "category": "water",
+        "item": "Water",
+        "quantity": quantity,
+        "response_text": f"Logged {quantity} of water 💧 Keep it up!" if quantity else "Logged your water 💧 Keep it up!",
+    }
+
+
+def _medicine(text: str) -> Optional[dict]:
+    if not MEDICINE_VERB.search(text):
+        return None
+    name = _find(text, KNOWN_MEDICINES)
+    dose = DOSE.search(text)
+    count = PILL_COUNT.search(text)
+    if name is None and dose is None and not GENERIC_MEDICINE.search(text):
+        return None
+    if FOOD_WORDS.search(text):
+        # "I had calcium in milk", "took my meds with breakfast": the LLM can tell
+        return None
+    if name in NUTRIENTS and dose is None and count is None and not PILL_VERB.search(text):
+        return None
+    if name is None and dose is not None:
+        # "took dolo650"-style names we don't know: the word right before the dose
+        before = re.findall(r"[a-z][a-z\-]+", text[:dose.start()])
+        if not before or before[-1] in ("took", "taken", "take", "had", "of", "a", "my", "the"):
+            return None
+        name = before[-1]
+    if count:
+        unit = count.group(3).rstrip("s")
+        if name is None or _number(count.group(1)) > MAX_COUNT.get(unit, DEFAULT_MAX_COUNT):
+            return None
+    elif name and re.search(rf"\b(?:\d+(?:\.\d+)?|{_COUNT_WORDS})\s+{re.escape(name)}\b", text):
+        # "took 15 paracetamol": 15 of what?
+        return None
+
+    # "took dolo 650": the strength on the strip
+    strength = re.search(rf"\b{re.escape(name)}\s*-?\s*(\d+(?:\.\d+)?)\b", text) if name else None
+    if strength and not (dose or count) and float(strength.group(1)) <= DEFAULT_MAX_COUNT:
+        # "took crocin 2": the strength, or two of them?
+        return None
+
+    quantity = None
+    if dose:
+        unit = dose.group(2)
+        quantity = f"{dose.group(1)}{unit}" if unit in ABBREVIATIONS else f"{dose.group(1)} {unit}"
+    elif count:
+        quantity = _quantity(_number(count.group(1)), count.group(3))
+    elif strength:
+        quantity = strength.group(1)
+    item = _title(name) if name else None
+    return {
+        "valid": True,
+        "category": "medicine",
+        "item": item,
+        "quantity": quantity,
+        "response_text": f"Logged {item}{f' ({quantity})' if quantity else ''} 💊" if item else "Logged your medicine 💊",
+    }
+
+
+def _vaccine(text: str) -> Optional[dict]:
+    name = _find(text, KNOWN_VACCINES)
+    if VACCINE_WORD.search(text):
+        if not (VACCINE_VERB.search(text) or name):
+            return None
+    elif not (name and VACCINE_VERB.search(text) and re.search(r"\bdose\b", text)):
+        # "got covishield second dose"
+        return None
+    dose = VACCINE_DOSE.search(text)
+    item = _title(name) if name else None
+    return {
+        "valid": True,
+        "category": "vaccine",
+        "item": item,
+        "quantity": f"{dose.group(1)} dose" if dose and dose.group(1) != "booster" else ("booster" if dose else None),
+        "response_text": f"Logged your {item} vaccine 💉" if item else "Logged your vaccine 💉",
+    }
+
+
+def _period(text: str, user_gender: str) -> Optional[dict]:
+    if not re.search(r"\bperiods?\b", text) or user_gender.strip().lower() == "male":
+        return None
+    if PERIOD_END.search(text):
+        item, reply = "End", "Noted that your period ended 🌸"
+    elif PERIOD_START.search(text):
+        item, reply = "Start", "Logged the start of your period 🌸 Take care of yourself!"
+    else:
+        return None
+    return {"valid": True, "category": "period", "item": item, "quantity": None, "response_text": reply}
+
+
+def parse_tracker_message(user_text: str, user_gender: str = "Unknown") -> Optional[dict]:
+    """
+    Rule-based version of AgentScribe's extraction, same result shape.
+    Returns None unless exactly one category matches with confidence.
+    """
+    text = " ".join(user_text.lower().replace("’", "'").split())
+    if not text or len(text) > 160 or NOT_A_LOG.search(text):
+        return None
+
+    vaccine = _vaccine(text)
+    candidates = (
+        _water(text),
+        vaccine,
+        # A vaccine "dose" is not a medicine dose
+        None if vaccine else _medicine(text),
+        _period(text, user_gender),
+    )
+    results = [result for result in candidates if result]
+    # "drank water and took my meds" is two logs in one message: the LLM decides
+    return results[0] if len(results) == 1 else None
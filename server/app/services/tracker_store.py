@@ -0,0 +1,247 @@
+import atexit
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional, Tuple
+
+# Water volumes are normalized to millilitres so daily totals add up
+WATER_UNITS_ML = {
+    "ml": 1, "millilitre": 1, "milliliter": 1,
+    "l": 1000, "litre": 1000, "liter": 1000, "ltr": 1000,
+    "glass": 250, "cup": 240, "bottle": 1000, "sip": 20,
+}
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_WORD = re.compile(r"[a-z]+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracker_entries (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    item TEXT,
+    quantity TEXT,
+    amount REAL NOT NULL,
+    unit TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tracker_user_category_time
+    ON tracker_entries (user_id, category, created_at);
+
+-- One row per user/category/local day, maintained on every write, so the
+-- dashboard aggregates read N small rows instead of years of entries.
+CREATE TABLE IF NOT EXISTS tracker_daily (
+    user_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    day TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (user_id, category, day)
+) WITHOUT ROWID;
+"""
+
+
+def _local_timezone() -> tzinfo:
+    name = os.getenv("TRACKER_TIMEZONE", "Asia/Kolkata")
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        print(f"Tracker Store: unknown timezone {name!r}, using UTC")
+        return timezone.utc
+
+
+def parse_quantity(category: str, quantity: Optional[str]) -> Tuple[float, str]:
+    """
+    Turns the Scribe's free-text quantity into (amount, unit) for aggregation:
+    millilitres for water, one "dose"/"entry" per log for everything else.
+    """
+    if category != "water":
+        return 1.0, "dose" if category in ("medicine", "vaccine") else "entry"
+
+    text = (quantity or "").lower()
+    match = _NUMBER.search(text)
+    count = float(match.group()) if match else 1.0
+    for word in _WORD.findall(text):
+        for candidate in (word, word[:-1], word[:-2]):  # glass / bottles / glasses
+            if candidate in WATER_UNITS_ML:
+                return count * WATER_UNITS_ML[candidate], "ml"
+    # "2" with no unit: people count glasses
+    return count * WATER_UNITS_ML["glass"], "ml"
+
+
+class TrackerStore:
+    """
+    Persistent tracker log in SQLite (WAL mode).
+
+    record() only enqueues: a background thread writes entries in small
+    batches (TRACKER_BATCH_SIZE, or every TRACKER_FLUSH_MS), one transaction
+    per batch, and keeps the per-day rollup current. Reads use their own
+    connection and never wait for the writer.
+    """
+
+    def __init__(self, path: Optional[str] = None, batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.path = path or os.getenv("TRACKER_DB_PATH", "pranaya_tracker.db")
+        self.batch_size = batch_size or int(os.getenv("TRACKER_BATCH_SIZE", "50"))
+        self.flush_interval = flush_interval or float(os.getenv("TRACKER_FLUSH_MS", "200")) / 1000
+        self.tz = _local_timezone()
+        self._pending: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        # Don't lose the last batch on shutdown
+        atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _day(self, timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp, self.tz).strftime("%Y-%m-%d")
+
+    # --- WRITES ---
+
+    def record(self, user_id: str, entry: dict, timestamp: Optional[float] = None):
+        """
+        Queues one Scribe result ({"category", "item", "quantity", ...}).
+        """
+        category = (entry.get("category") or "").lower()
+        if not category:
+            return
+        amount, unit = parse_quantity(category, entry.get("quantity"))
+        self._pending.put((
+            user_id, category, entry.get("item"), entry.get("quantity"),
+            amount, unit, timestamp or time.time(),
+        ))
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="tracker-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"Tracker Store Error: {e}")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        with conn:
+            conn.executemany(
+                "INSERT INTO tracker_entries (user_id, category, item, quantity, amount, unit, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+            conn.executemany(
+                "INSERT INTO tracker_daily (user_id, category, day, entries, total) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (user_id, category, day) DO UPDATE SET "
+                "entries = entries + 1, total = total + excluded.total",
+                [(row[0], row[1], self._day(row[6]), row[4]) for row in batch],
+            )
+
+    def flush(self):
+        """
+        Blocks until every queued entry is written.
+        """
+        if self._writer is not None:
+            self._pending.join()
+
+    # --- READS ---
+
+    def entries(self, user_id: str, category: Optional[str] = None, days: int = 7, limit: int = 200) -> List[dict]:
+        since = time.time() - days * 86400
+        sql = "SELECT category, item, quantity, amount, unit, created_at FROM tracker_entries WHERE user_id = ?"
+        params: list = [user_id]
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        sql += " AND created_at >= ? ORDER BY created_at DESC LIMIT ?"
+        params += [since, limit]
+        rows = self._connect().execute(sql, params).fetchall()
+        keys = ("category", "item", "quantity", "amount", "unit", "created_at")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _day_range(self, days: int) -> List[str]:
+        today = datetime.now(self.tz).date()
+        return [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+    def daily_totals(self, user_id: str, category: str, days: int = 7) -> List[dict]:
+        """
+        One row per local day (oldest first, zeros included), e.g. water ml per day.
+        """
+        day_list = self._day_range(days)
+        rows = self._connect().execute(
+            "SELECT day, entries, total FROM tracker_daily "
+            "WHERE user_id = ? AND category = ? AND day >= ? ORDER BY day",
+            (user_id, category, day_list[0]),
+        ).fetchall()
+        by_day = {day: (entries, total) for day, entries, total in rows}
+        return [
+            {"day": day, "entries": by_day.get(day, (0, 0.0))[0], "total": by_day.get(day, (0, 0.0))[1]}
+            for day in day_list
+        ]
+
+    def adherence(self, user_id: str, days: int = 30, item: Optional[str] = None) -> dict:
+        """
+        Share of the last `days` local days with at least one medicine logged
+        (optionally a specific medicine).
+        """
+        day_list = self._day_range(days)
+        conn = self._connect()
+        if item:
+            # Per-item needs the raw entries, still an index range scan on (user, category, time)
+            since = datetime.fromisoformat(day_list[0]).replace(tzinfo=self.tz).timestamp()
+            rows = conn.execute(
+                "SELECT created_at FROM tracker_entries "
+                "WHERE user_id = ? AND category = 'medicine' AND created_at >= ? AND lower(item) = lower(?)",
+                (user_id, since, item),
+            ).fetchall()
+            taken = {self._day(created_at) for (created_at,) in rows}
+            doses = len(rows)
+        else:
+            rows = conn.execute(
+                "SELECT day, entries FROM tracker_daily "
+                "WHERE user_id = ? AND category = 'medicine' AND day >= ?",
+                (user_id, day_list[0]),
+            ).fetchall()
+            taken = {day for day, _ in rows}
+            doses = sum(entries for _, entries in rows)
+        days_taken = len(taken.intersection(day_list))
+        return {
+            "days": days,
+            "item": item,
+            "days_taken": days_taken,
+            "doses": doses,
+            "adherence": round(days_taken / days, 4) if days else 0.0,
+        }
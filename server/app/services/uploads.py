@@ -0,0 +1,44 @@
+import os
+import tempfile
+from typing import AsyncIterator
+
+# Uploads stay in RAM up to this size, then spill to a temp file on disk
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def max_upload_bytes() -> int:
+    return int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+
+
+async def capped(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """
+    Passes `chunks` through, raising UploadTooLarge as soon as more than
+    `max_bytes` went by. Content-Length can be missing (chunked bodies) or
+    wrong, so the bytes actually received are what counts.
+    """
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+        yield chunk
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], max_bytes: int):
+    """
+    Copies a request body into a SpooledTemporaryFile, chunk by chunk, and
+    stops as soon as it grows past `max_bytes`. Returns the file rewound to 0.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    try:
+        async for chunk in capped(chunks, max_bytes):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
@@ -0,0 +1,81 @@
+import contextvars
+import threading
+from typing import Dict, Optional
+
+# Tokens of the request being served (see start_request_usage)
+_request_usage: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("pranaya_request_usage", default=None)
+
+
+def start_request_usage() -> Dict[str, int]:
+    """
+    Starts counting the LLM calls made by the current task (and the tasks it
+    spawns) into the returned dict, e.g. for one item of /chat/batch.
+    """
+    totals = dict.fromkeys(UsageTracker.FIELDS, 0)
+    _request_usage.set(totals)
+    return totals
+
+
+def _add(totals: Dict[str, int], usage: Optional[dict]):
+    totals["calls"] += 1
+    if not usage:
+        totals["calls_without_usage"] += 1
+        return
+    totals["input_tokens"] += usage.get("input_tokens") or 0
+    totals["output_tokens"] += usage.get("output_tokens") or 0
+    details = usage.get("input_token_details") or {}
+    totals["cached_input_tokens"] += details.get("cache_read") or 0
+
+
+class UsageTracker:
+    """
+    Process-wide token accounting per agent, from the usage_metadata the
+    model returns with every response (streams report it per chunk).
+    """
+
+    FIELDS = ("calls", "input_tokens", "output_tokens", "cached_input_tokens", "calls_without_usage")
+
+    def __init__(self):
+        self._agents: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, usage: Optional[dict]):
+        with self._lock:
+            _add(self._agents.setdefault(agent, dict.fromkeys(self.FIELDS, 0)), usage)
+            request_totals = _request_usage.get()
+            if request_totals is not None:
+                _add(request_totals, usage)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for agent, totals in sorted(self._agents.items()):
+                calls_with_usage = totals["calls"] - totals["calls_without_usage"]
+                stats[agent] = dict(
+                    totals,
+                    avg_input_tokens=round(totals["input_tokens"] / calls_with_usage, 1) if calls_with_usage else 0.0,
+                    avg_output_tokens=round(totals["output_tokens"] / calls_with_usage, 1) if calls_with_usage else 0.0,
+                )
+            return stats
+
+    def reset(self):
+        with self._lock:
+            self._agents.clear()
+
+
+def merge_usage(total: Optional[dict], usage: Optional[dict]) -> Optional[dict]:
+    """
+    Adds one stream chunk's usage to the running total.
+    """
+    if not usage:
+        return total
+    if total is None:
+        total = {"input_tokens": 0, "output_tokens": 0, "input_token_details": {"cache_read": 0}}
+    total["input_tokens"] += usage.get("input_tokens") or 0
+    total["output_tokens"] += usage.get("output_tokens") or 0
+    details = usage.get("input_token_details") or {}
+    total["input_token_details"]["cache_read"] += details.get("cache_read") or 0
+    return total
+
+
+usage_tracker = UsageTracker()
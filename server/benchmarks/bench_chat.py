@@ -0,0 +1,264 @@
+"""
+Load test for /chat, fully in-process and offline.
+
+Drives the FastAPI app through httpx's ASGI transport at a fixed concurrency,
+with the LLM replaced by LLM_BACKEND=fake (or =replay with --cassette), and
+reports per route: p50/p95/p99 latency, throughput, and the time spent in
+each stage (route = orchestrator, agent = specialist, nudge = suggestions).
+
+    cd server && python -m benchmarks.bench_chat --requests 400 --concurrency 32
+    cd server && python -m benchmarks.bench_chat --cassette llm_cassette.jsonl --fail-p95 4000
+
+Before the load run it measures cold start in fresh interpreters: the time
+to import app.main, and the first /chat after it (which loads the agents).
+
+--fail-p95 exits non-zero when the overall p95 (ms) is above the budget,
+so the run can gate a deploy.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+# (weight, message templates): roughly the production mix
+WORKLOAD = [
+    (30, ["drank {n} glasses of water", "took paracetamol 650mg", "had {n} bottles of water today"]),
+    (20, ["I have had a fever and body ache for {n} days", "my head hurts since {n} days and I feel dizzy"]),
+    (15, ["what is thyroid and how is it treated", "explain how dengue spreads"]),
+    (10, ["I feel so lonely and sad these days", "I'm really stressed about my exams"]),
+    (10, ["is it true that carrots improve eyesight", "does cold weather cause a cold, is that a myth"]),
+    (15, ["hi", "hello there", "thanks!"]),
+]
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 0.50) * 1000,
+        "p95": percentile(ordered, 0.95) * 1000,
+        "p99": percentile(ordered, 0.99) * 1000,
+        "mean": (sum(ordered) / len(ordered) * 1000) if ordered else 0.0,
+    }
+
+
+def build_requests(count: int, users: int, seed: int, mode: str) -> List[dict]:
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in WORKLOAD]
+    requests = []
+    for index in range(count):
+        _, templates = rng.choices(WORKLOAD, weights=weights)[0]
+        message = rng.choice(templates).format(n=rng.randint(2, 5))
+        requests.append({"message": message, "user_id": f"bench-{index % users}", "suggestions_mode": mode})
+    return requests
+
+
+def instrument(main_module, stages: Dict[str, Dict[str, List[float]]]):
+    """
+    Wraps the stage entry points of app.main to time them per route.
+    """
+    orchestrator = main_module.agents.get("orchestrator")
+    classify = orchestrator.classify_intent
+
+    async def timed_classify(user_input, chat_history):
+        start = time.perf_counter()
+        decision = await classify(user_input, chat_history)
+        stages[decision["agent"]]["route"].append(time.perf_counter() - start)
+        return decision
+
+    orchestrator.classify_intent = timed_classify
+
+    dispatch = main_module._dispatch
+
+    async def timed_dispatch(intent, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await dispatch(intent, *args, **kwargs)
+        finally:
+            stages[intent]["agent"].append(time.perf_counter() - start)
+
+    main_module._dispatch = timed_dispatch
+
+    nudge_agent = main_module.agents.get("nudge")
+    nudge = nudge_agent.generate_suggestions
+
+    async def timed_nudge(user_text, bot_response, intent="chat", topics=None):
+        start = time.perf_counter()
+        try:
+            return await nudge(user_text, bot_response, intent, topics)
+        finally:
+            stages[intent]["nudge"].append(time.perf_counter() - start)
+
+    nudge_agent.generate_suggestions = timed_nudge
+
+
+# Runs in a fresh interpreter: nothing imported yet, like a new container
+COLD_START_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    ready = time.perf_counter()
+    client.post("/chat", json={"message": "I have had a fever for 2 days"})
+    first = time.perf_counter() - ready
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_chat_ms": first * 1000}))
+"""
+
+
+def measure_cold_start(runs: int) -> dict:
+    """
+    Median over `runs` fresh processes. The LLM answers instantly here, so
+    first_chat_ms is the cost of loading the agents on that path.
+    """
+    env = dict(os.environ, LLM_FAKE_LATENCY="fixed:0", LLM_FAKE_TOKENS_PER_SECOND="0")
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT], env=env, capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "runs": runs,
+        "warmup": env.get("AGENT_WARMUP", ""),
+        "import_ms": statistics.median(sample["import_ms"] for sample in samples),
+        "first_chat_ms": statistics.median(sample["first_chat_ms"] for sample in samples),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+
+    import app.main as main_module
+    from app.services.llm_service import LLMService
+
+    stages: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    instrument(main_module, stages)
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in build_requests(args.requests, args.users, args.seed, args.mode):
+        queue.put_nowait(payload)
+
+    transport = httpx.ASGITransport(app=main_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                payload = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/chat", json=payload)
+                elapsed = time.perf_counter() - start
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                latencies[response.json()["routed_to"]].append(elapsed)
+                latencies["ALL"].append(elapsed)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+
+    return {
+        "config": {
+            "requests": args.requests, "concurrency": args.concurrency, "mode": args.mode,
+            "backend": os.environ["LLM_BACKEND"], "latency": os.environ.get("LLM_FAKE_LATENCY"),
+            "rpm": os.environ["LLM_RPM"],
+        },
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies["ALL"]) / wall if wall else 0.0,
+        "errors": errors,
+        "routes": {route: summarize(samples) for route, samples in sorted(latencies.items())},
+        "stages": {
+            route: {stage: summarize(samples) for stage, samples in sorted(by_stage.items())}
+            for route, by_stage in sorted(stages.items())
+        },
+        "tokens": LLMService.usage_stats()["agents"],
+    }
+
+
+def print_report(report: dict):
+    config = report["config"]
+    print(f"\n/chat x {config['requests']} @ concurrency {config['concurrency']} "
+          f"(backend={config['backend']}, latency={config['latency']}, rpm={config['rpm']}, suggestions={config['mode']})")
+    cold = report.get("cold_start")
+    if cold:
+        print(f"cold start (median of {cold['runs']}, AGENT_WARMUP={cold['warmup'] or 'off'}): "
+              f"import app.main {cold['import_ms']:.0f} ms, first /chat {cold['first_chat_ms']:.0f} ms")
+    print(f"wall {report['wall_seconds']:.2f}s  throughput {report['throughput_rps']:.1f} req/s  errors {report['errors']}\n")
+    print(f"{'route':>18} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:>18} {stats['count']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+    print(f"\n{'route / stage':>26} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}")
+    for route, by_stage in report["stages"].items():
+        for stage, stats in by_stage.items():
+            label = f"{route} / {stage}"
+            print(f"{label:>26} {stats['count']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['mean']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=50, help="distinct user_ids (server-side sessions)")
+    parser.add_argument("--mode", default="inline", choices=["inline", "parallel", "deferred"], help="suggestions_mode")
+    parser.add_argument("--latency", default=None, help="LLM_FAKE_LATENCY, e.g. lognormal:0.4,0.35 or fixed:0")
+    parser.add_argument("--tps", default=None, help="LLM_FAKE_TOKENS_PER_SECOND")
+    parser.add_argument("--rpm", default=None, help="LLM_RPM quota to emulate (default: unlimited)")
+    parser.add_argument("--cassette", default=None, help="replay answers from this LLM_CASSETTE instead of faking them")
+    parser.add_argument("--cache", action="store_true", help="keep the response caches on (CACHE_BACKEND=memory)")
+    parser.add_argument("--cold-starts", type=int, default=3, help="fresh processes for the cold-start timing (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    parser.add_argument("--fail-p95", type=float, default=None, help="exit 1 if the overall p95 (ms) is above this")
+    args = parser.parse_args()
+
+    # Set before app.main is imported, which reads TRACKER_DB_PATH and its other
+    # settings at import time (agents read theirs later, when first loaded)
+    os.environ["LLM_BACKEND"] = "replay" if args.cassette else os.environ.get("LLM_BACKEND", "fake")
+    if args.cassette:
+        os.environ["LLM_CASSETTE"] = args.cassette
+    if args.latency:
+        os.environ["LLM_FAKE_LATENCY"] = args.latency
+    if args.tps:
+        os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = args.tps
+    os.environ["LLM_FAKE_SEED"] = str(args.seed)
+    # The fake has no quota; only throttle when asked to
+    os.environ["LLM_RPM"] = args.rpm or os.environ.get("LLM_RPM", "1000000")
+    os.environ["CACHE_BACKEND"] = "memory" if args.cache else "off"
+    workdir = tempfile.mkdtemp(prefix="pranaya-bench-")
+    os.environ["TRACKER_DB_PATH"] = os.path.join(workdir, "tracker.db")
+
+    cold_start = measure_cold_start(args.cold_starts) if args.cold_starts > 0 else None
+    report = asyncio.run(run(args))
+    report["cold_start"] = cold_start
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    overall = report["routes"].get("ALL", {}).get("p95", 0.0)
+    if args.fail_p95 is not None and overall > args.fail_p95:
+        print(f"\nFAIL: p95 {overall:.1f} ms > budget {args.fail_p95:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
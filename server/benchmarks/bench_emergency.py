@@ -0,0 +1,72 @@
+"""
+Microbenchmark for the Emergency Sentinel.
+
+Measures the per-message cost of check_critical() as the phrase list grows
+from the shipped file to 10k phrases, next to the old "keyword in text" loop.
+
+    cd server && python -m benchmarks.bench_emergency
+"""
+import random
+import string
+import time
+
+from app.agents.emergency import DEFAULT_PHRASES
+from app.services.phrase_matcher import PhraseMatcher, load_phrases
+from app.services.text import normalize_text
+
+MESSAGES = [
+    "I drank 2 glasses of water",
+    "hi",
+    "I have had a headache and mild fever since yesterday evening, what should I take?",
+    "Does carrot give us night vision?",
+    "I feel so alone lately and I don't know who to talk to about it anymore",
+    "I want to KILL-MYSELF!!!",
+    "mujhe marna hai",
+    "Can you explain what a lipid profile measures and which values matter most for heart health?",
+]
+
+
+def synthetic_phrases(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))) for _ in range(count)]
+
+
+def naive_check(keywords, text):
+    text_lower = text.lower()
+    for keyword in keywords:
+        if keyword in text_lower:
+            return True
+    return False
+
+
+def per_message_us(fn, rounds: int = 2000):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in MESSAGES:
+            fn(message)
+    return (time.perf_counter() - start) / (rounds * len(MESSAGES)) * 1e6
+
+
+def main():
+    shipped = load_phrases(DEFAULT_PHRASES)
+    print(f"{'phrases':>8} | {'build ms':>9} | {'matcher us/msg':>14} | {'naive us/msg':>12}")
+    for size in (len(shipped), 1_000, 10_000):
+        phrases = shipped + synthetic_phrases(max(0, size - len(shipped)))
+        start = time.perf_counter()
+        matcher = PhraseMatcher(phrases)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        matcher_us = per_message_us(matcher.search)
+        keywords = [normalize_text(p) for p in phrases]
+        naive_us = per_message_us(lambda text: naive_check(keywords, text), rounds=200)
+        print(f"{len(phrases):>8} | {build_ms:>9.1f} | {matcher_us:>14.2f} | {naive_us:>12.2f}")
+
+    matcher = PhraseMatcher(shipped)
+    print()
+    for message in MESSAGES:
+        print(f"{str(matcher.search(message)):>16}  <-  {message[:60]}")
+
+
+if __name__ == "__main__":
+    main()
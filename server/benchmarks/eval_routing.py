@@ -0,0 +1,235 @@
+"""
+Routing evaluation over a labelled JSONL file, with bounded parallelism.
+
+Each line: {"message": "...", "expected": "diagnosis"} (optionally "history",
+"gender", "id"). Every message goes through the same code as /chat/batch,
+in-process by default or against a running server with --url, and the
+report shows accuracy, the confusion matrix (expected x routed), and
+latency and tokens per routed intent. Labels the server doesn't handle
+(e.g. "general_search") are counted as "unknown".
+
+    cd server && python -m benchmarks.eval_routing benchmarks/routing_sample.jsonl --concurrency 16
+    cd server && python -m benchmarks.eval_routing regression.jsonl --full --out results.jsonl
+    cd server && python -m benchmarks.eval_routing regression.jsonl --url http://localhost:8000
+
+--route-only (the default) stops after the orchestrator; --full also runs
+the specialist and nudge agents, for end-to-end latency and token cost.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.bench_chat import summarize
+
+UNKNOWN = "unknown"
+
+
+def load_cases(path: str) -> List[dict]:
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            if "message" not in case or "expected" not in case:
+                raise ValueError(f"{path}:{number}: needs \"message\" and \"expected\"")
+            cases.append(case)
+    return cases
+
+
+def as_request(case: dict) -> dict:
+    request = {"message": case["message"], "history": case.get("history", []), "suggestions_mode": "inline"}
+    if "gender" in case:
+        request["gender"] = case["gender"]
+    return request
+
+
+async def run_in_process(cases: List[dict], concurrency: int, route_only: bool) -> List[dict]:
+    import app.main as main_module
+
+    requests = [main_module.ChatRequest(**as_request(case)) for case in cases]
+    # Agent loading would otherwise land on the first messages' latency
+    await main_module.agents.warm_up()
+    return await main_module.run_batch(requests, concurrency, route_only, persist=False)
+
+
+# Two batches in flight, so the server isn't idle while one batch's slowest item finishes
+BATCHES_IN_FLIGHT = 2
+
+
+async def run_remote(cases: List[dict], url: str, concurrency: int, route_only: bool, chunk: int) -> List[dict]:
+    """
+    Posts `chunk` items per /chat/batch request; the server runs each batch
+    at `concurrency`.
+    """
+    import httpx
+
+    from app.services.batch import gather_bounded
+
+    chunks = [cases[start:start + chunk] for start in range(0, len(cases), chunk)]
+    async with httpx.AsyncClient(base_url=url, timeout=600) as client:
+        async def post(part: List[dict]) -> List[dict]:
+            response = await client.post("/chat/batch", json={
+                "requests": [as_request(case) for case in part],
+                "concurrency": concurrency,
+                "route_only": route_only,
+                # Eval messages are not real tracker logs or conversations
+                "persist": False,
+            })
+            response.raise_for_status()
+            return response.json()["results"]
+
+        parts = await gather_bounded(chunks, post, BATCHES_IN_FLIGHT)
+    return [result for part in parts for result in part]
+
+
+def known_intents() -> tuple:
+    from app.agents.orchestrator import MasterOrchestrator
+
+    return MasterOrchestrator.INTENTS
+
+
+def label(value, intents: tuple) -> str:
+    value = (value or "").strip().lower()
+    return value if value in intents else UNKNOWN
+
+
+def evaluate(cases: List[dict], results: List[dict], intents: tuple) -> dict:
+    labels = list(intents) + [UNKNOWN]
+    confusion = {expected: dict.fromkeys(labels, 0) for expected in labels}
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    tokens: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    rows = []
+    correct = errors = 0
+
+    for index, (case, result) in enumerate(zip(cases, results)):
+        expected = label(case["expected"], intents)
+        if result.get("status") != "success":
+            errors += 1
+            routed = UNKNOWN
+        else:
+            routed = label(result.get("routed_to"), intents)
+        confusion[expected][routed] += 1
+        correct += expected == routed and expected != UNKNOWN
+        latencies[routed].append(result.get("latency_ms", 0.0) / 1000)
+        latencies["ALL"].append(result.get("latency_ms", 0.0) / 1000)
+        usage = result.get("usage") or {}
+        for bucket in (routed, "ALL"):
+            tokens[bucket]["items"] += 1
+            for field in ("calls", "input_tokens", "output_tokens", "cached_input_tokens"):
+                tokens[bucket][field] += usage.get(field, 0)
+        rows.append({
+            "index": index,
+            "id": case.get("id", index),
+            "message": case["message"],
+            "expected": case["expected"],
+            "routed_to": result.get("routed_to"),
+            "source": (result.get("decision") or {}).get("source"),
+            "correct": expected == routed and expected != UNKNOWN,
+            "latency_ms": result.get("latency_ms"),
+            "usage": usage,
+            "error": result.get("message") if result.get("status") != "success" else None,
+        })
+
+    per_intent = {}
+    for intent in labels:
+        row = confusion[intent]
+        support = sum(row.values())
+        routed_total = sum(confusion[expected][intent] for expected in labels)
+        hits = row[intent] if intent != UNKNOWN else 0
+        per_intent[intent] = {
+            "support": support,
+            "precision": round(hits / routed_total, 4) if routed_total else 0.0,
+            "recall": round(hits / support, 4) if support else 0.0,
+        }
+
+    return {
+        "items": len(cases),
+        "errors": errors,
+        "accuracy": round(correct / len(cases), 4) if cases else 0.0,
+        "labels": labels,
+        "confusion": confusion,
+        "per_intent": per_intent,
+        "latency": {intent: summarize(samples) for intent, samples in sorted(latencies.items())},
+        "tokens": {intent: dict(totals) for intent, totals in sorted(tokens.items())},
+        "rows": rows,
+    }
+
+
+def print_report(report: dict, wall: float):
+    labels = report["labels"]
+    print(f"\n{report['items']} messages in {wall:.1f}s ({report['items'] / wall if wall else 0:.1f}/s), "
+          f"errors {report['errors']}, accuracy {report['accuracy'] * 100:.1f}%\n")
+
+    short = {intent: intent[:8] for intent in labels}
+    print("expected \\ routed  " + " ".join(f"{short[intent]:>8}" for intent in labels) + "   recall")
+    for expected in labels:
+        row = report["confusion"][expected]
+        if not sum(row.values()):
+            continue
+        cells = " ".join(f"{row[routed]:>8}" for routed in labels)
+        print(f"{expected:>18} {cells}   {report['per_intent'][expected]['recall'] * 100:5.1f}%")
+
+    print(f"\n{'routed to':>18} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'calls':>7} {'in tok/msg':>11} {'out tok/msg':>12}")
+    for intent, stats in report["latency"].items():
+        totals = report["tokens"].get(intent, {})
+        items = totals.get("items", 0) or 1
+        print(f"{intent:>18} {stats['count']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f} "
+              f"{totals.get('calls', 0):>7} {totals.get('input_tokens', 0) / items:>11.1f} {totals.get('output_tokens', 0) / items:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cases", help="JSONL file of {\"message\", \"expected\"}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--route-only", dest="route_only", action="store_true", default=True, help="orchestrator only (default)")
+    mode.add_argument("--full", dest="route_only", action="store_false", help="run the whole /chat pipeline")
+    parser.add_argument("--url", default=None, help="evaluate a running server through /chat/batch")
+    parser.add_argument("--chunk", type=int, default=100, help="items per /chat/batch request with --url")
+    parser.add_argument("--out", default=None, help="write one result line per message (input order) here")
+    parser.add_argument("--json", default=None, help="also write the summary to this file")
+    parser.add_argument("--min-accuracy", type=float, default=None, help="exit 1 if accuracy (0-1) is below this")
+    args = parser.parse_args()
+
+    cases = load_cases(args.cases)
+    if os.getenv("LLM_BACKEND") in ("fake", "replay"):
+        # Offline backends have no quota to respect
+        os.environ.setdefault("LLM_RPM", "1000000")
+
+    if not args.url:
+        # Importing app.main opens the tracker DB; keep the real one out of it
+        os.environ.setdefault("TRACKER_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="pranaya-eval-"), "tracker.db"))
+
+    started = time.perf_counter()
+    if args.url:
+        results = asyncio.run(run_remote(cases, args.url, args.concurrency, args.route_only, args.chunk))
+    else:
+        results = asyncio.run(run_in_process(cases, args.concurrency, args.route_only))
+    wall = time.perf_counter() - started
+
+    report = evaluate(cases, results, known_intents())
+    print_report(report, wall)
+
+    rows = report.pop("rows")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(report, wall_seconds=wall), f, indent=2)
+
+    if args.min_accuracy is not None and report["accuracy"] < args.min_accuracy:
+        print(f"\nFAIL: accuracy {report['accuracy']:.3f} < {args.min_accuracy:.3f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Offline: no API key, no quota, nothing written next to the real stores
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("LLM_RPM", "1000000")
+os.environ.setdefault("LLM_FAKE_LATENCY", "fixed:0")
+os.environ.setdefault("TRACKER_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="pranaya-tests-"), "tracker.db"))
+os.environ.setdefault("REMINDERS", "0")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
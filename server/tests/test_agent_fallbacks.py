@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.agents.knowledge import ProfessorKnowledge
+from app.agents.mental_health import NurseCompassion
+from app.services.deadline import DeadlineExceeded
+
+
+class OutOfTime:
+    async def ainvoke(self, messages, **kwargs):
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def test_knowledge_answers_with_its_fallback_when_the_budget_runs_out():
+    agent = ProfessorKnowledge()
+    agent.llm = OutOfTime()
+    agent.retrieval = None
+    reply = asyncio.run(agent.get_info("how long does a cold usually last", []))
+    assert reply == ProfessorKnowledge.FALLBACK
+    assert asyncio.run(agent.cache.aget(agent._cache_key("how long does a cold usually last", []))) is None
+
+
+def test_mental_health_answers_with_its_fallback_when_the_budget_runs_out():
+    agent = NurseCompassion()
+    agent.llm = OutOfTime()
+    assert asyncio.run(agent.get_support("I feel so alone lately", [])) == NurseCompassion.FALLBACK
+
+
+class BrokenStream:
+    """
+    A backend that fails after `tokens` chunks.
+    """
+
+    def __init__(self, tokens=0):
+        self.tokens = tokens
+
+    async def astream(self, messages, **kwargs):
+        for _ in range(self.tokens):
+            yield Chunk("partial ")
+        raise RuntimeError("503 UNAVAILABLE")
+
+
+class Chunk:
+    def __init__(self, content):
+        self.content = content
+
+
+async def _collect(stream):
+    return [token async for token in stream]
+
+
+def test_streams_fall_back_before_the_first_token():
+    knowledge = ProfessorKnowledge()
+    knowledge.llm = BrokenStream()
+    knowledge.retrieval = None
+    assert asyncio.run(_collect(knowledge.stream_info("how long does a cold usually last", []))) == [ProfessorKnowledge.FALLBACK]
+
+    support = NurseCompassion()
+    support.llm = BrokenStream()
+    assert asyncio.run(_collect(support.stream_support("I feel so alone lately", []))) == [NurseCompassion.FALLBACK]
+
+
+def test_streams_fail_after_a_partial_reply():
+    support = NurseCompassion()
+    support.llm = BrokenStream(tokens=2)
+    with pytest.raises(RuntimeError):
+        asyncio.run(_collect(support.stream_support("I feel so alone lately", [])))
+
+
+def test_chat_stream_sends_the_support_fallback(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    monkeypatch.setattr(main.agents.get("mental_health"), "llm", BrokenStream())
+    monkeypatch.setattr(main, "_classify", _route_to("mental_health"))
+    body = TestClient(main.app).post("/chat/stream", json={"message": "I feel so alone lately", "user_id": "stream-user"}).text
+    assert "trouble finding my words" in body
+    assert "event: error" not in body
+
+
+def _route_to(intent):
+    async def classify(*args, **kwargs):
+        return {"agent": intent, "confidence": 1.0, "source": "test"}
+    return classify
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+def _entries(user_id):
+    main.tracker_store.flush()
+    return main.tracker_store.entries(user_id, None, 1, 100)
+
+
+def test_batches_do_not_persist_by_default():
+    client = TestClient(main.app)
+    request = {"message": "drank 3 glasses of water", "user_id": "batch-eval-user"}
+    results = client.post("/chat/batch", json={"requests": [request]}).json()["results"]
+    assert results[0]["response"]["type"] == "tracker_log"
+    assert _entries("batch-eval-user") == []
+    assert main.session_store.history("batch-eval-user") == []
+
+
+def test_batches_can_opt_in_to_persisting():
+    client = TestClient(main.app)
+    request = {"message": "drank 3 glasses of water", "user_id": "batch-real-user"}
+    client.post("/chat/batch", json={"requests": [request], "persist": True})
+    assert len(_entries("batch-real-user")) == 1
+    assert main.session_store.history("batch-real-user")
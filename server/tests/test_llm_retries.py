@@ -0,0 +1,61 @@
+import asyncio
+
+from google.genai.errors import ClientError
+from langchain_core.exceptions import ModelRateLimitError
+from langchain_core.messages import HumanMessage
+from langchain_google_genai.chat_models import _handle_client_error
+
+from app.services.llm_service import ManagedModel, _status_code, is_retryable
+
+
+def _google_error(code: int) -> Exception:
+    # The error langchain-google-genai raises for the SDK's ClientError
+    sdk_error = ClientError(code, {"error": {"code": code, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}})
+    try:
+        _handle_client_error(sdk_error, {"model": "gemini-2.5-flash"})
+    except Exception as e:
+        return e
+    raise AssertionError("no error raised")
+
+
+def test_google_quota_errors_are_retryable_429s():
+    error = _google_error(429)
+    assert type(error).__name__ == "GoogleRateLimitError"
+    assert _status_code(error) == 429
+    assert is_retryable(error)
+
+
+def test_langchain_rate_limit_is_a_429():
+    assert _status_code(ModelRateLimitError("slow down")) == 429
+
+
+def test_bad_requests_are_not_retried():
+    error = _google_error(400)
+    assert _status_code(error) == 400
+    assert not is_retryable(error)
+
+
+class QuotaThenAnswer:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        if self.calls == 1:
+            raise _google_error(429)
+        return "answer"
+
+
+def test_quota_error_pauses_the_bucket_and_retries(monkeypatch):
+    monkeypatch.setenv("LLM_BACKOFF_BASE", "0.01")
+    client = QuotaThenAnswer()
+
+    async def scenario():
+        model = ManagedModel("quota", client, asyncio.Semaphore(8))
+        paused = []
+        monkeypatch.setattr(model.bucket, "pause", paused.append)
+        return await model.ainvoke([HumanMessage(content="hi")], agent="test"), paused
+
+    answer, paused = asyncio.run(scenario())
+    assert answer == "answer" and client.calls == 2
+    assert len(paused) == 1
@@ -0,0 +1,39 @@
+from app.services.metrics import Counter, Histogram
+
+
+def test_large_counters_render_exactly():
+    tokens = Counter("test_tokens_total", "Tokens.", ("kind",))
+    tokens.inc(12345678, kind="input")
+    tokens.inc(0.5, kind="output")
+    lines = tokens.render()
+    assert 'test_tokens_total{kind="input"} 12345678' in lines
+    assert 'test_tokens_total{kind="output"} 0.5' in lines
+
+
+def test_histogram_sum_keeps_precision():
+    seconds = Histogram("test_seconds", "Seconds.", buckets=(1.0,))
+    for _ in range(3):
+        seconds.observe(2_000_000.25)
+    lines = seconds.render()
+    assert "test_seconds_sum 6000000.75" in lines
+    assert 'test_seconds_bucket{le="+Inf"} 3' in lines
+
+
+def test_free_text_routes_do_not_become_labels(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import app.main as main
+
+    orchestrator = main.agents.get("orchestrator")
+
+    async def classify_intent(user_text, chat_history):
+        return {"agent": "general_search: let me look that up", "confidence": 0.9, "source": "llm"}
+
+    monkeypatch.setattr(orchestrator, "classify_intent", classify_intent)
+    client = TestClient(main.app)
+    response = client.post("/chat", json={"message": "tell me something"})
+    assert response.status_code == 200
+
+    exposition = client.get("/metrics").text
+    assert "let me look that up" not in exposition
+    assert 'pranaya_routes_total{route="unknown",source="llm"}' in exposition
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from app.agents.emergency import EmergencySentinel
+from app.agents.orchestrator import MasterOrchestrator
+
+
+@pytest.fixture(scope="module")
+def orchestrator():
+    return MasterOrchestrator()
+
+
+OVERDOSES = [
+    "I took 20 sleeping pills",
+    "had a panic attack and took 10 pills",
+    "took 30 paracetamol tablets",
+    "swallowed a whole bottle of pills",
+    "took all my sleeping tablets",
+]
+
+
+@pytest.mark.parametrize("message", OVERDOSES)
+def test_overdose_is_never_logged_as_medicine(orchestrator, message):
+    # Not an alarm on a regex alone: the LLM decides, never the local fast paths
+    assert orchestrator.emergency_sentinel.find_critical(message) is None
+    assert orchestrator._classify_locally(message, []) is None
+    decision = asyncio.run(orchestrator.classify_intent(message, []))
+    assert decision["source"] == "llm"
+
+
+@pytest.mark.parametrize("message", [
+    "I take 7 pills every day for my diabetes and bp",
+    "my doctor told me to take 6 tablets a day",
+    "is it safe to take 8 tablets of vitamin c in a month",
+    "I ate a whole strip of chocolate",
+])
+def test_routine_counts_are_not_alarms(orchestrator, message):
+    assert orchestrator.emergency_sentinel.find_critical(message) is None
+    assert asyncio.run(orchestrator.classify_intent(message, []))["source"] != "sentinel"
+
+
+@pytest.mark.parametrize("message", ["I took 15 paracetamol", "took 2 sleeping pills", "had a panic attack, took my pills"])
+def test_possible_overdose_skips_the_local_classifier(orchestrator, message):
+    assert orchestrator._classify_locally(message, []) is None
+
+
+@pytest.mark.parametrize("message", ["took my thyroid tablet", "took 2 paracetamol tablets", "drank a whole bottle of water", "took 500 mg paracetamol"])
+def test_ordinary_logs_are_not_alarms(message):
+    sentinel = EmergencySentinel()
+    assert sentinel.find_critical(message) is None
+    assert not sentinel.needs_review(message)
+
+
+def test_ordinary_medicine_log_stays_local(orchestrator):
+    decision = orchestrator._classify_locally("took my thyroid tablet", [])
+    assert decision is not None and decision["agent"] == "tracker"
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from app.agents.registry import AgentRegistry, AgentUnavailable
+
+
+class SlowAgent:
+    built = 0
+
+    def __init__(self):
+        time.sleep(0.2)
+        SlowAgent.built += 1
+
+
+class BrokenAgent:
+    def __init__(self):
+        raise RuntimeError("GOOGLE_API_KEY missing")
+
+
+def test_builds_off_the_event_loop_once():
+    registry = AgentRegistry({"slow": f"{__name__}:SlowAgent"})
+    SlowAgent.built = 0
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.ensure_future(ticker())
+        first, second = await asyncio.gather(registry.aget("slow"), registry.aget("slow"))
+        ticking.cancel()
+        return first, second, ticks
+
+    first, second, ticks = asyncio.run(scenario())
+    assert first is second
+    assert SlowAgent.built == 1
+    # The loop kept running while the agent was being built
+    assert ticks >= 5
+
+
+def test_failed_build_is_retried():
+    registry = AgentRegistry({"broken": f"{__name__}:BrokenAgent"})
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(AgentUnavailable):
+                await registry.aget("broken")
+
+    asyncio.run(scenario())
+    assert not registry.loaded("broken")
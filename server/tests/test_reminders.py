@@ -0,0 +1,51 @@
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+from app.services.reminders import DAY, InboxSink, ReminderScheduler
+from app.services.tracker_store import _local_timezone
+
+# 08:10 local time
+MORNING = datetime(2026, 3, 2, 8, 10, tzinfo=_local_timezone()).timestamp()
+PARACETAMOL = {"category": "medicine", "item": "Paracetamol", "quantity": "1 tablet"}
+METFORMIN = {"category": "medicine", "item": "Metformin", "quantity": "1 tablet"}
+
+
+def _scheduler():
+    path = os.path.join(tempfile.mkdtemp(prefix="pranaya-reminders-"), "reminders.db")
+    return ReminderScheduler(path=path, sink=InboxSink())
+
+
+def _fired(scheduler, user_id, now):
+    asyncio.run(scheduler.tick(now))
+    return scheduler.sink.pop(user_id)
+
+
+def test_single_as_needed_dose_creates_no_reminder():
+    scheduler = _scheduler()
+    scheduler.observe("headache", PARACETAMOL, MORNING)
+    asyncio.run(scheduler.tick(MORNING))
+    for day in range(1, 8):
+        assert _fired(scheduler, "headache", MORNING + day * DAY + 60) == []
+    assert scheduler._load(MORNING + 30 * DAY) == []
+
+
+def test_same_medicine_at_the_same_time_on_another_day_starts_a_reminder():
+    scheduler = _scheduler()
+    scheduler.observe("daily", METFORMIN, MORNING)
+    asyncio.run(scheduler.tick(MORNING))
+    # Next day, 25 minutes later than before
+    scheduler.observe("daily", METFORMIN, MORNING + DAY + 1500)
+    asyncio.run(scheduler.tick(MORNING + DAY + 1500))
+    reminders = _fired(scheduler, "daily", MORNING + 2 * DAY + 1560)
+    assert [reminder["item"] for reminder in reminders] == ["metformin"]
+
+
+def test_doses_hours_apart_are_not_a_routine():
+    scheduler = _scheduler()
+    scheduler.observe("fever", PARACETAMOL, MORNING)
+    asyncio.run(scheduler.tick(MORNING))
+    scheduler.observe("fever", PARACETAMOL, MORNING + DAY + 8 * 3600)
+    asyncio.run(scheduler.tick(MORNING + DAY + 8 * 3600))
+    assert scheduler._load(MORNING + 30 * DAY) == []
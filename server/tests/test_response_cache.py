@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services.response_cache import ResponseCache, SQLiteCacheBackend
+
+
+def test_sqlite_eviction_keeps_the_table_bounded(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), "test", max_entries=50)
+    for i in range(200):
+        backend.set(f"k{i}", i, ttl_seconds=60)
+        backend.set(f"k{i}", i, ttl_seconds=60)  # overwrites don't count twice
+    assert len(backend) <= 50
+    assert backend.get("k199") == 199
+    assert backend.get("k0") is None
+
+
+def test_async_lookups_run_off_the_loop(tmp_path):
+    cache = ResponseCache("test_async", backend=SQLiteCacheBackend(str(tmp_path / "cache.db"), "test_async"))
+
+    async def roundtrip():
+        key = cache.make_key("Is it true?")
+        assert await cache.aget(key) is None
+        await cache.aset(key, {"verdict": "MYTH"})
+        return await cache.aget(key)
+
+    assert asyncio.run(roundtrip()) == {"verdict": "MYTH"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_suggestion_library_learns_through_the_async_cache(tmp_path, monkeypatch):
+    from app.services.suggestion_library import SuggestionLibrary
+
+    learned = ResponseCache("suggestions_test", backend=SQLiteCacheBackend(str(tmp_path / "cache.db"), "suggestions_test"))
+    library = SuggestionLibrary(learned=learned)
+    # Off the event loop, like every other SQLite cache access
+    monkeypatch.setattr(learned, "get", None)
+    monkeypatch.setattr(learned, "set", None)
+    texts = ["what is a xylophone allergy", ""]
+
+    async def scenario():
+        first = await library.lookup("chat", texts)
+        await library.learn("chat", texts, ["a", "b", "c"])
+        return first, await library.lookup("chat", texts)
+
+    first, second = asyncio.run(scenario())
+    assert second == ["a", "b", "c"] and first != second
@@ -0,0 +1,49 @@
+from app.services.retrieval import RetrievalIndex, populations
+
+
+def _answer(query):
+    index = RetrievalIndex.shared()
+    return index.answer(query, index.search(query, k=2))
+
+
+def test_answers_paraphrases_of_an_entry():
+    assert _answer("how much paracetamol can I take")["id"] == "kb-paracetamol"
+    assert _answer("can I give honey to my baby")["id"] == "fact-honey-infants"
+
+
+def test_adult_dose_does_not_answer_for_other_people():
+    # Scores above the answer threshold on word overlap alone
+    index = RetrievalIndex.shared()
+    hits = index.search("what is the safe dose of paracetamol for children", k=2)
+    assert hits[0][1]["id"] == "kb-paracetamol" and hits[0][0] >= index.answer_score
+    assert index.answer("what is the safe dose of paracetamol for children", hits) is None
+    assert _answer("what is the safe dose of paracetamol for pregnant women") is None
+    # Still grounds the LLM
+    assert index.context(hits)[0]["id"] == "kb-paracetamol"
+
+
+def test_claims_about_everyone_hold_for_any_group():
+    assert _answer("do vaccines cause autism in children")["id"] == "myth-vaccines-autism"
+
+
+def test_populations():
+    assert populations("Is it safe for kids?") == {"child"}
+    assert populations("dose while pregnant for adults") == {"pregnant", "adult"}
+    assert populations("how much water should I drink") == set()
+
+
+def test_rebuild_swaps_the_index_in_without_touching_open_readers(tmp_path):
+    from app.services.retrieval import DEFAULT_CORPUS, build_index, ensure_index
+
+    index_dir = str(tmp_path / "index")
+    build_index(DEFAULT_CORPUS, index_dir)
+    reader = RetrievalIndex(index_dir)
+    before = reader.search("is it true carrots improve eyesight", k=1)
+
+    build_index(DEFAULT_CORPUS, index_dir)
+    ensure_index(DEFAULT_CORPUS, index_dir)  # current: no third build
+    # The old memory-mapped files are still intact
+    assert reader.search("is it true carrots improve eyesight", k=1) == before
+    assert RetrievalIndex(index_dir).search("is it true carrots improve eyesight", k=1) == before
+    # No build or old directories left behind
+    assert [path.name for path in tmp_path.iterdir()] == ["index"]
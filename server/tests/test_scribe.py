@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+from app.agents.scribe import AgentScribe
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class StubLLM:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        self.calls += 1
+        return Reply(json.dumps(self.result))
+
+
+LOGGED = {"valid": True, "category": "medicine", "item": "Thyronorm", "quantity": "1", "response_text": "Logged Thyronorm."}
+
+
+def _scribe(result=LOGGED):
+    scribe = AgentScribe()
+    scribe.llm = StubLLM(result)
+    return scribe
+
+
+def test_fast_path_beats_the_fused_draft():
+    scribe = _scribe()
+    draft = {"valid": True, "response_text": "Logged!"}
+    result = asyncio.run(scribe.extract_tracker_data("drank 3 glasses of water", "Unknown", draft=draft))
+    assert result["category"] == "water"
+    assert scribe.llm.calls == 0
+
+
+def test_possible_overdose_skips_the_fast_path():
+    scribe = _scribe()
+    asyncio.run(scribe.extract_tracker_data("took a whole strip of dolo", "Unknown"))
+    assert scribe.llm.calls == 1
+
+
+def test_uses_a_fileable_draft():
+    scribe = _scribe()
+    draft = {"valid": True, "category": "Medicine", "item": "Thyroid tablet", "quantity": None, "response_text": "Logged your thyroid tablet."}
+    assert asyncio.run(scribe.extract_tracker_data("had my thyroid tablet", "Unknown", draft=draft)) == draft
+    assert scribe.llm.calls == 0
+
+
+def test_redoes_a_draft_without_a_category():
+    # TrackerStore.record drops entries without one, after the user was told it was logged
+    scribe = _scribe()
+    for draft in ({"valid": True, "response_text": "Logged!"}, {"valid": True, "category": "steps", "response_text": "Logged!"}):
+        assert asyncio.run(scribe.extract_tracker_data("had my thyroid tablet", "Unknown", draft=draft)) == LOGGED
+    assert scribe.llm.calls == 2
+
+
+def test_usable():
+    scribe = _scribe()
+    assert scribe.usable({"valid": False, "response_text": "That doesn't look like a log."})
+    assert scribe.usable(LOGGED)
+    assert not scribe.usable({"valid": "yes", "category": "water", "response_text": "Logged!"})
+    assert not scribe.usable({"valid": True, "category": "water", "response_text": ""})
+    assert not scribe.usable(None)
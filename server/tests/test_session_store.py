@@ -0,0 +1,46 @@
+import asyncio
+
+from app.services import deadline
+from app.services.session_store import SessionStore, estimate_tokens, trim_history
+
+
+def test_long_newest_turn_is_truncated_not_dropped():
+    lines = ["User: hi", "Pranaya: " + "report line " * 500]
+    kept = trim_history(lines, 100)
+    assert len(kept) == 1
+    assert kept[0].startswith("Pranaya: report line")
+    assert estimate_tokens(kept[0]) <= 100
+
+
+def test_history_that_fits_is_kept_whole():
+    lines = ["User: hi", "Pranaya: hello"]
+    assert trim_history(lines, 100) == lines
+
+
+def test_truncation_keeps_multibyte_text_valid():
+    kept = trim_history(["User: " + "सिरदर्द " * 200], 20)
+    assert kept[0].encode("utf-8").decode("utf-8") == kept[0]
+    assert estimate_tokens(kept[0]) <= 20
+
+
+def test_summary_runs_outside_the_request_context(monkeypatch):
+    monkeypatch.setenv("SESSION_MAX_TOKENS", "20")
+    monkeypatch.setenv("SESSION_SUMMARY_TRIGGER_TOKENS", "10")
+    seen = {}
+
+    async def summarizer(previous, turns):
+        seen["remaining"] = deadline.remaining()
+        return "summary"
+
+    async def chat():
+        store = SessionStore(summarizer)
+        deadline.start_deadline(0.001)
+        for i in range(10):
+            store.append("u1", "User", f"message number {i}")
+        assert store._summary_tasks
+        await asyncio.gather(*store._summary_tasks)
+        return store
+
+    store = asyncio.run(chat())
+    assert seen["remaining"] is None
+    assert store.history("u1")[0].endswith("summary")
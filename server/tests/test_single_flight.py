@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.services import deadline
+from app.services.deadline import DeadlineExceeded
+from app.services.llm_service import ManagedModel
+
+
+class SlowClient:
+    calls = 0
+
+    async def ainvoke(self, messages, **kwargs):
+        SlowClient.calls += 1
+        await asyncio.sleep(0.3)
+        return "answer"
+
+
+def test_followers_keep_their_own_deadline():
+    SlowClient.calls = 0
+
+    async def scenario():
+        model = ManagedModel("slow", SlowClient(), asyncio.Semaphore(8))
+
+        async def caller(seconds):
+            deadline.start_deadline(seconds)
+            return await model.ainvoke([HumanMessage(content="same prompt")], agent="test")
+
+        # The leader gives up after 50 ms; the follower has 5 s and still gets the shared answer
+        leader = asyncio.ensure_future(caller(0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(caller(5))
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "answer"
+    assert SlowClient.calls == 1
@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(main.app)
+
+
+@pytest.mark.parametrize("path", ["/tracker/u1/daily", "/tracker/u1/adherence", "/tracker/u1/entries"])
+@pytest.mark.parametrize("days", [0, -3, 100000])
+def test_out_of_range_days_is_a_validation_error(client, path, days):
+    assert client.get(path, params={"days": days}).status_code == 422
+
+
+def test_daily_totals_cover_the_requested_days(client):
+    response = client.get("/tracker/u1/daily", params={"days": 1})
+    assert response.status_code == 200
+    assert len(response.json()["days"]) == 1
+
+
+def test_guest_logs_are_answered_but_not_stored(client):
+    response = client.post("/chat", json={"message": "drank 3 glasses of water", "user_id": "guest"})
+    assert response.json()["response"]["type"] == "tracker_log"
+    main.tracker_store.flush()
+    assert main.tracker_store.entries("guest", None, 1, 100) == []
@@ -0,0 +1,62 @@
+import pytest
+
+from app.services.tracker_parser import parse_tracker_message
+
+
+@pytest.mark.parametrize("message, category, item, quantity", [
+    ("drank 3 glasses of water", "water", "Water", "3 glasses"),
+    ("had 500 ml water", "water", "Water", "500 ml"),
+    ("took paracetamol 650mg", "medicine", "Paracetamol", "650mg"),
+    ("took 2 paracetamol tablets", "medicine", "Paracetamol", "2 tablets"),
+    ("took 1 tablet of dolo 650", "medicine", "Dolo", "1 tablet"),
+    ("took a crocin", "medicine", "Crocin", None),
+    ("took my meds", "medicine", None, None),
+    ("took dolo 650", "medicine", "Dolo", "650"),
+    ("took pan d 40", "medicine", "Pan D", "40"),
+    ("took vitamin d", "medicine", "Vitamin D", None),
+    ("had vitamin d3 60000 iu", "medicine", "Vitamin D3", "60000iu"),
+    ("had 1 calcium tablet", "medicine", "Calcium", "1 tablet"),
+    ("got covishield second dose", "vaccine", "Covishield", "second dose"),
+])
+def test_logs(message, category, item, quantity):
+    result = parse_tracker_message(message, "Female")
+    assert result["valid"] is True
+    assert (result["category"], result["item"], result["quantity"]) == (category, item, quantity)
+
+
+def test_period_log_respects_gender():
+    assert parse_tracker_message("my period started today", "Female")["item"] == "Start"
+    assert parse_tracker_message("my period started today", "Male") is None
+
+
+@pytest.mark.parametrize("message", [
+    # Generic pills, possible overdoses
+    "took 20 sleeping pills",
+    "had a panic attack and took 10 pills",
+    "took 2 tablets",
+    "took my pills",
+    # Implausible or unit-less counts
+    "took 30 paracetamol tablets",
+    "I took 15 paracetamol",
+    "took 2 crocin",
+    # Plans, advice and habits, not intake
+    "I have to drink 8 glasses of water",
+    "doctor told me to drink 3 litres of water daily",
+    "I drink 2 glasses of water every day",
+    "I usually take thyroxine in the morning",
+    "I need to take my metformin",
+    "should I take paracetamol?",
+    "didn't drink water today",
+    # Nutrients in food, not supplements
+    "Had iron rich food",
+    "I had calcium in milk",
+    "had vitamin d from sunlight",
+    "had iron",
+    "took crocin 2",
+])
+def test_leaves_unclear_messages_to_the_llm(message):
+    assert parse_tracker_message(message, "Female") is None
+
+
+def test_two_logs_in_one_message_go_to_the_llm():
+    assert parse_tracker_message("drank 2 glasses of water and took my meds") is None
@@ -0,0 +1,66 @@
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+BOUNDARY = "pranaya-test-boundary"
+
+
+def _multipart(payload: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="report.png"\r\n'
+        "Content-Type: image/png\r\n\r\n"
+    ).encode() + payload + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+def _chunked(body: bytes, size: int = 4096):
+    # A generator body goes out chunked, with no Content-Length to check up front
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def test_chunked_multipart_over_the_cap_is_rejected(monkeypatch):
+    monkeypatch.setenv("UPLOAD_MAX_BYTES", "1000")
+    monkeypatch.setattr(main, "MULTIPART_OVERHEAD_BYTES", 512)
+    response = TestClient(main.app).post(
+        "/reports/jobs",
+        content=_chunked(_multipart(b"x" * 200_000)),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    assert response.status_code == 413
+
+
+def test_file_part_over_the_cap_is_rejected(monkeypatch):
+    monkeypatch.setenv("UPLOAD_MAX_BYTES", "1000")
+    response = TestClient(main.app).post(
+        "/reports/jobs",
+        content=_chunked(_multipart(b"x" * 1500)),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    assert response.status_code == 413
+
+
+def test_multipart_without_a_file_part():
+    body = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="message"\r\n\r\nhi\r\n--{BOUNDARY}--\r\n'.encode()
+    response = TestClient(main.app).post(
+        "/reports/jobs", content=body, headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    )
+    assert response.status_code == 400
+
+
+def test_upload_within_the_cap_is_read_once(monkeypatch):
+    monkeypatch.setenv("UPLOAD_MAX_BYTES", "1000")
+    read = []
+    monkeypatch.setattr(main.vision_jobs, "submit", lambda payload: read.append(payload["file"].read()) or _Job())
+    response = TestClient(main.app).post(
+        "/reports/jobs",
+        content=_chunked(_multipart(b"x" * 900)),
+        headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+    assert response.status_code == 202
+    assert read == [b"x" * 900]
+
+
+class _Job:
+    id = "test-job"
+    status = "queued"